@@ -1,10 +1,14 @@
 """
 core/activities.py
 
-Last updated:  2023-07-23
+Last updated:  2026-10-19
 
 Collect basic information on "activities".
 
+The timetable exporters (fet, aSc) share an "export model" built from
+this information, see <export_model>. It is cached until the database
+is changed.
+
 
 =+LICENCE=============================
 Copyright 2023 Michael Towers
@@ -42,12 +46,12 @@ if __name__ == "__main__":
 
 ### +++++
 
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
 from core.db_access import (
     db_read_fields,
     db_select,
-    db_read_unique_field,
+    db_data_version,
     Record
 )
 
@@ -138,21 +142,26 @@ def collect_activity_groups() -> dict[int, ActivityGroup]:
     """Read all activities with lessons from database. Gather the
     information needed for the timetable for each lesson-group.
     """
-    # Get activities from database
+    #TODO: Use a different structure for "timetable activities"?
     activities = read_from_db()
     c_activities = activities["C_ACTIVITIES"]
+    classrooms = dict(db_read_fields("CLASSES", ("CLASS", "CLASSROOM")))
+    lg_lessons = {}
+    for rec in db_select("select * from LESSONS where Lesson_group != 0"):
+        try:
+            lg_lessons[rec["Lesson_group"]].append(rec)
+        except KeyError:
+            lg_lessons[rec["Lesson_group"]] = [rec]
     lg_data = {}    # { lesson-group -> ActivityGroup }
     for klass in sorted(c_activities):
-        classroom = db_read_unique_field("CLASSES", "CLASSROOM", CLASS=klass)
+        classroom = classrooms[klass]
         for ai in c_activities[klass]:
             if (lg := ai["Lesson_group"]) == 0:
                 continue        # not relevant for timetable (no lessons)
             try:
                 data = lg_data[lg]
             except KeyError:
-                lessons = db_select(
-                    f"select * from LESSONS where Lesson_group = {lg}"
-                )
+                lessons = lg_lessons.get(lg)
                 assert lessons
                 lg_data[lg] = ActivityGroup(
                     [
@@ -181,6 +190,86 @@ def collect_activity_groups() -> dict[int, ActivityGroup]:
     return lg_data
 
 
+class ExportActivity(NamedTuple):
+    """The resources of a lesson-group, normalized for the timetable
+    exporters. The sets must not be modified.
+    """
+    lesson_group: int
+    sid: str                        # block subject or course subject
+    block_tag: str
+    classes: frozenset[str]         # including "--"
+    groups: list[tuple[str, str]]   # (class, group): real classes only
+    teachers: frozenset[str]        # excluding "--"
+    rooms: frozenset[str]           # room wishes, as in LESSON_DATA
+    lessons: list[Record]           # LESSONS records
+
+
+_EXPORT_MODEL: Optional[tuple] = None   # (data version, model)
+
+
+def export_model() -> list[ExportActivity]:
+    """Return the activities as needed by the timetable exporters.
+    The model is built only once for any particular state of the
+    database (see <db_data_version>), so that several exports – or an
+    import followed by an export – don't need to read and process the
+    data again.
+    """
+    global _EXPORT_MODEL
+    version = db_data_version()
+    if _EXPORT_MODEL and _EXPORT_MODEL[0] == version:
+        return _EXPORT_MODEL[1]
+    model = []
+    for lg, act in collect_activity_groups().items():
+        classes = set()
+        groups = []
+        teachers = set()
+        rooms = set()
+        for klass, g, sid, tid, room in act.course_list:
+            classes.add(klass)
+            if g and klass != "--":
+                # Only add a group entry if there is a group and a
+                # (real) class
+                groups.append((klass, g))
+            if room:
+                rooms.add(room)
+            if tid != "--":
+                teachers.add(tid)
+        # Get the subject-id from the block-tag, if it has a subject,
+        # otherwise from the course (of which there should be only one!)
+        model.append(ExportActivity(
+            lg,
+            act.block_sid or sid,
+            act.block_tag,
+            frozenset(classes),
+            groups,
+            frozenset(teachers),
+            frozenset(rooms),
+            act.lessons,
+        ))
+    _EXPORT_MODEL = (version, model)
+    return model
+
+
+def update_export_placements(placements: dict[int, tuple[str, str]]):
+    """Enter changed lesson placements, {lesson-id: (PLACEMENT, ROOMS)},
+    which have just been written to the database, in the cached export
+    model, so that it remains valid.
+    """
+    global _EXPORT_MODEL
+    if not _EXPORT_MODEL:
+        return
+    for act in _EXPORT_MODEL[1]:
+        for rec in act.lessons:
+            try:
+                placement, rooms = placements[rec["Lid"]]
+            except KeyError:
+                continue
+            rec["PLACEMENT"] = placement
+            if rooms:
+                rec["ROOMS"] = rooms
+    _EXPORT_MODEL = (db_data_version(), _EXPORT_MODEL[1])
+
+
 # --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 """
 core/base.py
 
-Last updated:  2023-01-07
+Last updated:  2026-10-19
 
 Basic configuration and structural stuff.
 
@@ -60,10 +60,48 @@ from minion2 import Minion
 _Minion = Minion()
 builtins.MINION = _Minion.parse_file
 
-__TRANSLATIONS = MINION(APPDATAPATH("Translations.minion"))
-def __translations(module):
-    return __TRANSLATIONS[module]
-builtins.TRANSLATIONS = __translations
+class Translations:
+    """The translation file has an entry for each module (at the top
+    level). Only an index of these entries is built at start-up, the
+    text of an entry is parsed when it is first requested.
+    """
+    # The start of an entry: "module.name: {" at the start of a line
+    _ENTRY = re.compile(r'^([^\s#:{}\[\]"]+):[^\S\n]*\{', re.MULTILINE)
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "r", encoding="utf-8") as fh:
+            self.text = fh.read()
+        self.tables = {}
+        self.index = {}     # module -> (start, end, line offset)
+        last = None
+        nlines = 0
+        pos = 0
+        for m in self._ENTRY.finditer(self.text):
+            start = m.start()
+            nlines += self.text.count("\n", pos, start)
+            pos = start
+            if last:
+                self.index[last[0]] = (last[1], start, last[2])
+            last = (m.group(1), start, nlines)
+        if last:
+            self.index[last[0]] = (last[1], len(self.text), last[2])
+
+    def __call__(self, module):
+        try:
+            return self.tables[module]
+        except KeyError:
+            pass
+        start, end, nlines = self.index[module]
+        # Preceding line breaks keep the line numbers in error messages
+        data = _Minion.parse(
+            "\n" * nlines + self.text[start:end], self.path
+        )
+        table = data[module]
+        self.tables[module] = table
+        return table
+
+builtins.TRANSLATIONS = Translations(APPDATAPATH("Translations.minion"))
 
 T = TRANSLATIONS("core.base")
 
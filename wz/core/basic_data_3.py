@@ -1,5 +1,5 @@
 """
-core/basic_data.py - last updated 2023-07-03
+core/basic_data.py - last updated 2026-10-19
 
 Handle caching of the basic data sources
 
@@ -34,7 +34,7 @@ from core.db_access import (
 )
 from core.classes import Classes
 from core.teachers import Teachers
-from ui.ui_base import QRegularExpression  ### QtCore
+from PyQt6.QtCore import QRegularExpression
 
 SHARED_DATA = {}
 
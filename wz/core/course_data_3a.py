@@ -1,7 +1,7 @@
 """
 core/course_data.py
 
-Last updated:  2023-08-04
+Last updated:  2026-10-19
 
 Support functions dealing with courses, lessons, etc.
 
@@ -52,9 +52,11 @@ from core.classes import GROUP_ALL
 
 ### -----
 
-def filter_activities(filter:str, value:str) -> dict[str, list[Record]]:
+def filter_activities(filter:str, value:str, course:int = 0
+) -> dict[str, list[Record]]:
     """Seek COURSES and lessons/workload/payment info for the given
-    course filter (CLASS, TEACHER or SUBJECT).
+    course filter (CLASS, TEACHER or SUBJECT). If <course> is given,
+    only the data for this course is read.
 
     Return: {course-id: [records]}
 
@@ -69,7 +71,15 @@ def filter_activities(filter:str, value:str) -> dict[str, list[Record]]:
     behind this option is to facilitate combining groups (especially
     from different classes – within one class it is probably better to
     have a single group for this).
+
+    So that the course editor needs no further queries to display the
+    lessons of a course, each record also has the number of courses
+    sharing its LESSON_DATA entry (N_SHARED) and the PARALLEL_LESSONS
+    entry, if any, of its lesson (PARALLEL_TAG, PARALLEL_WEIGHTING).
     """
+    where = f"{filter} = '{value}'"
+    if course:
+        where += f" and Course = {course}"
     q = f"""select
         Course,
         CLASS,
@@ -97,7 +107,11 @@ def filter_activities(filter:str, value:str) -> dict[str, list[Record]]:
         coalesce(LENGTH, 0) LENGTH,
         coalesce(TIME, '') TIME,
         coalesce(PLACEMENT, '') PLACEMENT,
-        coalesce(ROOMS, '') ROOMS
+        coalesce(ROOMS, '') ROOMS,
+
+        coalesce(N_SHARED, 0) N_SHARED,
+        coalesce(PARALLEL_LESSONS.TAG, '') PARALLEL_TAG,
+        coalesce(PARALLEL_LESSONS.WEIGHTING, '') PARALLEL_WEIGHTING
 
         from COURSES
 
@@ -111,7 +125,13 @@ def filter_activities(filter:str, value:str) -> dict[str, list[Record]]:
         -- do I really want to include the lessons here?
         left join LESSONS using (Lesson_group)  -- includes pay-only items
 
-        where {filter} = '{value}'
+        left join PARALLEL_LESSONS on PARALLEL_LESSONS.lesson_id = Lid
+        left join (
+            select Lesson_data SHARED_LD, count(*) N_SHARED
+            from COURSE_LESSONS group by Lesson_data
+        ) on SHARED_LD = Lesson_data
+
+        where {where}
         order by CLASS, SUBJECT, GRP, TEACHER
     """
     # Where a course has no associated "activities",field  Lesson_group
@@ -1,7 +1,7 @@
 """
 core/db_access.py
 
-Last updated:  2023-07-10
+Last updated:  2026-10-19
 
 Helper functions for accessing the database.
 
@@ -52,16 +52,19 @@ T = TRANSLATIONS("core.db_access")
 ### +++++
 
 from typing import Union
+import threading
+import sqlite3
+from itertools import count
 
 from datetime import datetime
 from shutil import copyfile
 from glob import glob
 
 from core.base import Dates
-from ui.ui_base import (
-    ### QtCore:
-    QMetaType,
-    ### QtSql:
+# Only QtCore and QtSql are needed here (not the GUI), so that the
+# database can also be used in command-line tools.
+from PyQt6.QtCore import QMetaType
+from PyQt6.QtSql import (
     QSqlDatabase,
     QSqlQuery,
     QSqlRecord,
@@ -69,6 +72,24 @@ from ui.ui_base import (
 )
 db_sqlrecord = QSqlRecord
 
+# Incremented whenever the default database connection is (re)opened
+_OPEN_COUNT = 0
+
+# Incremented by the functions of this module which change data,
+# from whichever thread they are called, see <db_data_version>
+_WRITE_COUNT = 0
+_WRITE_LOCK = threading.Lock()
+
+# A single connection, shared by all threads, for reading the SQLite
+# "data_version": (database path, open count, connection)
+_VERSION_DB = None
+_VERSION_LOCK = threading.Lock()
+
+# Connections for background threads, see <db_connection>
+_THREAD_DB = threading.local()
+_THREAD_SERIAL = count(1)    # gives each clone a unique name
+_DEFAULT_CONNECTION = "qt_sql_default_connection"
+
 class NoRecord(Exception):
     pass
 
@@ -100,6 +121,8 @@ def open_database(dbfile=None):
         con = None  # needed to release the database object
         QSqlDatabase.removeDatabase(connectionName)
     # Open the connection
+    global _OPEN_COUNT
+    _OPEN_COUNT += 1
     con = QSqlDatabase.addDatabase("QSQLITE")
     con.setDatabaseName(dbpath)
     assert con.open(), f"Cannot open database at {dbpath}"
@@ -109,10 +132,86 @@ def open_database(dbfile=None):
     return con
 
 
+def db_connection() -> QSqlDatabase:
+    """Return the connection to the current database for the calling
+    thread. A QtSql connection may only be used in the thread which
+    created it, so in a background thread a clone of the default
+    connection is opened. This should be closed by calling
+    <db_release_thread> before the thread finishes its task.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return QSqlDatabase.database()
+    try:
+        return _THREAD_DB.con
+    except AttributeError:
+        pass
+    con = QSqlDatabase.cloneDatabase(
+        _DEFAULT_CONNECTION, f"wz_thread_{next(_THREAD_SERIAL)}"
+    )
+    assert con.open(), f"Cannot open database at {con.databaseName()}"
+    foreign_keys_on = "PRAGMA foreign_keys = ON"
+    assert QSqlQuery(foreign_keys_on, con).isActive(), (
+        f"Failed: {foreign_keys_on}"
+    )
+    _THREAD_DB.con = con
+    return con
+
+
+def db_release_thread():
+    """Close the database connection of the calling (background)
+    thread, if it has one.
+    """
+    try:
+        con = _THREAD_DB.con
+    except AttributeError:
+        return
+    del _THREAD_DB.con
+    tag = con.connectionName()
+    con.close()
+    con = None  # needed to release the database object
+    QSqlDatabase.removeDatabase(tag)
+
+
 def db_name():
     """Return the "name" (file path) of the default database.
     """
-    return QSqlDatabase.database().databaseName()
+    return db_connection().databaseName()
+
+
+def db_data_version() -> tuple[str, int, int, int]:
+    """Return a value which changes whenever data in the default
+    database is changed. This can be used to check the validity of
+    cached data, also when this is built in a background thread.
+    The value comprises the database path, a counter of the openings
+    of the default connection, a counter of the changes made by the
+    functions of this module (in any thread) and the SQLite
+    "data_version". The latter is always read using the same
+    connection, it changes when any other connection – in another
+    thread or process – commits a change.
+    """
+    global _VERSION_DB
+    dbpath = db_name()
+    with _VERSION_LOCK:
+        if _VERSION_DB is None or _VERSION_DB[:2] != (dbpath, _OPEN_COUNT):
+            if _VERSION_DB is not None:
+                _VERSION_DB[2].close()
+            _VERSION_DB = (
+                dbpath,
+                _OPEN_COUNT,
+                sqlite3.connect(dbpath, check_same_thread=False),
+            )
+        data_version = _VERSION_DB[2].execute(
+            "PRAGMA data_version"
+        ).fetchone()[0]
+    return (dbpath, _OPEN_COUNT, _WRITE_COUNT, data_version)
+
+
+def _data_changed():
+    """Called by the functions which change data in the database.
+    """
+    global _WRITE_COUNT
+    with _WRITE_LOCK:
+        _WRITE_COUNT += 1
 
 
 class DatabaseShortAccess:
@@ -229,7 +328,7 @@ class Record:
 
 
 def db_select(query_text: str) -> list[Record]:
-    query = QSqlQuery(query_text)
+    query = QSqlQuery(query_text, db_connection())
     if not query.isActive():
         error = query.lastError()
         REPORT("ERROR", f"SQL query failed: {error.text()}\n  {query_text}")
@@ -241,7 +340,7 @@ def db_select(query_text: str) -> list[Record]:
 
 #TODO: Replace this by db_select?
 def db_query(query_text):
-    query = QSqlQuery(query_text)
+    query = QSqlQuery(query_text, db_connection())
     if not query.isActive():
         error = query.lastError()
         REPORT("ERROR", f"SQL query failed: {error.text()}\n  {query_text}")
@@ -334,7 +433,7 @@ def db_read_table(
     d = " DISTINCT" if distinct else ""
     qtext = f"SELECT{d} {f} FROM {table}{where_clause}{o}"
     # print("§§§", qtext)
-    query = QSqlQuery(qtext)
+    query = QSqlQuery(qtext, db_connection())
     rec = query.record()
     nfields = rec.count()
     value_list = []
@@ -459,8 +558,9 @@ def db_update_fields(table, field_values, *wheres, **keys):
     f = ", ".join(fields)
     qtext = f"UPDATE {table} SET {f}{where_clause}"
     # print("§§§", qtext)
-    query = QSqlQuery()
+    query = QSqlQuery(db_connection())
     if query.exec(qtext):
+        _data_changed()
         n = query.numRowsAffected()
         if n == 1:
             return True
@@ -493,8 +593,9 @@ def sql_insert_from_dict(table, field_dict):
 def db_new_row(table, **values):
     qtext = sql_insert_from_dict(table, values)
     # print("§§§", qtext)
-    query = QSqlQuery()
+    query = QSqlQuery(db_connection())
     if query.exec(qtext):
+        _data_changed()
         newid = query.lastInsertId()
         # print("-->", newid)
         return newid
@@ -523,8 +624,9 @@ def db_delete_rows(table, *wheres, **keys):
         where_clause = ""
     qtext = f"DELETE FROM {table}{where_clause}"
     # print("§§§", qtext)
-    query = QSqlQuery()
+    query = QSqlQuery(db_connection())
     if query.exec(qtext):
+        _data_changed()
         return True
     error = query.lastError()
     REPORT("ERROR", error.text())
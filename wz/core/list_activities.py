@@ -1,7 +1,7 @@
 """
 core/list_activities.py
 
-Last updated:  2023-05-30
+Last updated:  2026-10-19
 
 Present information on activities for teachers and classes/groups.
 The information is formatted in pdf documents using the reportlab
@@ -54,8 +54,8 @@ from core.basic_data import (
 )
 from core.db_access import db_read_fields
 from core.activities import read_db, ActivityItem
-import lib.pylightxl as xl
-from tables.pdf_table import TablePages
+# <lib.pylightxl> and <tables.pdf_table> (reportlab) are only imported
+# when a table is actually generated.
 
 DECIMAL_SEP = CONFIG["DECIMAL_SEP"]
 
@@ -198,6 +198,7 @@ def class_list(clist: list[ActivityItem]):
 def write_xlsx(xl_db, filepath):
     """Write a pylightxl "database" to the given path.
     """
+    import lib.pylightxl as xl
     xl.writexl(db=xl_db, fn=filepath)
 
 
@@ -215,6 +216,7 @@ def make_teacher_table_xlsx(activity_lists):
         "H_workload",
         "H_pay",
     ]
+    import lib.pylightxl as xl
     db = xl.Database()
     teachers = get_teachers()
     for t in teachers:
@@ -250,6 +252,7 @@ def make_teacher_table_xlsx(activity_lists):
 
 
 def make_class_table_xlsx(activity_lists):
+    import lib.pylightxl as xl
     db = xl.Database()
     headers = [
         "H_subject",
@@ -389,6 +392,7 @@ def make_teacher_table_room(activity_lists):
         headers.append(T[h])
         colwidths.append(w)
 
+    from tables.pdf_table import TablePages
     pdf = TablePages(
         title=T["teacher_activities"],
         author=CONFIG["SCHOOL_NAME"],
@@ -515,6 +519,7 @@ def make_teacher_table_pay(activity_lists):
         headers.append(T[h])
         colwidths.append(w)
 
+    from tables.pdf_table import TablePages
     pdf = TablePages(
         title=T["teacher_workload_pay"],
         author=CONFIG["SCHOOL_NAME"],
@@ -616,6 +621,7 @@ def make_class_table_pdf(activity_lists, lg_2_c):
         headers.append(T[h])
         colwidths.append(w)
 
+    from tables.pdf_table import TablePages
     pdf = TablePages(
         title=T["class_lessons"],
         author=CONFIG["SCHOOL_NAME"],
@@ -810,7 +816,7 @@ if __name__ == "__main__":
     if filepath and os.path.isabs(filepath):
         if not filepath.endswith(".xlsx"):
             filepath += ".xlsx"
-        xl.writexl(db=tdb, fn=filepath)
+        write_xlsx(tdb, filepath)
         print("  --->", filepath)
 
     cdb = make_class_table_xlsx(cl_lists)
@@ -818,5 +824,5 @@ if __name__ == "__main__":
     if filepath and os.path.isabs(filepath):
         if not filepath.endswith(".xlsx"):
             filepath += ".xlsx"
-        xl.writexl(db=cdb, fn=filepath)
+        write_xlsx(cdb, filepath)
         print("  --->", filepath)
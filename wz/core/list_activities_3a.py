@@ -1,7 +1,7 @@
 """
 core/list_activities.py
 
-Last updated:  2023-07-26
+Last updated:  2026-10-19
 
 Present information on activities for teachers and classes/groups.
 The information is formatted in pdf documents using the reportlab
@@ -56,8 +56,8 @@ from core.course_data_3a import get_pay_value, Record
 #from core.db_access import db_read_fields
 from core.activities_3a import read_from_db
 
-import lib.pylightxl as xl
-from tables.pdf_table import TablePages
+# <lib.pylightxl> and <tables.pdf_table> (reportlab) are only imported
+# when a table is actually generated.
 
 DECIMAL_SEP = CONFIG["DECIMAL_SEP"]
 
@@ -190,6 +190,7 @@ def class_list(clist: list[Record], lg_ll):
 def write_xlsx(xl_db, filepath):
     """Write a pylightxl "database" to the given path.
     """
+    import lib.pylightxl as xl
     xl.writexl(db=xl_db, fn=filepath)
 
 
@@ -209,6 +210,7 @@ def make_teacher_table_xlsx(activities):
         "H_lessons",        # Pay calculation
         "H_pay",            # Pay units
     ]
+    import lib.pylightxl as xl
     db = xl.Database()
     teachers = get_teachers()
     lg_ll = activities["Lg_LESSONS"]
@@ -246,6 +248,7 @@ def make_teacher_table_xlsx(activities):
 
 
 def make_class_table_xlsx(activities):
+    import lib.pylightxl as xl
     db = xl.Database()
     headers = [
         "H_subject",
@@ -388,6 +391,7 @@ def make_teacher_table_room(activities):
         headers.append(T[h])
         colwidths.append(w)
 
+    from tables.pdf_table import TablePages
     pdf = TablePages(
         title=T["teacher_activities"],
         author=CONFIG["SCHOOL_NAME"],
@@ -510,6 +514,7 @@ def make_teacher_table_pay(activities):
         headers.append(T[h])
         colwidths.append(w)
 
+    from tables.pdf_table import TablePages
     pdf = TablePages(
         title=T["teacher_workload_pay"],
         author=CONFIG["SCHOOL_NAME"],
@@ -613,6 +618,7 @@ def make_class_table_pdf(activities):
         headers.append(T[h])
         colwidths.append(w)
 
+    from tables.pdf_table import TablePages
     pdf = TablePages(
         title=T["class_lessons"],
         author=CONFIG["SCHOOL_NAME"],
@@ -812,7 +818,7 @@ if __name__ == "__main__":
     if filepath and os.path.isabs(filepath):
         if not filepath.endswith(".xlsx"):
             filepath += ".xlsx"
-        xl.writexl(db=cdb, fn=filepath)
+        write_xlsx(cdb, filepath)
         print("  --->", filepath)
 
 #    quit(0)
@@ -822,5 +828,5 @@ if __name__ == "__main__":
     if filepath and os.path.isabs(filepath):
         if not filepath.endswith(".xlsx"):
             filepath += ".xlsx"
-        xl.writexl(db=tdb, fn=filepath)
+        write_xlsx(tdb, filepath)
         print("  --->", filepath)
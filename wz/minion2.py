@@ -1,7 +1,7 @@
 """
 minion.py
 
-Last updated:  2023-01-01
+Last updated:  2026-10-19
 
 Read MINION-formatted configuration data.
 
@@ -74,6 +74,11 @@ name, e.g.:
     &MACRO1: [A list of words]
     ...
     DEF1: { X: &MACRO1 }
+
+Parsing is relatively slow, so the results of <parse_file> are cached
+("compiled") in a "__pycache__" folder next to the source file, using
+the "marshal" format. A cached file is only used if the modification
+time and size of the source file match.
 """
 
 ### Messages
@@ -104,10 +109,38 @@ _STRING = '"'
 _REGEX = r'(\s+|#|:|\[|\]|\{|\}|")'  # all special items
 ESCAPE_DICT = {r"\n": "\n", r"\/": "\\", r"\"": '"', r"\t": "\t"}
 
-from typing import Dict
-import re, gzip, unicodedata
+_CACHE_MAGIC = b"MINIONC\x01"
+_CACHE_FOLDER = "__pycache__"
+_CACHE_ENDING = ".minionc"
 
-_RXSUB = "|".join([re.escape(e) for e in ESCAPE_DICT])
+from typing import Dict
+import os, sys, re, gzip, unicodedata, marshal
+
+_RXSUB = re.compile("|".join([re.escape(e) for e in ESCAPE_DICT]))
+# Whitespace other than ' ' and line breaks is left to the line parser
+_ODD_SPACE = re.compile(r"[^\S \n]")
+
+# The text of a complex-string on one line: a '"' only ends the string
+# if it is not preceded by '\'.
+_STRING_PIECE = r'[^"\n]*(?:(?<=\\)"[^"\n]*)*'
+# A continuation line (after '\') may not start with an escaped '"'.
+_STRING_CONTINUATION = (
+    r'(?:\n(?:#[^\n]*)?(?=\n))*'     # empty and comment lines
+    r'\n\\(?:[^"\n]' + _STRING_PIECE + r')?'
+)
+# The tokens of a (cleaned) MINION text, each with the preceding spaces,
+# line breaks and comments (which are not passed on). Spaces and
+# comments at the end of the text are matched without a token.
+_TOKENS = re.compile(
+    r'(?:\s|#[^\n]*)*(?:'
+    r'(?P<word>[^\s#:\[\]{}"]+)'
+    r'|(?P<symbol>[:\[\]{}])'
+    r'|(?P<string>"(?P<content>' + _STRING_PIECE
+    + r'(?:' + _STRING_CONTINUATION + r')*)(?P<end>")?)'
+    r'|\Z)'
+)
+# Line breaks (see <str.splitlines>), not removed as control characters
+_LINE_BREAKS = set("\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029")
 
 MACRO_BUILTINS: Dict[str, dict] = {}
 
@@ -116,16 +149,35 @@ class MinionError(Exception):
     pass
 
 
+class _Reject(Exception):
+    """Raised by the fast parser for input it doesn't handle.
+    """
+
+
 ###
 
 
+def cache_path(fpath):
+    """Return the path of the cache file for the given MINION file.
+    """
+    d, f = os.path.split(os.path.abspath(fpath))
+    return os.path.join(d, _CACHE_FOLDER, f + _CACHE_ENDING)
+
+
 class Minion:
-    """An impure recursive-descent parser for a MINION string.
+    """A recursive-descent parser for a MINION string. There are two
+    implementations: a fast one, for which the text is first split into
+    tokens in a single regular-expression pass (<tokenize>), and the
+    original line-based one, which is used for anything the fast parser
+    doesn't accept. The latter defines the error messages.
     Usage:
         minion = Minion()
         python_dict = minion.parse(text)
     """
 
+    def __init__(self, use_cache=True):
+        self.use_cache = use_cache
+
     #
     def report(self, message, **params):
         msg = message.format(**params)
@@ -136,29 +188,70 @@ class Minion:
 
     #
     def parse(self, text, filepath=None):
-        self.toplevel = None  # Needed for macros
+        """Parse the text, first using the fast token-based parser. This
+        only handles input which is valid for the line-based parser, and
+        then gives the same result. Anything else – including all
+        erroneous input – is passed to the line-based parser, so that
+        the error messages are exactly those of the line-based parser.
+        """
         self.filepath = filepath
-        self.line_number = 0
-        self.lines = text.splitlines()
-        data, rest = self.DICT(None)
-        if rest or self.line_number < len(self.lines):
-            self.report(
-                _EARLY_END,
-                line=self.line_number,
-                text=self.lines[self.line_number - 1],
-            )
-        return data
+        try:
+            return self.parse_tokens(text)
+        except _Reject:
+            pass
+        return self.parse_lines(text)
 
     #
     def parse_file(self, fpath, **replacements):
+        # Replacements and builtin macros are not covered by the cache
+        if self.use_cache and not (replacements or MACRO_BUILTINS):
+            return self.parse_file_cached(fpath)
+        return self.parse_replace(
+            self.read_file(fpath), fpath, **replacements
+        )
+
+    #
+    def read_file(self, fpath):
         try:
             with open(fpath, "r", encoding="utf-8") as fh:
-                text = fh.read()
+                return fh.read()
         except FileNotFoundError:
             self.report(_NO_FILE, path=fpath)
         except ValueError:
             self.report(_BAD_FILE, path=fpath)
-        return self.parse_replace(text, fpath, **replacements)
+
+    #
+    def parse_file_cached(self, fpath):
+        """Parse the file, using the cached result if it is up to date.
+        Problems with the cache file are ignored, the source file is
+        then parsed and a new cache file written (if possible).
+        """
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            self.report(_NO_FILE, path=fpath)
+        key = (st.st_mtime_ns, st.st_size, sys.version_info[:2])
+        cpath = cache_path(fpath)
+        try:
+            with open(cpath, "rb") as fh:
+                cdata = fh.read()
+            if cdata.startswith(_CACHE_MAGIC):
+                ckey, data = marshal.loads(cdata[len(_CACHE_MAGIC):])
+                if ckey == key:
+                    return data
+        except (OSError, ValueError, EOFError, TypeError):
+            pass
+        data = self.parse(self.read_file(fpath), fpath)
+        try:
+            os.makedirs(os.path.dirname(cpath), exist_ok=True)
+            tmp = cpath + ".tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(_CACHE_MAGIC)
+                fh.write(marshal.dumps((key, data)))
+            os.replace(tmp, cpath)
+        except (OSError, ValueError):
+            pass
+        return data
 
     #
     def parse_replace(self, text, fpath, **params):
@@ -177,6 +270,152 @@ class Minion:
             self.report(_BAD_GZ_FILE, path=fpath)
         return self.parse_replace(text, fpath, **replacements)
 
+    #
+    def tokenize(self, text):
+        """Split the (cleaned) text into a list of tokens in a single
+        pass. A token is a tuple: (kind, value, position in text). The
+        kind is "w" for a simple-string, "s" for a complex-string or the
+        special character (':', '[', ']', '{', '}'). The end of the input
+        is marked by a token of kind <None>.
+        """
+        tokens = []
+        for m in _TOKENS.finditer(text):
+            kind = m.lastgroup
+            if kind == "word":
+                tokens.append(("w", m.group(kind), m.start(kind)))
+            elif kind == "symbol":
+                tokens.append((m.group(kind), None, m.start(kind)))
+            elif kind is None:
+                break
+            else:
+                if m.group("end") is None:
+                    # Unterminated complex-string
+                    raise _Reject
+                content = m.group("content")
+                if "\n" in content:
+                    pieces = content.split("\n")
+                    # Remove empty and comment lines, and the '\' from
+                    # continuation lines
+                    content = pieces[0] + "".join(
+                        l[1:] for l in pieces[1:] if l and l[0] == "\\"
+                    )
+                if "\\" in content:
+                    content = _RXSUB.sub(
+                        lambda m: ESCAPE_DICT[m.group(0)], content
+                    )
+                tokens.append(("s", content, m.start(kind)))
+        tokens.append((None, None, len(text)))
+        return tokens
+
+    #
+    def parse_tokens(self, text):
+        """The fast parser, see <parse>.
+        """
+        self.toplevel = None  # Needed for macros
+        # "Strip" the lines and remove possible control characters.
+        cc = {
+            ord(ch): None
+            for ch in set(text) - _LINE_BREAKS
+            if unicodedata.category(ch)[0] == "C"
+        }
+        lines = text.splitlines()
+        if cc:
+            lines = [l.translate(cc).strip() for l in lines]
+        else:
+            lines = [l.strip() for l in lines]
+        self.text = "\n".join(lines)
+        if _ODD_SPACE.search(self.text):
+            raise _Reject
+        self.tokens = self.tokenize(self.text)
+        self.index = 0
+        return self.T_DICT(True)
+
+    #
+    def T_DICT(self, toplevel=False):
+        dmap = {}
+        if toplevel:
+            self.toplevel = dmap  # Needed for macros
+        tokens = self.tokens
+        while True:
+            kind, key, pos = tokens[self.index]
+            self.index += 1
+            if kind == "w":
+                # The key must be followed directly by ':'
+                nkind, _, npos = tokens[self.index]
+                if nkind != _DICTK or npos != pos + len(key) or key in dmap:
+                    raise _Reject
+                self.index += 1
+                # There may be no comment before the value
+                if "#" in self.text[npos + 1 : tokens[self.index][2]]:
+                    raise _Reject
+                val = self.T_VALUE()
+                vkind, vword, vpos = tokens[self.index - 1]
+                if vkind == "w":
+                    # A simple-string value may only be followed
+                    # directly by the end of the DICT
+                    nkind, _, npos = tokens[self.index]
+                    if (
+                        nkind
+                        and nkind != _DICT1
+                        and npos == vpos + len(vword)
+                    ):
+                        raise _Reject
+                dmap[key] = val
+            elif kind == (None if toplevel else _DICT1):
+                return dmap
+            else:
+                raise _Reject
+
+    #
+    def T_VALUE(self):
+        kind, val, pos = self.tokens[self.index]
+        self.index += 1
+        if kind == "w":
+            # A simple-string value ... or a macro
+            if val[0] == _MACRO:
+                try:
+                    return self.toplevel[val]
+                except KeyError:
+                    try:
+                        return MACRO_BUILTINS[val]
+                    except KeyError:
+                        raise _Reject
+            return val
+        if kind == "s":
+            return val
+        if kind == _DICT0:
+            return self.T_DICT()
+        if kind == _LIST0:
+            return self.T_LIST()
+        raise _Reject
+
+    #
+    def T_LIST(self):
+        lx = []
+        tokens = self.tokens
+        while True:
+            if tokens[self.index][0] == _LIST1:
+                # End of list
+                self.index += 1
+                return lx
+            lx.append(self.T_VALUE())
+
+    #
+    def parse_lines(self, text):
+        """The line-based parser, see <parse>.
+        """
+        self.toplevel = None  # Needed for macros
+        self.line_number = 0
+        self.lines = text.splitlines()
+        data, rest = self.DICT(None)
+        if rest or self.line_number < len(self.lines):
+            self.report(
+                _EARLY_END,
+                line=self.line_number,
+                text=self.lines[self.line_number - 1],
+            )
+        return data
+
     #
     def read_line(self):
         while True:
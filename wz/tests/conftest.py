@@ -0,0 +1,56 @@
+"""
+tests/conftest.py
+
+Last updated:  2026-10-19
+
+The application modules are imported as in the application itself,
+with the application folder (the parent of this folder) at the start
+of the module search path.
+
+Some modules need the school-data configuration when they are imported.
+If the environment variable WZ_TESTDATA names a school-data folder, this
+is used, otherwise a minimal folder (only the configuration needed for
+importing the modules) is built in a temporary directory.
+"""
+
+import sys, os
+import shutil
+import tempfile
+
+# <core.base> expects the application folder to be <sys.path[0]>
+appdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if appdir in sys.path:
+    sys.path.remove(appdir)
+sys.path.insert(0, appdir)
+
+### +++++
+
+MINIMAL_DATA = {
+    "CONFIG/BASE": 'DECIMAL_SEP: ","\nSCHOOLYEAR_MONTH_1: 8\n',
+    "CONFIG/Calendar": "LAST_DAY: 2027-07-31\n",
+    # Fix the current date, so that the calendar is valid
+    "__TODAY__": "2026-10-19\n",
+}
+
+_TMPDIR = None
+
+### -----
+
+
+def pytest_configure(config):
+    global _TMPDIR
+    from core.base import start
+    datadir = os.environ.get("WZ_TESTDATA")
+    if not datadir:
+        datadir = _TMPDIR = tempfile.mkdtemp(prefix="wz_testdata_")
+        for path, text in MINIMAL_DATA.items():
+            fpath = os.path.join(datadir, *path.split("/"))
+            os.makedirs(os.path.dirname(fpath), exist_ok=True)
+            with open(fpath, "w", encoding="utf-8") as fh:
+                fh.write(text)
+    start.setup(datadir)
+
+
+def pytest_unconfigure(config):
+    if _TMPDIR:
+        shutil.rmtree(_TMPDIR, ignore_errors=True)
@@ -0,0 +1,152 @@
+"""
+tests/test_fet_fragments.py
+
+Last updated:  2026-10-19
+
+The class and teacher fragments of the fet export taken from a
+<FragmentCache> – also after saving and reloading it – must be
+identical to those of an uncached build.
+"""
+
+from timetable.fet_fragments import (
+    FragmentCache,
+    FragmentContext,
+    generate_fragments,
+)
+from timetable.fet_data_3a import (
+    FRAGMENT_MESSAGES,
+    WEIGHTMAP,
+    NPERIODSMAX,
+    SPECIAL_CONSTRAINTS,
+    LUNCH_BREAK,
+    T,
+)
+
+### +++++
+
+DAYS = ["Mo", "Di", "Mi", "Do", "Fr"]
+PERIODS = ["1", "2", "3", "4", "5", "6", "7"]
+
+CLASS_HANDLERS = {
+    "MINDAILY": ("4%+", "Mindestanzahl Stunden pro Tag"),
+    "MAXGAPSWEEKLY": ("0%+", "Höchstanzahl Lücken pro Woche"),
+    "LUNCHBREAK": ("4,5%+", "Mittagspause"),
+    "NOTAFTER": ("", "Nicht nach"),
+    "PAIRGAP": ("", "Lücke zwischen Paaren"),
+}
+TEACHER_HANDLERS = {
+    "MINDAILY": ("2%+", "Mindestanzahl Stunden pro Tag"),
+    "MAXGAPSDAILY": ("", "Höchstanzahl Lücken pro Tag"),
+    "MAXGAPSWEEKLY": ("", "Höchstanzahl Lücken pro Woche"),
+    "MAXBLOCK": ("4%5", "Höchstanzahl Stunden am Stück"),
+    "LUNCHBREAK": ("4,5%+", "Mittagspause"),
+}
+
+### -----
+
+
+def context(periods=PERIODS) -> FragmentContext:
+    return FragmentContext(
+        days=DAYS,
+        periods=periods,
+        class_handlers=CLASS_HANDLERS,
+        teacher_handlers=TEACHER_HANDLERS,
+        weightmap=WEIGHTMAP,
+        nperiods_max=NPERIODSMAX,
+        special_constraints=sorted(SPECIAL_CONSTRAINTS),
+        lunch_break=LUNCH_BREAK,
+        messages={k: str(T[k]) for k in FRAGMENT_MESSAGES},
+    )
+
+
+def jobs() -> list[tuple]:
+    """A variety of class and teacher data, including invalid entries.
+    """
+    jlist = [
+        (("C", "01G"), (
+            "01G", "+++++_+++++_+++++_+++++_++++--",
+            [("MINDAILY", "*"), ("LUNCHBREAK", "*"),
+                ("NOTAFTER", "Ma-De%5"), ("NOTAFTER", "En-Fr%+")],
+            ["A", "B"],
+        )),
+        (("C", "02G"), (
+            "02G", "",
+            [("MINDAILY", "5%+"), ("MINDAILY", "3%+"),
+                ("MAXGAPSWEEKLY", "x"), ("XXX", "1")],
+            [],
+        )),
+        (("C", "03G"), (
+            "03G", "-", [("LUNCHBREAK", "4,9%+")], [],
+        )),
+        (("T", "AB"), (
+            "AB", "++-++_+++++",
+            [("MAXBLOCK", "*"), ("LUNCHBREAK", "5,6%+"),
+                ("MAXGAPSDAILY", "1%+")],
+        )),
+        # A MAXBLOCK weight mapping to <None> gives no constraint
+        (("T", "CD"), (
+            "CD", "", [("MAXBLOCK", "3%-"), ("MINDAILY", "*")],
+        )),
+        (("T", "EF"), (
+            "EF", "--",
+            [("MAXBLOCK", "20%+"), ("MAXGAPSWEEKLY", "2%+"),
+                ("MAXGAPSWEEKLY", "3%+"), ("UNKNOWN", "*")],
+        )),
+    ]
+    for i in range(30):
+        tid = f"T{i:02}"
+        jlist.append((("T", tid), (
+            tid, "+" * (i % 7) + "-",
+            [("MAXBLOCK", f"{i % 6}%{'-123456789+'[i % 11]}"),
+                ("LUNCHBREAK", "*")],
+        )))
+    return jlist
+
+
+def uncached(ctx, jlist) -> list[dict]:
+    return generate_fragments(ctx, jlist)
+
+
+def test_cached_identical(tmp_path):
+    ctx = context()
+    jlist = jobs()
+    expected = uncached(ctx, jlist)
+    path = str(tmp_path / "fet_fragments")
+    cache = FragmentCache(path)
+    assert cache.build(ctx, jlist) == expected
+    assert (cache.hits, cache.misses) == (0, len(jlist))
+    cache.save()
+    # All fragments are reused from the saved cache
+    cache = FragmentCache(path)
+    assert cache.build(ctx, jlist) == expected
+    assert (cache.hits, cache.misses) == (len(jlist), 0)
+
+
+def test_changed_source(tmp_path):
+    ctx = context()
+    jlist = jobs()
+    cache = FragmentCache(str(tmp_path / "fet_fragments"))
+    cache.build(ctx, jlist)
+    # Change the data of one teacher
+    key, (tid, available, cpairs) = jlist[3]
+    jlist[3] = (key, (tid, available, cpairs + [("MINDAILY", "3%+")]))
+    assert cache.build(ctx, jlist) == uncached(ctx, jlist)
+    assert cache.misses == len(jlist) + 1
+    # A change of context invalidates all fragments
+    ctx = context(PERIODS[:-1])
+    assert cache.build(ctx, jlist) == uncached(ctx, jlist)
+    assert cache.misses == 2 * len(jlist) + 1
+
+
+def test_maxblock_weight():
+    ctx = context()
+    fragments = {key: f for (key, _), f in zip(jobs(), uncached(ctx, jobs()))}
+    ctype = "ConstraintTeacherMaxHoursContinuously"
+    assert ctype not in fragments[("T", "CD")]["TIME"]
+    assert fragments[("T", "AB")]["TIME"][ctype] == [{
+        "Weight_Percentage": WEIGHTMAP["5"],
+        "Teacher_Name": "AB",
+        "Maximum_Hours_Continuously": "4",
+        "Active": "true",
+        "Comments": None,
+    }]
@@ -0,0 +1,74 @@
+"""
+tests/test_fet_read_results.py
+
+Last updated:  2026-10-19
+
+The incremental xml reader of the fet results must yield the complete
+wanted elements – also when these are nested – while dropping all other
+elements as soon as they have been completed.
+"""
+
+import io
+import xml.etree.ElementTree as ET
+
+from timetable.fet_read_results_3a import iter_elements
+
+### +++++
+
+XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<fet version="6.9.0">
+<Activities_List>
+<Activity><Id>1</Id><Comments>101</Comments></Activity>
+<Other><Id>x</Id></Other>
+<Activity><Id>2</Id><Comments>102</Comments></Activity>
+</Activities_List>
+<Time_Constraints_List>
+<Group><Activity><Id>3</Id></Activity><Id>g</Id></Group>
+</Time_Constraints_List>
+</fet>
+"""
+
+### -----
+
+
+def test_wanted_elements():
+    found = [
+        (e.tag, e.findtext("Id"), e.findtext("Comments"))
+        for e in iter_elements(io.BytesIO(XML), {"Activity"})
+    ]
+    assert found == [
+        ("Activity", "1", "101"),
+        ("Activity", "2", "102"),
+        ("Activity", "3", None),
+    ]
+
+
+def test_nested_wanted_elements():
+    found = []
+    for e in iter_elements(io.BytesIO(XML), {"Activity", "Group"}):
+        found.append((e.tag, [c.tag for c in e]))
+    assert found[-2:] == [
+        ("Activity", ["Id"]),
+        ("Group", ["Activity", "Id"]),
+    ]
+
+
+def test_elements_dropped(monkeypatch):
+    """The root element has no children left when parsing is finished.
+    """
+    roots = []
+    iterparse = ET.iterparse
+
+    def _iterparse(source, events=None):
+        for event, elem in iterparse(source, events=events):
+            if not roots:
+                roots.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(ET, "iterparse", _iterparse)
+    ids = [
+        e.findtext("Id")
+        for e in iter_elements(io.BytesIO(XML), {"Activity"})
+    ]
+    assert ids == ["1", "2", "3"]
+    assert len(roots[0]) == 0
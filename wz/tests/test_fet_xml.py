@@ -0,0 +1,149 @@
+"""
+tests/test_fet_xml.py
+
+Last updated:  2026-10-19
+
+The streamed xml output of <write_xml> must be identical, byte for
+byte, to the output of the previous export code:
+    xmltodict.unparse(data, pretty=True).replace("\t", "   ")
+"""
+
+import pytest
+
+xmltodict = pytest.importorskip("xmltodict")
+
+from timetable.fet_data_3a import write_xml
+
+### +++++
+
+# The structure of a (small) fet file, as built by <gen_fetdata>
+FET_DATA = {
+    "fet": {
+        "@version": "6.9.0",
+        "Mode": "Official",
+        "Institution_Name": "Schule „Am Bach“ & Co <Test>",
+        "Comments": None,
+        "Days_List": {
+            "Number_of_Days": "2",
+            "Day": [{"Name": "Mo"}, {"Name": "Di"}],
+        },
+        "Hours_List": {
+            "Number_of_Hours": "1",
+            "Hour": [{"Name": "1"}],
+        },
+        "Teachers_List": {
+            "Teacher": [
+                {
+                    "Name": "AB",
+                    "Target_Number_of_Hours": "0",
+                    "Qualified_Subjects": None,
+                    "Comments": "Anna Bär",
+                },
+                {
+                    "Name": "CD",
+                    "Target_Number_of_Hours": "0",
+                    "Qualified_Subjects": None,
+                    "Comments": 'Carl "C" D\'Or',
+                },
+            ],
+        },
+        "Students_List": {
+            "Year": [
+                {
+                    "Name": "01G",
+                    "Number_of_Students": "0",
+                    "Comments": None,
+                    "Number_of_Categories": "1",
+                    "Separator": ".",
+                    "Category": {
+                        "Number_of_Divisions": "2",
+                        "Division": ["A", "B"],
+                    },
+                    "Group": [
+                        {
+                            "Name": "01G.A",
+                            "Number_of_Students": "0",
+                            "Comments": None,
+                        },
+                    ],
+                },
+            ],
+        },
+        "Activities_List": {
+            "Activity": [
+                {
+                    "Teacher": ["AB", "CD"],
+                    "Subject": "Ma",
+                    "Students": "01G",
+                    "Duration": "2",
+                    "Total_Duration": "2",
+                    "Id": "1",
+                    "Activity_Group_Id": "0",
+                    "Active": True,
+                    "Comments": None,
+                },
+                {
+                    "Subject": "^",
+                    "Students": "01G.A",
+                    "Duration": "1",
+                    "Total_Duration": "1",
+                    "Id": "2",
+                    "Activity_Group_Id": "0",
+                    "Active": False,
+                    "Comments": None,
+                },
+            ],
+        },
+        "Time_Constraints_List": {
+            "ConstraintBasicCompulsoryTime": {
+                "Weight_Percentage": "100",
+                "Active": "true",
+                "Comments": None,
+            },
+            "ConstraintActivityPreferredStartingTimes": [
+                {
+                    "Weight_Percentage": "100",
+                    "Activity_Id": "2",
+                    "Number_of_Preferred_Starting_Times": "1",
+                    "Preferred_Starting_Time": [
+                        {
+                            "Preferred_Starting_Day": "Mo",
+                            "Preferred_Starting_Hour": "1",
+                        },
+                    ],
+                    "Active": "true",
+                    "Comments": None,
+                },
+            ],
+            "ConstraintMinDaysBetweenActivities": [],
+        },
+        "Space_Constraints_List": {
+            "ConstraintBasicCompulsorySpace": {
+                "Weight_Percentage": "100",
+                "Active": "true",
+                "Comments": None,
+            },
+        },
+        "Note": {"@lang": "de", "#text": "Text mit Attribut"},
+    }
+}
+
+### -----
+
+
+def old_output(data) -> bytes:
+    xml = xmltodict.unparse(data, pretty=True)
+    return xml.replace("\t", "   ").encode("utf-8")
+
+
+def test_write_xml_identical(tmp_path):
+    path = tmp_path / "tt.fet"
+    write_xml(str(path), FET_DATA)
+    assert path.read_bytes() == old_output(FET_DATA)
+
+
+def test_write_xml_single_element(tmp_path):
+    path = tmp_path / "tt.fet"
+    data = {"fet": {"@version": "6.9.0"}}
+    write_xml(str(path), data)
+    assert path.read_bytes() == old_output(data)
@@ -0,0 +1,120 @@
+"""
+tests/test_import_time.py
+
+Last updated:  2026-10-19
+
+Check the start-up costs of the core modules and the main-window pages,
+using "python -X importtime" in a fresh interpreter. The budgets are
+generous (cumulative import time in milliseconds), they should only be
+exceeded if a heavy import creeps back in at module level.
+Also the modules which are only needed for particular output formats
+(spreadsheets, pdf, xml) must not be loaded.
+
+The page modules need PyQt6, the German locale and a school-data
+folder (default "TESTDATA", can be set in the environment variable
+WZ_TESTDATA), otherwise these tests are skipped.
+"""
+
+import sys, os
+import subprocess
+import locale
+from importlib.util import find_spec
+
+import pytest
+
+appdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+basedir = os.path.dirname(appdir)
+
+### +++++
+
+# module -> cumulative import time budget (ms)
+BUDGETS = {
+    "core.base": 200,
+    "core.db_access": 1000,
+    "ui.wz_main": 2000,
+    "ui.modules.class_editor": 2000,
+    "ui.modules.teacher_editor": 2000,
+    "ui.modules.course_editor": 2000,
+}
+
+# These should only be imported when they are actually used
+DEFERRED = ("pylightxl", "reportlab", "xmltodict")
+
+# The GUI modules need the locale set in <ui.ui_base>
+GUI_LOCALE = "de_DE.UTF-8"
+
+DATADIR = os.environ.get("WZ_TESTDATA") or os.path.join(basedir, "TESTDATA")
+
+### -----
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Import <module> in a new interpreter with "-X importtime".
+    As in the application, <core.base> is imported (and set up) first,
+    for the GUI modules also <ui.ui_base>.
+    Return the cumulative import times (microseconds) of all modules
+    which were loaded: {module: time}.
+    """
+    lines = [
+        # As in the application, <appdir> is <sys.path[0]>
+        f"import sys; sys.path.insert(0, {appdir!r})",
+        "from core.base import start",
+    ]
+    if module.startswith("ui."):
+        lines += [
+            f"start.setup({DATADIR!r})",
+            "import ui.ui_base",
+            # Don't let an error pop up a (modal) message box
+            "sys.excepthook = sys.__excepthook__",
+        ]
+    lines.append(f"import {module}")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    cp = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(lines)],
+        cwd=appdir,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert cp.returncode == 0, cp.stderr
+    times = {}
+    for line in cp.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            self_us, cumulative, name = line[12:].split("|")
+            times[name.strip()] = int(cumulative)
+        except ValueError:
+            continue    # the header line
+    return times
+
+
+def gui_locale_available() -> bool:
+    saved = locale.setlocale(locale.LC_ALL)
+    try:
+        locale.setlocale(locale.LC_ALL, GUI_LOCALE)
+    except locale.Error:
+        return False
+    locale.setlocale(locale.LC_ALL, saved)
+    return True
+
+
+@pytest.mark.parametrize("module", list(BUDGETS))
+def test_import_budget(module):
+    if module != "core.base" and find_spec("PyQt6") is None:
+        pytest.skip("PyQt6 not available")
+    if module.startswith("ui."):
+        if not gui_locale_available():
+            pytest.skip(f"Locale {GUI_LOCALE} not available")
+        if not os.path.isfile(os.path.join(DATADIR, "CONFIG", "BASE")):
+            pytest.skip(f"No school data in {DATADIR}")
+    times = import_times(module)
+    ms = times[module] / 1000
+    assert ms <= BUDGETS[module], (
+        f"Importing {module} took {ms:.0f} ms"
+        f" (budget {BUDGETS[module]} ms)"
+    )
+    loaded = [m for m in DEFERRED if m in times]
+    assert not loaded, f"{module} imports {', '.join(loaded)}"
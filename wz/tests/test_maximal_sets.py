@@ -0,0 +1,58 @@
+"""
+tests/test_maximal_sets.py
+
+Last updated:  2026-10-19
+
+<maximal_sets> (subset elimination for the day-separation constraints)
+must give the same result as a direct comparison of all pairs of sets.
+"""
+
+import random
+
+import pytest
+
+from timetable.fet_data_3a import maximal_sets
+
+### +++++
+
+
+def brute_force(sets: list[frozenset]) -> set[frozenset]:
+    return {s for s in sets if not any(s < t for t in sets)}
+
+
+def random_sets(rng: random.Random) -> list[frozenset]:
+    """The vertex sets of the edges and of the closed neighbourhoods of
+    a small random graph, distinct and in order of decreasing size.
+    """
+    n = rng.randint(1, 8)
+    p = rng.random()
+    edges = [
+        (i, j) for i in range(n) for j in range(i + 1, n)
+        if rng.random() < p
+    ]
+    sets = {frozenset(e) for e in edges}
+    for v in range(n):
+        sets.add(frozenset(
+            [v] + [j for i, j in edges if i == v]
+            + [i for i, j in edges if j == v]
+        ))
+    sets = list(sets)
+    rng.shuffle(sets)
+    sets.sort(key=len, reverse=True)
+    return sets
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random_graphs(seed):
+    sets = random_sets(random.Random(seed))
+    result = maximal_sets(sets)
+    assert len(result) == len(set(result))
+    assert set(result) == brute_force(sets)
+
+
+def test_edge_cases():
+    assert maximal_sets([]) == []
+    assert maximal_sets([frozenset()]) == [frozenset()]
+    assert maximal_sets([frozenset({1}), frozenset()]) == [frozenset({1})]
+    a, b = frozenset({1, 2}), frozenset({2, 3})
+    assert set(maximal_sets([a, b, frozenset({2})])) == {a, b}
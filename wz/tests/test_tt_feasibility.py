@@ -0,0 +1,43 @@
+"""
+tests/test_tt_feasibility.py
+
+Last updated:  2026-10-19
+
+The greedy colouring of the conflict graph must terminate and respect
+day boundaries and adjacencies, also when a lesson is too long for a day.
+"""
+
+from timetable.tt_feasibility import ConflictGraph
+
+
+def graph(nperiods: int, lengths: list[int], edges=()) -> ConflictGraph:
+    """Build a conflict graph directly, without timetable data.
+    """
+    g = ConflictGraph.__new__(ConflictGraph)
+    g.ndays = 5
+    g.nperiods = nperiods
+    g.lids = list(range(1, len(lengths) + 1))
+    g.length = list(lengths)
+    g.adjacent = [set() for l in lengths]
+    for i, j in edges:
+        g.adjacent[i].add(j)
+        g.adjacent[j].add(i)
+    return g
+
+
+def test_too_long_lesson():
+    assert graph(2, [3]).greedy_colouring() == [-1]
+    assert graph(2, [2]).greedy_colouring() == [0]
+
+
+def test_too_long_lesson_with_neighbours():
+    g = graph(2, [3, 2, 1], [(0, 1), (0, 2), (1, 2)])
+    starts = g.greedy_colouring()
+    assert starts[0] == -1
+    # The other lessons don't overlap and don't cross a day boundary
+    assert sorted(starts[1:]) == [0, 2]
+
+
+def test_day_boundary():
+    g = graph(3, [2, 2], [(0, 1)])
+    assert sorted(g.greedy_colouring()) == [0, 3]
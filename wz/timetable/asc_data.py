@@ -1,5 +1,5 @@
 """
-timetable/asc_data.py - last updated 2023-05-30
+timetable/asc_data.py - last updated 2026-10-19
 
 Prepare aSc-timetables input from the database ...
 
@@ -54,8 +54,6 @@ T = TRANSLATIONS("timetable.asc_data")
 
 import re
 
-import xmltodict
-
 from core.db_access import db_read_fields
 from core.basic_data import (
     get_days,
@@ -510,6 +508,7 @@ def build_dict(
 # --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
 
 if __name__ == "__main__":
+    import xmltodict
     from core.db_access import open_database
     open_database()
 
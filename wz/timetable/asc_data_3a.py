@@ -1,5 +1,5 @@
 """
-timetable/asc_data.py - last updated 2023-07-27
+timetable/asc_data.py - last updated 2026-10-19
 
 Prepare aSc-timetables input from the database ...
 
@@ -54,8 +54,6 @@ T = TRANSLATIONS("timetable.asc_data")
 
 import re
 
-import xmltodict
-
 from core.db_access import db_read_fields
 from core.basic_data_3 import (
     get_days,
@@ -66,7 +64,7 @@ from core.basic_data_3 import (
     get_rooms,
     timeslot2index,
 )
-from core.activities_3a import collect_activity_groups
+from core.activities_3a import export_model
 
 def idsub(tag):
     """In aSc, "id" fields may only contain ASCII alphanumeric characters,
@@ -296,31 +294,15 @@ class TimetableCourses:
         self.class_counter = {}  # {class -> number}
 
         ### Add asc activities
-        lg_map = collect_activity_groups()
-        for lg, act in lg_map.items():
+        for act in export_model():
             ## Collect classes / groups
-            class_set = set()
             group_set = set()
-            teacher_set = set()
             room_list = []
             extra_room = False
-            room_set = set()
-            for klass, g, sid, tid, room in act.course_list:
-                class_set.add(klass)
-                if g and klass != "--":
-                    # Only add a group "Students" entry if there is a
-                    # group and a (real) class
-                    group_set.update(asc_class_groups[klass][g])
-                if room:
-                    room_set.add(room)
-                if tid != "--":
-                    teacher_set.add(tid)
-
-            ## Get the subject-id from the block-tag, if it has a
-            ## subject, otherwise from the course (of which there
-            ## should be only one!)
-            if act.block_sid:
-                sid = act.block_sid
+            for klass, g in act.groups:
+                group_set.update(asc_class_groups[klass][g])
+            room_set = act.rooms
+            sid = act.sid
 
             ## Handle rooms
             ## aSc doesn't support xml-input of complex room info, so
@@ -345,10 +327,10 @@ class TimetableCourses:
             # Build aSc lesson items
             for l in sorted(durations):
                 self.aSc_lesson(
-                    classes=class_set,
+                    classes=set(act.classes),
                     sid=idsub(sid),
                     groups=group_set,
-                    tids=teacher_set,
+                    tids=act.teachers,
                     sl_list=durations[l],
                     duration=l,
                     rooms=room_list,
@@ -511,6 +493,7 @@ def build_dict(
 # --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
 
 if __name__ == "__main__":
+    import xmltodict
     from core.db_access import open_database
     open_database("wz_db.sqlite")
 
@@ -1,5 +1,5 @@
 """
-timetable/fet_data.py - last updated 2023-06-18
+timetable/fet_data.py - last updated 2026-10-19
 
 Prepare fet-timetables input from the database ...
 
@@ -58,8 +58,6 @@ T = TRANSLATIONS("timetable.fet_data")
 
 from itertools import product
 
-import xmltodict
-
 from core.base import class_group_split
 from core.basic_data import (
     get_days,
@@ -1579,6 +1577,7 @@ def add_constraints(constraints, ctype, constraint_list):
 # --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
 
 if __name__ == "__main__":
+    import xmltodict
     from core.db_access import open_database
     #dbfile = "wzx.sqlite"
     dbfile = "wz.sqlite"
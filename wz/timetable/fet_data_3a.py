@@ -1,5 +1,5 @@
 """
-timetable/fet_data.py - last updated 2023-07-30
+timetable/fet_data.py - last updated 2026-10-19
 
 Prepare fet-timetables input from the database ...
 
@@ -50,15 +50,13 @@ if __name__ == "__main__":
     # TODO: Temporary redirection to use real data (there isn't any test data yet!)
     start.setup(os.path.join(basedir, 'TESTDATA'))
 
-from typing import Optional, NamedTuple
+from typing import Optional, NamedTuple, Iterable
 
 T = TRANSLATIONS("timetable.fet_data")
 
 ### +++++
 
-from itertools import product
-
-import xmltodict
+from xml.sax.saxutils import XMLGenerator
 
 from core.base import class_group_split
 from core.basic_data_3 import (
@@ -82,10 +80,28 @@ from core.db_access import (
     db_read_mappings,
     db_name,
 )
-from core.activities_3a import collect_activity_groups
+from core.activities_3a import export_model
+from timetable.fet_fragments import (
+    FragmentCache,
+    FragmentContext,
+    timeoff,
+)
 
 LUNCH_BREAK = '^'
 
+# The messages used in building class and teacher fragments
+FRAGMENT_MESSAGES = (
+    "UNKNOWN_CLASS_CONSTRAINT",
+    "MULTIPLE_CLASS_CONSTRAINT",
+    "INVALID_CLASS_LUNCHBREAK",
+    "CLASS_CONSTRAINT",
+    "UNKNOWN_TID_CONSTRAINT",
+    "MULTIPLE_TID_CONSTRAINT",
+    "INVALID_TID_LUNCHBREAK",
+    "TEACHER_CONSTRAINT",
+    "INVALID_CONSTRAINT_VALUE",
+)
+
 ### -----
 
 
@@ -250,49 +266,12 @@ def get_classes_fet() -> list[tuple]:
 
 
 def timeoff_fet(available: str) -> tuple[list[dict[str, str]], set[str]]:
-    """Build "not available" entries for the given data.
-    The period values are from '-' through 1 to 9 and '+'.
-    fet, however, only deals with "blocked" "available" values.
-    Also collect possible (lunch) break times, sorted by day.
-    Return: (
-        [{"Day": day, "Hour": period}, ... ],
-        {day -> {period, ... }}
-    )
+    """Build "not available" entries for the given data, see
+    <timetable.fet_fragments.timeoff>.
     """
-    try:
-        day_periods = available.split("_")
-    except:
-        day_periods = ""
-    days = get_days().key_list()
-    periods = get_periods().key_list()
-    blocked_periods = []
-    possible_breaks = {}
-    i = 0
-    for d in days:
-        try:
-            ddata = day_periods[i]
-        except IndexError:
-            ddata = ""
-        i += 1
-        j = 0
-        pval = "+"  # default value
-        for p in periods:
-            try:
-                pval = ddata[j]
-                if pval != '-':
-                    pval = '+'
-            except IndexError:
-                # No value, use last available
-                pass
-            j += 1
-            if pval == "-":
-                blocked_periods.append({"Day": d, "Hour": p})
-            else:
-                try:
-                    possible_breaks[d].add(p)
-                except KeyError:
-                    possible_breaks[d] = {p}
-    return blocked_periods, possible_breaks
+    return timeoff(
+        available, get_days().key_list(), get_periods().key_list()
+    )
 
 
 class TimetableCourses:
@@ -315,12 +294,23 @@ class TimetableCourses:
         "class2sid2ag2aids",
         "fancy_rooms",
         "block_classes",
+        "fragments",
     )
 
-    def __init__(self, fet_classes):
+    def __init__(self, fet_classes, fragments: FragmentCache = None):
         self.fet_classes = fet_classes
+        # Cache for the class and teacher constraints
+        self.fragments = fragments or FragmentCache()
         self.group2atoms = fet_classes.g2a
         self.TT_CONFIG = MINION(DATAPATH("CONFIG/TIMETABLE"))
+        self.class_handlers = {
+            c: (d, t)   # The "handler" field is not needed here
+            for c, h, d, t in self.TT_CONFIG["CLASS_CONSTRAINT_HANDLERS"]
+        }
+        self.teacher_handlers = {
+            c: (d, t)   # The "handler" field is not needed here
+            for c, h, d, t in self.TT_CONFIG["TEACHER_CONSTRAINT_HANDLERS"]
+        }
 
     def read_lessons(self, block_classes=None):
         """Produce a list of fet-activity (lesson) items with a
@@ -358,30 +348,22 @@ class TimetableCourses:
 # single group). Has this a negative impact anywhere?
         atoms2group = self.fet_classes.a2g
 
-        ### Collect data for each lesson-group
-        lg_map = collect_activity_groups()
         ### Add fet activities
-        for lg, act in lg_map.items():
-            class_set = set()
+        for act in export_model():
+            lg = act.lesson_group
+            sid = act.sid
             group_sets = {} # {klass -> set of atomic groups}
-            teacher_set = set()
-            room_set = set()
-            for klass, g, sid, tid, room in act.course_list:
-                class_set.add(klass)
-                if g and klass != "--":
-                    # Only add a group "Students" entry if there is a
-                    # group and a (real) class
-                    if g == "*":
-                        g = ""
-                    gatoms = self.group2atoms[klass][g]
-                    try:
-                        group_sets[klass].update(gatoms)
-                    except KeyError:
-                        group_sets[klass] = set(gatoms)
-                if room:
-                    room_set.add(room)
-                if tid != "--":
-                    teacher_set.add(tid)
+            for klass, g in act.groups:
+                if g == "*":
+                    g = ""
+                gatoms = self.group2atoms[klass][g]
+                try:
+                    group_sets[klass].update(gatoms)
+                except KeyError:
+                    group_sets[klass] = set(gatoms)
+            class_set = act.classes
+            teacher_set = act.teachers
+            room_set = act.rooms
             # Get "usable" groups
             groups = []
             for klass, aset in group_sets.items():
@@ -400,12 +382,6 @@ class TimetableCourses:
                             lg=lg, groups=",".join(key)
                         ),
                     )
-            # Get the subject-id from the block-tag, if it has a
-            # subject, otherwise from the course (of which there
-            # should be only one!)
-            #print("???", type(act), act)
-            if act.block_sid:
-                sid = act.block_sid
             ## Handle rooms
             # Simplify room lists, check for room conflicts.
             # Collect room allocations which must remain open (containing
@@ -482,7 +458,7 @@ class TimetableCourses:
             ## Generate the activity or activities
             if teacher_set:
                 if len(teacher_set) == 1:
-                    activity0 = {"Teacher": teacher_set.pop()}
+                    activity0 = {"Teacher": next(iter(teacher_set))}
                 else:
                     activity0 = {"Teacher": sorted(teacher_set)}
             else:
@@ -733,148 +709,48 @@ class TimetableCourses:
     def next_activity_id(self):
         return len(self.activities) + 1
 
-    def class_lunch_breaks(self, klass, possible_breaks, lb):
-        """Add activities and constraints for lunch breaks.
-        There needs to be a lunch-break activity for every sub-group of
-        a class, to be on the safe side.
-        Note that the number of periods offered should be at least two,
-        because if only one period is possible it would probably be
-        better to set the class as "not available" in that period.
-        As the breaks are implemented here by means of a lunch-break
-        activity, the weight isn't of much use.
+    def fragment_context(self) -> FragmentContext:
+        """Return a snapshot of the data needed to build the class and
+        teacher fragments (see <timetable.fet_fragments>).
         """
-        try:
-            lbp, lbw = lb.split('%')
-            if lbw == '-':
-                return
-        except ValueError:
-            REPORT("ERROR", T["INVALID_CLASS_LUNCHBREAK"].format(
-                klass=klass, val=lb
-            ))
-            return
-        pmap = get_periods()
-        lbplist = []
-        for p in lbp.split(','):
-            try:
-                i = pmap.index(p)
-            except KeyError:
-                REPORT("ERROR", T["INVALID_CLASS_LUNCHBREAK"].format(
-                    klass=klass, val=lb
-                ))
-                return
-            lbplist.append(p)
-        # Get a list of groups (without class). To ensure that also
-        # classes with no groups get lunch breaks, add a null string to
-        # an empty list.
-        atomic_groups = self.group2atoms[klass][""] or [""]
-        # print(f"??? {klass}", atomic_groups)
-        constraints = []
-        for day, periods0 in possible_breaks.items():
-            periods = [p for p in lbplist if p in periods0]
-            if len(periods) != len(lbplist):
-                continue    # free period at lunchtime – don't add constraint
-            nperiods = str(len(periods))
-            # Add lunch-break activity
-            for g in atomic_groups:
-                aid_s = str(self.next_activity_id())
-                activity = {
-                    # no teacher
-                    "Subject": LUNCH_BREAK,
-                    "Students": f"{klass}.{g}" if g else klass,
-                    "Duration": "1",
-                    "Total_Duration": "1",
-                    "Id": aid_s,
-                    "Activity_Group_Id": "0",
-                    "Active": "true",
-                    "Comments": None,
-                }
-                self.activities.append(activity)
-                # Add constraint
-                constraints.append(
-                    {
-                        "Weight_Percentage": "100",
-                        "Activity_Id": aid_s,
-                        "Number_of_Preferred_Starting_Times": nperiods,
-                        "Preferred_Starting_Time": [
-                            {
-                                "Preferred_Starting_Day": day,
-                                "Preferred_Starting_Hour": p,
-                            }
-                            for p in periods
-                        ],
-                        "Active": "true",
-                        "Comments": None,
-                    }
-                )
-        add_constraints(
-            self.time_constraints,
-            "ConstraintActivityPreferredStartingTimes",
-            constraints,
+        return FragmentContext(
+            days=get_days().key_list(),
+            periods=get_periods().key_list(),
+            class_handlers=self.class_handlers,
+            teacher_handlers=self.teacher_handlers,
+            weightmap=WEIGHTMAP,
+            nperiods_max=NPERIODSMAX,
+            special_constraints=sorted(SPECIAL_CONSTRAINTS),
+            lunch_break=LUNCH_BREAK,
+            messages={k: str(T[k]) for k in FRAGMENT_MESSAGES},
         )
 
-    def teacher_lunch_breaks(self, tid, possible_breaks, lb):
-        """Add activities and constraints for lunch breaks.
-        Note that the number of periods offered should be at least two,
-        because if only one period is possible it would probably be
-        better to set the teacher as "not available" in that period.
+    def build_fragments(self, jobs: list[tuple]) -> list[dict]:
+        """Return the fragments for the given jobs, (key, args) pairs,
+        in the same order, see <FragmentCache.build>.
         """
-        try:
-            lbp, lbw = lb.split('%')
-            if lbw == '-':
-                return
-        except ValueError:
-            REPORT("ERROR", T["INVALID_TID_LUNCHBREAK"].format(
-                tid=tid, val=lb
-            ))
-            return
-        pmap = get_periods()
-        lbplist = []
-        for p in lbp.split(','):
-            try:
-                i = pmap.index(p)
-            except KeyError:
-                REPORT("ERROR", T["INVALID_TID_LUNCHBREAK"].format(
-                    tid=tid, val=lb
-                ))
-                return
-            lbplist.append(p)
+        return self.fragments.build(self.fragment_context(), jobs)
+
+    def add_fragment(self, fragment: dict):
+        """Add the activities and constraints of a class or teacher
+        fragment, reporting the messages which arose when it was
+        generated. The activity ids of the lunch breaks are allocated
+        here, so the fragments must be added in a fixed order.
+        The fragment itself may be cached, so it is not modified.
+        """
+        for level, message in fragment["MESSAGES"]:
+            REPORT(level, message)
+        for ctype, clist in fragment["TIME"].items():
+            add_constraints(self.time_constraints, ctype, list(clist))
         constraints = []
-        for day, periods0 in possible_breaks.items():
-            periods = [p for p in lbplist if p in periods0]
-            if len(periods) != len(lbplist):
-                continue    # free period at lunchtime – don't add constraint
-            nperiods = str(len(periods))
-            # Add lunch-break activity
+        for activity, constraint in fragment["LUNCH"]:
             aid_s = str(self.next_activity_id())
-            activity = {
-                "Teacher": tid,
-                "Subject": LUNCH_BREAK,
-                # no students
-                "Duration": "1",
-                "Total_Duration": "1",
-                "Id": aid_s,
-                "Activity_Group_Id": "0",
-                "Active": "true",
-                "Comments": None,
-            }
+            activity = dict(activity)
+            activity["Id"] = aid_s
             self.activities.append(activity)
-            # Add constraint
-            constraints.append(
-                {
-                    "Weight_Percentage": "100",
-                    "Activity_Id": aid_s,
-                    "Number_of_Preferred_Starting_Times": nperiods,
-                    "Preferred_Starting_Time": [
-                        {
-                            "Preferred_Starting_Day": day,
-                            "Preferred_Starting_Hour": p,
-                        }
-                        for p in periods
-                    ],
-                    "Active": "true",
-                    "Comments": None,
-                }
-            )
+            constraint = dict(constraint)
+            constraint["Activity_Id"] = aid_s
+            constraints.append(constraint)
         add_constraints(
             self.time_constraints,
             "ConstraintActivityPreferredStartingTimes",
@@ -936,17 +812,10 @@ class TimetableCourses:
                         except KeyError:
                             aidset_map[l] = {aids_fs}
         ### Eliminate subsets
-        lengths = sorted(aidset_map, reverse=True)
-        newsets = aidset_map[lengths[0]]  # the largest sets
-        for l in lengths[1:]:
-            xsets = set()
-            for aidset in aidset_map[l]:
-                for s in newsets:
-                    if aidset < s:
-                        break
-                else:
-                    xsets.add(aidset)
-            newsets.update(xsets)
+        newsets = maximal_sets(
+            aidset for l in sorted(aidset_map, reverse=True)
+            for aidset in aidset_map[l]
+        )
         ### Sort the sets
         aids_list = sorted([sorted(s) for s in newsets])
         for aids in aids_list:
@@ -991,15 +860,28 @@ class TimetableCourses:
                 ag2aids2 = sid2ag2aids[sid2]
             except KeyError:
                 continue
-            aidpairs = set()
-            for ag in ag2aids1:
+            # Index the activities of the first subject by the shared
+            # atomic groups, so that each partner activity is only
+            # visited once per activity, however many atomic groups
+            # the two have in common.
+            aid2ags: dict[int, list[str]] = {}
+            for ag, aids in ag2aids1.items():
                 if ag in ag2aids2:
-                    for aidpair in product(ag2aids1[ag], ag2aids2[ag]):
-                        if not (
-                            aidpair[0] in self.locked_aids
-                            and aidpair[1] in self.locked_aids
-                        ):
-                            aidpairs.add(aidpair)
+                    for aid in aids:
+                        try:
+                            aid2ags[aid].append(ag)
+                        except KeyError:
+                            aid2ags[aid] = [ag]
+            aidpairs = set()
+            for aid1, ags in aid2ags.items():
+                if len(ags) == 1:
+                    partners = ag2aids2[ags[0]]
+                else:
+                    partners = set().union(*(ag2aids2[ag] for ag in ags))
+                locked = aid1 in self.locked_aids
+                for aid2 in partners:
+                    if not (locked and aid2 in self.locked_aids):
+                        aidpairs.add((aid1, aid2))
             result.append((aidpairs, percent))
         return result
 
@@ -1110,12 +992,10 @@ class TimetableCourses:
         """Add time constraints according to the entries in the database
         table TT_CLASSES. The default values are in the TIMETABLE
         configuration: CLASS_CONSTRAINT_HANDLERS.
+        The constraints for each class are generated as a "fragment"
+        (see <build_fragments>).
         """
         ### Fetch class constraint data
-        self.class_handlers = {
-            c: (d, t)   # The "handler" field is not needed here
-            for c, h, d, t in self.TT_CONFIG["CLASS_CONSTRAINT_HANDLERS"]
-        }
         tt_constraints = {
             cl: (a, c)
             for cl, a, c in db_read_fields(
@@ -1123,17 +1003,7 @@ class TimetableCourses:
                 ("CLASS", "AVAILABLE", "CONSTRAINTS")
             )
         }
-        ### Supported constraints
-        tconstraints = {
-            # AVAILABLE
-            "ConstraintStudentsSetNotAvailableTimes": (blocked := []),
-            # MINDAILY
-            "ConstraintStudentsSetMinHoursDaily": (constraints_m := []),
-            # MAXGAPSWEEKLY
-            "ConstraintStudentsSetMaxGapsPerWeek": (constraints_gw := []),
-        }
-        xconstraints = {}   # collect SPECIAL_CONSTRAINTS
-        unsupported = set()
+        jobs = []
         classes = get_classes()
         for klass, _ in classes.get_class_list():
             if klass in self.block_classes:
@@ -1142,117 +1012,25 @@ class TimetableCourses:
                 available, cstr = tt_constraints[klass]
             except KeyError:
                 continue
-            constraints = {}
-            for c, v in read_pairs(cstr):
+            jobs.append((
+                ("C", klass),
+                (
+                    klass,
+                    available,
+                    read_pairs(cstr),
+                    self.group2atoms[klass][""]
+                )
+            ))
+        xconstraints = {}   # collect SPECIAL_CONSTRAINTS
+        for (key, args), fragment in zip(jobs, self.build_fragments(jobs)):
+            klass = key[1]
+            self.add_fragment(fragment)
+            for c, v in fragment["SPECIAL"]:
+                xv = (klass, v)
                 try:
-                    d, t = self.class_handlers[c]
+                    xconstraints[c].append(xv)
                 except KeyError:
-                    REPORT(
-                        "ERROR",
-                        T["UNKNOWN_CLASS_CONSTRAINT"].format(
-                            klass=klass, c=c
-                        )
-                    )
-                    continue
-                if v == '*':
-                    v = d
-                # For classes some constraints can be multiple!
-                if c in SPECIAL_CONSTRAINTS:
-                    # These are handled separately
-                    xv = (klass, v)
-                    try:
-                        xconstraints[c].append(xv)
-                    except KeyError:
-                        xconstraints[c] = [xv]
-                elif c in constraints:
-                    # All other constraints may only occur once
-                    REPORT("ERROR", T["MULTIPLE_CLASS_CONSTRAINT"].format(
-                        klass=klass, name=t
-                    ))
-                else:
-                    constraints[c] = v
-            # Handle availability
-            blocked_periods, possible_breaks = timeoff_fet(available)
-            if blocked_periods:
-                blocked.append(
-                    {
-                        "Weight_Percentage": "100",
-                        "Students": klass,
-                        "Number_of_Not_Available_Times": str(
-                            len(blocked_periods)
-                        ),
-                        "Not_Available_Time": blocked_periods,
-                        "Active": "true",
-                        "Comments": None,
-                    }
-                )
-            # Lunch breaks
-            try:
-                lb = constraints.pop("LUNCHBREAK")
-            except KeyError:
-                pass
-            else:
-                self.class_lunch_breaks(klass, possible_breaks, lb)
-            # Other constraints ...
-            try:
-                minl = self.nperiods_constraint(
-                    constraints, "MINDAILY"
-                )
-            except ValueError as e:
-                REPORT(
-                    "ERROR",
-                    T["CLASS_CONSTRAINT"].format(
-                        klass=klass,
-                        constraint=self.class_handlers["MINDAILY"][-1],
-                        e=e
-                    ),
-                )
-            else:
-                if minl:
-                    # print("$$$$$ MINDAILY", klass, minl)
-                    constraints_m.append(
-                        {
-                            "Weight_Percentage": "100",  # necessary!
-                            "Minimum_Hours_Daily": minl[0],
-                            "Students": klass,
-                            "Allow_Empty_Days": "false",
-                            "Active": "true",
-                            "Comments": None,
-                        }
-                    )
-            try:
-                gw = self.nperiods_constraint(
-                    constraints, "MAXGAPSWEEKLY"
-                )
-            except ValueError as e:
-                REPORT(
-                    "ERROR",
-                    T["CLASS_CONSTRAINT"].format(
-                        klass=klass,
-                        constraint=self.class_handlers["MAXGAPSWEEKLY"][-1],
-                        e=e
-                    ),
-                )
-            else:
-                if gw:
-                    # print("$$$$$ MAXGAPSWEEKLY", klass, gw)
-                    constraints_gw.append(
-                        {
-                            "Weight_Percentage": "100",  # necessary!
-                            "Max_Gaps": gw[0],
-                            "Students": klass,
-                            "Active": "true",
-                            "Comments": None,
-                        }
-                    )
-        uc = [self.class_handlers[c][-1] for c in unsupported]
-        if uc:
-            REPORT(
-                "WARNING",
-                T["UNSUPPORTED_CLASS_CONSTRAINTS"].format(l="\n".join(uc))
-            )
-        for c, clist in tconstraints.items():
-            add_constraints(self.time_constraints, c, clist)
+                    xconstraints[c] = [xv]
         for c, xlist in xconstraints.items():
             try:
                 func = getattr(self, f"constraints_{c}")
@@ -1265,12 +1043,10 @@ class TimetableCourses:
         """Add time constraints according to the entries in the database
         table TT_TEACHERS. The default values are in the TIMETABLE
         configuration: TEACHER_CONSTRAINT_HANDLERS.
+        The constraints for each teacher are generated as a "fragment"
+        (see <build_fragments>).
         """
         ### Fetch teacher constraint data
-        self.teacher_handlers = {
-            c: (d, t)   # The "handler" field is not needed here
-            for c, h, d, t in self.TT_CONFIG["TEACHER_CONSTRAINT_HANDLERS"]
-        }
         tt_constraints = {
             t: (a, c)
             for t, a, c in db_read_fields(
@@ -1278,21 +1054,7 @@ class TimetableCourses:
                 ("TID", "AVAILABLE", "CONSTRAINTS")
             )
         }
-        ### Supported constraints
-        tconstraints = {
-            # AVAILABLE
-            "ConstraintTeacherNotAvailableTimes": (blocked := []),
-            # MINDAILY
-            "ConstraintTeacherMinHoursDaily": (constraints_m := []),
-            # MAXGAPSDAILY
-            "ConstraintTeacherMaxGapsPerDay": (constraints_gd := []),
-            # MAXGAPSWEEKLY
-            "ConstraintTeacherMaxGapsPerWeek": (constraints_gw := []),
-            # MAXBLOCK
-            "ConstraintTeacherMaxHoursContinuously": (constraints_u := []),
-        }
-        unsupported = set()
-        ### Not-available times
+        jobs = []
         teachers = get_teachers()
         for tid in teachers:
             if tid not in used:
@@ -1301,174 +1063,17 @@ class TimetableCourses:
                 available, cstr = tt_constraints[tid]
             except KeyError:
                 continue
-            constraints = {}
-            for c, v in read_pairs(cstr):
-                try:
-                    d, t = self.teacher_handlers[c]
-                except KeyError:
-                    REPORT(
-                        "ERROR",
-                        T["UNKNOWN_TID_CONSTRAINT"].format(tid=tid, c=c)
-                    )
-                    continue
-                if c in constraints:
-                    # All constraints may only occur once
-                    REPORT("ERROR", T["MULTIPLE_TID_CONSTRAINT"].format(
-                        tid=tid, name=t
-                    ))
-                    continue
-                constraints[c] = d if v == '*' else v
-            # Handle availability
-            blocked_periods, possible_breaks = timeoff_fet(available)
-            if blocked_periods:
-                blocked.append(
-                    {
-                        "Weight_Percentage": "100",
-                        "Teacher": tid,
-                        "Number_of_Not_Available_Times": str(
-                            len(blocked_periods)
-                        ),
-                        "Not_Available_Time": blocked_periods,
-                        "Active": "true",
-                        "Comments": None,
-                    }
-                )
-            # Lunch breaks
-            try:
-                lb = constraints.pop("LUNCHBREAK")
-            except KeyError:
-                pass
-            else:
-                self.teacher_lunch_breaks(tid, possible_breaks, lb)
-            # Other constraints ...
-            try:
-                minl = self.nperiods_constraint(
-                    constraints, "MINDAILY"
-                )
-            except ValueError as e:
-                REPORT(
-                    "ERROR",
-                    T["TEACHER_CONSTRAINT"].format(
-                        tid=tid,
-                        constraint=self.teacher_handlers["MINDAILY"][-1],
-                        e=e
-                    ),
-                )
-            else:
-                if minl:
-                    # print("$$$$$ MINDAILY", tid, minl)
-                    constraints_m.append(
-                        {
-                            "Weight_Percentage": "100",  # necessary!
-                            "Teacher_Name": tid,
-                            "Minimum_Hours_Daily": minl[0],
-                            "Allow_Empty_Days": "true",
-                            "Active": "true",
-                            "Comments": None,
-                        }
-                    )
-            try:
-                gd = self.nperiods_constraint(
-                    constraints, "MAXGAPSDAILY"
-                )
-            except ValueError as e:
-                REPORT(
-                    "ERROR",
-                    T["TEACHER_CONSTRAINT"].format(
-                        tid=tid,
-                        constraint=self.teacher_handlers["MAXGAPSDAILY"][-1],
-                        e=e
-                    ),
-                )
-            else:
-                if gd:
-                    # print("$$$$$ MAXGAPSDAILY", tid, gd)
-                    constraints_gd.append(
-                        {
-                            "Weight_Percentage": "100",  # necessary!
-                            "Teacher_Name": tid,
-                            "Max_Gaps": gd[0],
-                            "Active": "true",
-                            "Comments": None,
-                        }
-                    )
-            try:
-                gw = self.nperiods_constraint(
-                    constraints, "MAXGAPSWEEKLY"
-                )
-            except ValueError as e:
-                REPORT(
-                    "ERROR",
-                    T["TEACHER_CONSTRAINT"].format(
-                        tid=tid,
-                        constraint=self.teacher_handlers["MAXGAPSWEEKLY"][-1],
-                        e=e
-                    ),
-                )
-            else:
-                if gw:
-                    # print("$$$$$ MAXGAPSWEEKLY", tid, gw)
-                    constraints_gw.append(
-                        {
-                            "Weight_Percentage": "100",  # necessary!
-                            "Teacher_Name": tid,
-                            "Max_Gaps": gw[0],
-                            "Active": "true",
-                            "Comments": None,
-                        }
-                    )
-            try:
-                u = self.nperiods_constraint(
-                    constraints, "MAXBLOCK"
-                )
-            except ValueError as e:
-                REPORT(
-                    "ERROR",
-                    T["TEACHER_CONSTRAINT"].format(
-                        tid=tid,
-                        constraint=self.teacher_handlers["MAXBLOCK"][-1],
-                        e=e
-                    ),
-                )
-            else:
-                if u:
-                    n, w = u
-                    # print("$$$$$ MAXBLOCK", tid, u, WEIGHTMAP[w])
-                    if w:
-                        constraints_u.append(
-                            {
-                                "Weight_Percentage": WEIGHTMAP[w],
-                                "Teacher_Name": tid,
-                                "Maximum_Hours_Continuously": n,
-                                "Active": "true",
-                                "Comments": None,
-                            }
-                        )
-            unsupported.update(constraints)
+            jobs.append((("T", tid), (tid, available, read_pairs(cstr))))
+        unsupported = set()
+        for fragment in self.build_fragments(jobs):
+            self.add_fragment(fragment)
+            unsupported.update(fragment["UNSUPPORTED"])
         uc = [self.teacher_handlers[c][-1] for c in unsupported]
         if uc:
             REPORT(
                 "WARNING",
                 T["UNSUPPORTED_TEACHER_CONSTRAINTS"].format(l="\n".join(uc))
             )
-        for c, clist in tconstraints.items():
-            add_constraints(self.time_constraints, c, clist)
-
-    def nperiods_constraint(
-        self, cmap: dict[str, str], constraint: str
-    ) -> Optional[tuple[str, str]]:
-        try:
-            val = cmap.pop(constraint)
-        except KeyError:
-            return None
-        try:
-            v, w = val.split('%', 1)
-            number = int(v)
-            if number >= 0 and number <= NPERIODSMAX and w in WEIGHTMAP:
-                return v, w
-        except ValueError:
-            pass
-        raise ValueError(T["INVALID_CONSTRAINT_VALUE"].format(val=val))
 
     def add_parallels(self):
         """Add constraints for lessons starting at same time.
@@ -1563,6 +1168,112 @@ class TimetableCourses:
             )
 
 
+def make_fet_file(
+    fet_file: str, fragments: FragmentCache = None
+) -> TimetableCourses:
+    """Generate the fet input file for the current database.
+    Return the <TimetableCourses> object, which contains further
+    information about the export.
+    """
+    courses = TimetableCourses(get_classes_fet(), fragments)
+    courses.read_lessons()
+    courses.add_teacher_constraints(courses.timetable_teachers)
+    courses.add_class_constraints()
+    courses.constraint_day_separation()
+    courses.add_parallels()
+    courses.add_further_constraints()
+    write_xml(fet_file, courses.gen_fetdata())
+    return courses
+
+
+def maximal_sets(sets: Iterable[frozenset]) -> list[frozenset]:
+    """Return those of the (distinct) sets which are not a proper subset
+    of another one. The sets must be supplied in order of decreasing
+    size.
+    An index maps each element to the kept sets containing it, so only
+    the sets sharing the element with the fewest entries need to be
+    tested.
+    """
+    kept = []
+    index: dict[int, list[int]] = {}
+    for s in sets:
+        # An empty set must be compared with all kept sets
+        candidates = min(
+            (index.get(e, ()) for e in s),
+            key=len,
+            default=range(len(kept)),
+        )
+        for i in candidates:
+            if s < kept[i]:
+                break
+        else:
+            for e in s:
+                try:
+                    index[e].append(len(kept))
+                except KeyError:
+                    index[e] = [len(kept)]
+            kept.append(s)
+    return kept
+
+
+def write_xml(path: str, data: dict, indent: str = "   "):
+    """Write the nested dict/list structure <data> as an xml file.
+    The structure follows the conventions of <xmltodict.unparse>:
+    keys starting with '@' are attributes, "#text" is text content,
+    lists are repeated elements and <None> is an empty element.
+    The elements are written to the file as they are reached, so that
+    no copy of the document is built in memory.
+    """
+    with open(path, "w", encoding="utf-8") as fh:
+        xg = XMLGenerator(fh, "utf-8", short_empty_elements=False)
+        xg.startDocument()
+        for tag, value in data.items():
+            _write_element(xg, tag, value, 0, indent)
+        xg.endDocument()
+
+
+def _xml_text(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _write_element(xg, tag, value, depth, indent):
+    if isinstance(value, list):
+        for v in value:
+            _write_element(xg, tag, v, depth, indent)
+        return
+    pad = indent * depth
+    xg.ignorableWhitespace(pad)
+    if isinstance(value, dict):
+        attrs = {}
+        children = []
+        text = None
+        for k, v in value.items():
+            if k[0] == '@':
+                attrs[k[1:]] = _xml_text(v)
+            elif k == "#text":
+                text = v
+            else:
+                children.append((k, v))
+        xg.startElement(tag, attrs)
+        if text is not None:
+            xg.characters(_xml_text(text))
+        if children:
+            xg.ignorableWhitespace("\n")
+            for k, v in children:
+                _write_element(xg, k, v, depth + 1, indent)
+            xg.ignorableWhitespace(pad)
+    else:
+        xg.startElement(tag, {})
+        if value is not None:
+            xg.characters(_xml_text(value))
+    xg.endElement(tag)
+    if depth:
+        # As in <xmltodict.unparse>, no newline after the root element
+        xg.ignorableWhitespace("\n")
+
+
 def add_constraint(constraints, ctype, constraint):
     """Add a constraint of type <ctype> to the master constraint
     list-mapping <constraints> (either time or space constraints).
@@ -1631,7 +1342,8 @@ if __name__ == "__main__":
 
     # quit(0)
 
-    courses = TimetableCourses(fet_classes)
+    fragments = FragmentCache(DATAPATH("TIMETABLE/out/fet_fragments"))
+    courses = TimetableCourses(fet_classes, fragments)
     if _TEST:
         print("\n ********** READ LESSON DATA **********\n")
     #courses.read_lessons(["08K"])
@@ -1697,15 +1409,21 @@ if __name__ == "__main__":
 
     # quit(0)
 
+    print("\nFeasibility pre-analysis ...")
+    from timetable.tt_feasibility import check_feasibility
+    check_feasibility()
+
     outdir = DATAPATH("TIMETABLE/out")
     os.makedirs(outdir, exist_ok=True)
     if True:
 
-        xml_fet = xmltodict.unparse(courses.gen_fetdata(), pretty=True)
-
         outpath = os.path.join(outdir, "tt_out_3a.fet")
-        with open(outpath, "w", encoding="utf-8") as fh:
-            fh.write(xml_fet.replace("\t", "   "))
+        write_xml(outpath, courses.gen_fetdata())
+        fragments.save()
+        print(
+            f"\nCached fragments: {fragments.hits} reused,"
+            f" {fragments.misses} generated"
+        )
         print("\nTIMETABLE XML ->", outpath)
 
         # Write unspecified room allocation info
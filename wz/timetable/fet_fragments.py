@@ -0,0 +1,558 @@
+"""
+timetable/fet_fragments.py
+
+Last updated:  2026-10-19
+
+The parts ("fragments") of a fet export which are generated separately
+for each class or teacher – their constraints and lunch-break
+activities.
+
+The fragments are built by pure functions from a snapshot of the
+source data (<FragmentContext> and the class or teacher fields). This
+module doesn't use the builtins set up by <core.base.start>, the
+message templates are also passed in the context.
+
+A fragment is cached together with a digest of the source data from
+which it was generated, so it can be reused as long as this data
+hasn't changed. The cache is saved as a zlib-compressed "marshal"
+file, so a fragment may only contain basic python types (str, int,
+None, list, tuple, dict).
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+### +++++
+
+from typing import NamedTuple, Optional
+import os
+import hashlib
+import marshal
+import zlib
+
+FRAGMENT_CACHE_MAGIC = b"WZFETF\x00\x02"
+
+### -----
+
+
+class FragmentContext(NamedTuple):
+    days: list[str]
+    periods: list[str]
+    class_handlers: dict[str, tuple[str, str]]      # c -> (default, name)
+    teacher_handlers: dict[str, tuple[str, str]]    # c -> (default, name)
+    weightmap: dict[str, Optional[str]]
+    nperiods_max: int
+    special_constraints: list[str]
+    lunch_break: str                # "subject" of lunch-break activities
+    messages: dict[str, str]        # message templates
+
+
+def timeoff(available: str, days: list[str], periods: list[str]
+) -> tuple[list[dict[str, str]], dict[str, set[str]]]:
+    """Build "not available" entries for the given data.
+    The period values are from '-' through 1 to 9 and '+'.
+    fet, however, only deals with "blocked" "available" values.
+    Also collect possible (lunch) break times, sorted by day.
+    Return: (
+        [{"Day": day, "Hour": period}, ... ],
+        {day -> {period, ... }}
+    )
+    """
+    try:
+        day_periods = available.split("_")
+    except:
+        day_periods = ""
+    blocked_periods = []
+    possible_breaks = {}
+    i = 0
+    for d in days:
+        try:
+            ddata = day_periods[i]
+        except IndexError:
+            ddata = ""
+        i += 1
+        j = 0
+        pval = "+"  # default value
+        for p in periods:
+            try:
+                pval = ddata[j]
+                if pval != '-':
+                    pval = '+'
+            except IndexError:
+                # No value, use last available
+                pass
+            j += 1
+            if pval == "-":
+                blocked_periods.append({"Day": d, "Hour": p})
+            else:
+                try:
+                    possible_breaks[d].add(p)
+                except KeyError:
+                    possible_breaks[d] = {p}
+    return blocked_periods, possible_breaks
+
+
+def nperiods_value(
+    ctx: FragmentContext, cmap: dict[str, str], constraint: str
+) -> Optional[tuple[str, str]]:
+    try:
+        val = cmap.pop(constraint)
+    except KeyError:
+        return None
+    try:
+        v, w = val.split('%', 1)
+        number = int(v)
+        if number >= 0 and number <= ctx.nperiods_max and w in ctx.weightmap:
+            return v, w
+    except ValueError:
+        pass
+    raise ValueError(
+        ctx.messages["INVALID_CONSTRAINT_VALUE"].format(val=val)
+    )
+
+
+def lunch_break_times(
+    ctx: FragmentContext, possible_breaks: dict[str, set[str]], lb: str
+) -> list[tuple[str, list[str]]]:
+    """Return the (day, periods) pairs for the lunch-break activities
+    specified by the constraint value <lb>. Days on which a lunch
+    period is not available are skipped – there is already a free
+    period at lunchtime.
+    Note that the number of periods offered should be at least two,
+    because if only one period is possible it would probably be
+    better to set the class or teacher as "not available" in that
+    period. As the breaks are implemented by means of a lunch-break
+    activity, the weight isn't of much use.
+    Raise a <ValueError> if the value is invalid.
+    """
+    lbp, lbw = lb.split('%')
+    if lbw == '-':
+        return []
+    lbplist = []
+    for p in lbp.split(','):
+        if p not in ctx.periods:
+            raise ValueError(p)
+        lbplist.append(p)
+    times = []
+    for day, periods0 in possible_breaks.items():
+        periods = [p for p in lbplist if p in periods0]
+        if len(periods) == len(lbplist):
+            times.append((day, periods))
+    return times
+
+
+def lunch_break(
+    ctx: FragmentContext,
+    tid: str,
+    students: str,
+    day: str,
+    periods: list[str]
+) -> list[dict]:
+    """Return a lunch-break activity and its time constraint for the
+    given teacher or students. The activity id is set when the
+    activity is added to the export.
+    """
+    activity = {}
+    if tid:
+        activity["Teacher"] = tid
+    activity["Subject"] = ctx.lunch_break
+    if students:
+        activity["Students"] = students
+    activity.update({
+        "Duration": "1",
+        "Total_Duration": "1",
+        "Id": None,
+        "Activity_Group_Id": "0",
+        "Active": "true",
+        "Comments": None,
+    })
+    constraint = {
+        "Weight_Percentage": "100",
+        "Activity_Id": None,
+        "Number_of_Preferred_Starting_Times": str(len(periods)),
+        "Preferred_Starting_Time": [
+            {
+                "Preferred_Starting_Day": day,
+                "Preferred_Starting_Hour": p,
+            }
+            for p in periods
+        ],
+        "Active": "true",
+        "Comments": None,
+    }
+    return [activity, constraint]
+
+
+def add_constraint(constraints, ctype, constraint):
+    try:
+        constraints[ctype].append(constraint)
+    except KeyError:
+        constraints[ctype] = [constraint]
+
+
+def class_fragment(
+    ctx: FragmentContext,
+    klass: str,
+    available: str,
+    cpairs: list[tuple[str, str]],
+    atomic_groups: tuple[str],
+) -> dict:
+    """Generate the time constraints and lunch-break activities for
+    the given class. <cpairs> are the entries in the CONSTRAINTS field
+    (see <core.db_access.read_pairs>). The "special" constraints depend
+    on the activities, they are only collected here.
+    Return a mapping:
+        "TIME": {constraint-type -> [constraint, ... ]},
+        "LUNCH": [[activity, constraint], ... ],
+        "SPECIAL": [[constraint, value], ... ],
+        "MESSAGES": [[level, message], ... ].
+    """
+    T = ctx.messages
+    time_constraints = {}
+    special = []
+    messages = []
+    constraints = {}
+    for c, v in cpairs:
+        try:
+            d, t = ctx.class_handlers[c]
+        except KeyError:
+            messages.append([
+                "ERROR",
+                T["UNKNOWN_CLASS_CONSTRAINT"].format(klass=klass, c=c)
+            ])
+            continue
+        if v == '*':
+            v = d
+        # For classes some constraints can be multiple!
+        if c in ctx.special_constraints:
+            # These are handled separately
+            special.append([c, v])
+        elif c in constraints:
+            # All other constraints may only occur once
+            messages.append([
+                "ERROR",
+                T["MULTIPLE_CLASS_CONSTRAINT"].format(klass=klass, name=t)
+            ])
+        else:
+            constraints[c] = v
+    # Handle availability
+    blocked_periods, possible_breaks = timeoff(
+        available, ctx.days, ctx.periods
+    )
+    if blocked_periods:
+        add_constraint(
+            time_constraints,
+            "ConstraintStudentsSetNotAvailableTimes",
+            {
+                "Weight_Percentage": "100",
+                "Students": klass,
+                "Number_of_Not_Available_Times": str(len(blocked_periods)),
+                "Not_Available_Time": blocked_periods,
+                "Active": "true",
+                "Comments": None,
+            }
+        )
+    # Lunch breaks: there needs to be a lunch-break activity for
+    # every sub-group of a class, to be on the safe side.
+    lunch = []
+    try:
+        lb = constraints.pop("LUNCHBREAK")
+    except KeyError:
+        pass
+    else:
+        try:
+            times = lunch_break_times(ctx, possible_breaks, lb)
+        except ValueError:
+            messages.append([
+                "ERROR",
+                T["INVALID_CLASS_LUNCHBREAK"].format(klass=klass, val=lb)
+            ])
+        else:
+            # To ensure that also classes with no groups get lunch
+            # breaks, add a null string to an empty list.
+            for day, periods in times:
+                for g in (atomic_groups or [""]):
+                    lunch.append(lunch_break(
+                        ctx, None, f"{klass}.{g}" if g else klass,
+                        day, periods
+                    ))
+    # Other constraints ...
+    for c, ctype, field in (
+        ("MINDAILY", "ConstraintStudentsSetMinHoursDaily",
+            "Minimum_Hours_Daily"),
+        ("MAXGAPSWEEKLY", "ConstraintStudentsSetMaxGapsPerWeek",
+            "Max_Gaps"),
+    ):
+        try:
+            nw = nperiods_value(ctx, constraints, c)
+        except ValueError as e:
+            messages.append([
+                "ERROR",
+                T["CLASS_CONSTRAINT"].format(
+                    klass=klass,
+                    constraint=ctx.class_handlers[c][-1],
+                    e=e
+                ),
+            ])
+            continue
+        if nw:
+            constraint = {
+                "Weight_Percentage": "100",     # necessary!
+                field: nw[0],
+                "Students": klass,
+            }
+            if c == "MINDAILY":
+                constraint["Allow_Empty_Days"] = "false"
+            constraint["Active"] = "true"
+            constraint["Comments"] = None
+            add_constraint(time_constraints, ctype, constraint)
+    return {
+        "TIME": time_constraints,
+        "LUNCH": lunch,
+        "SPECIAL": special,
+        "MESSAGES": messages,
+    }
+
+
+def teacher_fragment(
+    ctx: FragmentContext,
+    tid: str,
+    available: str,
+    cpairs: list[tuple[str, str]],
+) -> dict:
+    """Generate the time constraints and lunch-break activities for
+    the given teacher. <cpairs> are the entries in the CONSTRAINTS
+    field (see <core.db_access.read_pairs>).
+    Return a mapping:
+        "TIME": {constraint-type -> [constraint, ... ]},
+        "LUNCH": [[activity, constraint], ... ],
+        "UNSUPPORTED": [constraint, ... ],
+        "MESSAGES": [[level, message], ... ].
+    """
+    T = ctx.messages
+    time_constraints = {}
+    messages = []
+    constraints = {}
+    for c, v in cpairs:
+        try:
+            d, t = ctx.teacher_handlers[c]
+        except KeyError:
+            messages.append([
+                "ERROR",
+                T["UNKNOWN_TID_CONSTRAINT"].format(tid=tid, c=c)
+            ])
+            continue
+        if c in constraints:
+            # All constraints may only occur once
+            messages.append([
+                "ERROR",
+                T["MULTIPLE_TID_CONSTRAINT"].format(tid=tid, name=t)
+            ])
+            continue
+        constraints[c] = d if v == '*' else v
+    # Handle availability
+    blocked_periods, possible_breaks = timeoff(
+        available, ctx.days, ctx.periods
+    )
+    if blocked_periods:
+        add_constraint(
+            time_constraints,
+            "ConstraintTeacherNotAvailableTimes",
+            {
+                "Weight_Percentage": "100",
+                "Teacher": tid,
+                "Number_of_Not_Available_Times": str(len(blocked_periods)),
+                "Not_Available_Time": blocked_periods,
+                "Active": "true",
+                "Comments": None,
+            }
+        )
+    # Lunch breaks
+    lunch = []
+    try:
+        lb = constraints.pop("LUNCHBREAK")
+    except KeyError:
+        pass
+    else:
+        try:
+            times = lunch_break_times(ctx, possible_breaks, lb)
+        except ValueError:
+            messages.append([
+                "ERROR",
+                T["INVALID_TID_LUNCHBREAK"].format(tid=tid, val=lb)
+            ])
+        else:
+            for day, periods in times:
+                lunch.append(lunch_break(ctx, tid, None, day, periods))
+    # Other constraints ...
+    for c, ctype, field in (
+        ("MINDAILY", "ConstraintTeacherMinHoursDaily",
+            "Minimum_Hours_Daily"),
+        ("MAXGAPSDAILY", "ConstraintTeacherMaxGapsPerDay",
+            "Max_Gaps"),
+        ("MAXGAPSWEEKLY", "ConstraintTeacherMaxGapsPerWeek",
+            "Max_Gaps"),
+        ("MAXBLOCK", "ConstraintTeacherMaxHoursContinuously",
+            "Maximum_Hours_Continuously"),
+    ):
+        try:
+            nw = nperiods_value(ctx, constraints, c)
+        except ValueError as e:
+            messages.append([
+                "ERROR",
+                T["TEACHER_CONSTRAINT"].format(
+                    tid=tid,
+                    constraint=ctx.teacher_handlers[c][-1],
+                    e=e
+                ),
+            ])
+            continue
+        if not nw:
+            continue
+        n, w = nw
+        if c == "MAXBLOCK":
+            w = ctx.weightmap[w]
+            if not w:
+                continue
+        else:
+            w = "100"   # necessary!
+        constraint = {
+            "Weight_Percentage": w,
+            "Teacher_Name": tid,
+            field: n,
+        }
+        if c == "MINDAILY":
+            constraint["Allow_Empty_Days"] = "true"
+        constraint["Active"] = "true"
+        constraint["Comments"] = None
+        add_constraint(time_constraints, ctype, constraint)
+    return {
+        "TIME": time_constraints,
+        "LUNCH": lunch,
+        "UNSUPPORTED": sorted(constraints),
+        "MESSAGES": messages,
+    }
+
+
+FRAGMENT_BUILDERS = {
+    "C": class_fragment,
+    "T": teacher_fragment,
+}
+
+
+def build_fragment(ctx: FragmentContext, job: tuple) -> dict:
+    """Build a single fragment. <job> is (key, args), the first element
+    of the key selecting the builder.
+    """
+    key, args = job
+    return FRAGMENT_BUILDERS[key[0]](ctx, *args)
+
+
+def generate_fragments(ctx: FragmentContext, jobs: list[tuple]
+) -> list[dict]:
+    """Build the fragments for the given jobs (see <build_fragment>),
+    returning them in the same order.
+    """
+    return [build_fragment(ctx, job) for job in jobs]
+
+
+def source_digest(source) -> bytes:
+    """Return a digest of the source data (which should have a stable
+    <repr>).
+    """
+    return hashlib.blake2b(repr(source).encode("utf-8"), digest_size=16
+    ).digest()
+
+
+class FragmentCache:
+    """Map keys – e.g. ("T", <teacher-id>) – to (digest, fragment)
+    pairs. Entries not used in an export are dropped when the cache
+    is saved.
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self.fragments = {}
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            try:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+            except FileNotFoundError:
+                return
+            n = len(FRAGMENT_CACHE_MAGIC)
+            if data[:n] == FRAGMENT_CACHE_MAGIC:
+                try:
+                    self.fragments = marshal.loads(zlib.decompress(data[n:]))
+                except (zlib.error, ValueError, EOFError, TypeError):
+                    pass    # start with an empty cache
+
+    def lookup(self, key: tuple, source) -> Optional[dict]:
+        """Return the cached fragment for <key> if it was generated from
+        the same <source> data, otherwise <None>. The fragment must not
+        be modified by the caller.
+        """
+        self.used.add(key)
+        try:
+            d, fragment = self.fragments[key]
+        except KeyError:
+            pass
+        else:
+            if d == source_digest(source):
+                self.hits += 1
+                return fragment
+        self.misses += 1
+        return None
+
+    def store(self, key: tuple, source, fragment: dict):
+        self.fragments[key] = (source_digest(source), fragment)
+
+    def build(self, ctx: FragmentContext, jobs: list[tuple]) -> list[dict]:
+        """Return the fragments for the given jobs, (key, args) pairs,
+        in the same order. Fragments whose source data hasn't changed
+        are taken from the cache, the others are generated (see
+        <generate_fragments>) and stored.
+        """
+        fragments = []
+        missing = []
+        for i, (key, args) in enumerate(jobs):
+            fragment = self.lookup(key, (ctx, args))
+            if fragment is None:
+                missing.append(i)
+            fragments.append(fragment)
+        if missing:
+            for i, fragment in zip(
+                missing,
+                generate_fragments(ctx, [jobs[i] for i in missing])
+            ):
+                key, args = jobs[i]
+                self.store(key, (ctx, args), fragment)
+                fragments[i] = fragment
+        return fragments
+
+    def save(self):
+        if not self.path:
+            return
+        data = {k: v for k, v in self.fragments.items() if k in self.used}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(FRAGMENT_CACHE_MAGIC)
+            fh.write(zlib.compress(marshal.dumps(data)))
+        os.replace(tmp, self.path)
@@ -1,5 +1,5 @@
 """
-timetable/fet_read_results.py - last updated 2023-07-27
+timetable/fet_read_results.py - last updated 2026-10-19
 
 Fetch the placements after a fet run and update the database accordingly.
 There is also a function to generate an aSc-file.
@@ -37,20 +37,45 @@ if __name__ == "__main__":
     # TODO: Temporary redirection to use real data (there isn't any test data yet!)
     start.setup(os.path.join(basedir, 'TESTDATA'))
 
-from typing import Optional
+from typing import Optional, Iterator
 
 T = TRANSLATIONS("timetable.fet_read_results")
 #Tc = TRANSLATIONS("timetable.constraints_class")
 
 ### +++++
 
-import xmltodict
+from shutil import copyfile
+import xml.etree.ElementTree as ET
 
 from core.db_access import db_backup, db_update_fields
-from ui.ui_base import QFileDialog
+from core.activities_3a import update_export_placements
 
 ### -----
 
+def iter_elements(xmlfile, tags: set[str]) -> Iterator[ET.Element]:
+    """Parse the xml file incrementally, yielding each completed element
+    whose tag is in <tags>. Elements are removed from the tree when they
+    have been completed – unless they are within an element which is
+    still to be yielded – so the memory usage doesn't depend on the
+    file size.
+    """
+    stack = []
+    open_wanted = 0     # number of open elements with a tag in <tags>
+    for event, elem in ET.iterparse(xmlfile, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag in tags:
+                open_wanted += 1
+            continue
+        stack.pop()
+        if elem.tag in tags:
+            open_wanted -= 1
+            yield elem
+        if stack and not open_wanted:
+            # The completed element is the last child of its parent
+            del stack[-1][-1]
+
+
 def read_fet_file(xmlfile):
     """Read the fet file used to generate the timetable.
     Only the activities and their placements are read.
@@ -58,56 +83,63 @@ def read_fet_file(xmlfile):
     Return a mapping {activity-id -> lesson-id} and a set of "locked"
     activity-ids.
     """
-    with open(xmlfile, "rb") as fh:
-        xml = fh.read()
-    activity_data = xmltodict.parse(xml)["fet"]
-    activities = activity_data["Activities_List"]["Activity"]
     a2lid = {}
-    for activity in activities:
-        lid = activity["Comments"]
-        if lid:
-            a2lid[activity["Id"]] = lid
-    placements = activity_data["Time_Constraints_List"][
-        "ConstraintActivityPreferredStartingTime"
-    ]
     locked_set = set()
-    for placement in placements:
-        if placement["Permanently_Locked"] == "true":
-            locked_set.add(placement["Activity_Id"])
+    for elem in iter_elements(
+        xmlfile, {"Activity", "ConstraintActivityPreferredStartingTime"}
+    ):
+        if elem.tag == "Activity":
+            lid = elem.findtext("Comments")
+            if lid:
+                a2lid[elem.findtext("Id")] = lid
+        elif elem.findtext("Permanently_Locked") == "true":
+            locked_set.add(elem.findtext("Activity_Id"))
     return a2lid, locked_set
 
 
-def read_placements(fet_file, placement_file):
-    """Get the preset placements from a fet "activities" file (passed
-    as a file path) generated by a successful run of fet.
-    The lesson identifiers and the "locked" status is obtained from the
-    original data.
+def read_fet_placements(fet_file, placement_file
+) -> dict[int, tuple[str, str]]:
+    """Get the placements from a fet "activities" file (passed as a
+    file path) generated by a successful run of fet.
+    The lesson identifiers are obtained from the original data.
+    Return a mapping {lesson-id -> (time, rooms)}, the time being
+    "day.period". Non-placed activities are not included.
     """
     # Get the activity data
     activity2lesson, locked_activities = read_fet_file(fet_file)
     # Get the placement data
-    with open(placement_file, "rb") as fh:
-        xml = fh.read()
-    pos_data = xmltodict.parse(xml)
-    pos_list = pos_data["Activities_Timetable"]["Activity"]
-    for p in pos_list:
-        aid = p["Id"]
-        lesson_id = activity2lesson.get(aid)
-        if lesson_id and p['Day']:
+    pmap = {}
+    for p in iter_elements(placement_file, {"Activity"}):
+        lesson_id = activity2lesson.get(p.findtext("Id"))
+        day = p.findtext("Day")
+        if lesson_id and day:
             # Non-placed activities have no day, they must be skipped.
-            field_values = [("PLACEMENT", f"{p['Day']}.{p['Hour']}")]
-            room = p['Room']
+            room = p.findtext("Room")
             if room:
-                rlist = p.get('Real_Room')
+                rlist = [r.text for r in p.iterfind("Real_Room")]
                 if rlist:
-                    field_values.append(("ROOMS", ','.join(rlist)))
-                else:
-                    field_values.append(("ROOMS", room))
-            # print("§§§", lesson_id, field_values)
-            db_update_fields("LESSONS", field_values, lid=int(lesson_id))
+                    room = ','.join(rlist)
+            pmap[int(lesson_id)] = (f"{day}.{p.findtext('Hour')}", room or "")
+    return pmap
+
+
+def read_placements(fet_file, placement_file):
+    """Enter the placements from a fet "activities" file (see
+    <read_fet_placements>) in the database and in the cached export
+    model (see <core.activities_3a.export_model>).
+    """
+    placements = read_fet_placements(fet_file, placement_file)
+    for lid, (time, room) in placements.items():
+        field_values = [("PLACEMENT", time)]
+        if room:
+            field_values.append(("ROOMS", room))
+        db_update_fields("LESSONS", field_values, lid=lid)
+    # Keep the data for a following export
+    update_export_placements(placements)
 
 
 def getActivities(working_folder):
+    from ui.ui_base import QFileDialog
     d = QFileDialog(
         None,
         T["Open_fet_activities_file"],
@@ -133,18 +165,27 @@ def getActivities(working_folder):
     return None
 
 
-def prepare_asc_config(outdir, placements):
+def import_placements(outdir, placements) -> str:
+    """Read the placements from a fet "activities" file into the
+    database. The corresponding fet file (same base name, ending
+    ".fet") must be in folder <outdir>, the activities file is copied
+    there if necessary. A backup of the database is made afterwards.
+    Return the base name of the files.
+    """
     pfile = os.path.basename(placements)
     pbase = pfile[:-(len(ACTIVITIES_ENDING))]
-    if True:
-#        db_backup()
-        fet_file = os.path.join(outdir, pbase + ".fet")
-        pxfile = os.path.join(outdir, pfile)
-        if pxfile != placements:
-            copyfile(placements, pxfile)
-        print(f"Reading from\n  {fet_file} and\n  {placements}")
-        read_placements(fet_file, pxfile)
-        db_backup(pbase)
+    fet_file = os.path.join(outdir, pbase + ".fet")
+    pxfile = os.path.join(outdir, pfile)
+    if pxfile != placements:
+        copyfile(placements, pxfile)
+    print(f"Reading from\n  {fet_file} and\n  {placements}")
+    read_placements(fet_file, pxfile)
+    db_backup(pbase)
+    return pbase
+
+
+def prepare_asc_config(outdir, placements):
+    pbase = import_placements(outdir, placements)
 
     # Generate aSc-file
     ascfile_redirect = os.path.join(outdir, "ascdir")
@@ -152,6 +193,7 @@ def prepare_asc_config(outdir, placements):
         with open(ascfile_redirect, "r", encoding="utf-8") as fh:
             odir = fh.read().strip()
     else:
+        from ui.ui_base import QFileDialog
         odir = QFileDialog.getExistingDirectory(
             None,
             T["Open Directory"],
@@ -167,6 +209,7 @@ def prepare_asc_config(outdir, placements):
 
 
 def make_asc_file(asc_file):
+    import xmltodict
     from timetable.asc_data_3a import (
         TimetableCourses,
         get_subjects_aSc,
@@ -209,7 +252,6 @@ def make_asc_file(asc_file):
 # --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
 
 if __name__ == "__main__":
-    from shutil import copyfile
     from core.db_access import open_database
 
     open_database("wz_db.sqlite")
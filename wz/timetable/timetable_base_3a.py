@@ -1,7 +1,7 @@
 """
 timetable/timetable_base.py
 
-Last updated:  2023-07-27
+Last updated:  2026-10-19
 
 Collect the basic information for timetable display and processing.
 
@@ -38,31 +38,146 @@ T = TRANSLATIONS("timetable.timetable_base")
 ### +++++
 
 from typing import NamedTuple, Optional
+from array import array
 
 from core.basic_data_3 import (
     get_classes,
     get_teachers,
     get_subjects,
     get_rooms,
+    timeslot2index,
 )
-from core.activities_3a import (
-    collect_activity_groups,
-    CourseWithRoom,
-    Record,
-)
+from core.activities_3a import CourseWithRoom
 from core.classes import GROUP_ALL
+from timetable.tt_base import (
+    TT_DB,
+    load_tt_db,
+    merge_room_requirements,
+)
 from timetable.tt_engine_3a import PlacementEngine
+from timetable.tt_scoring import TimetableScore
 
 
-class TimetableActivity(NamedTuple):
-    teacher_set: set[str]
-    # division_groups: set[str]
-    class_atoms: dict[str, set[str]] # {class: {atomic-group. ... }}
-    roomlists: list[list[str]]
-    lesson_info: Record
-    sid: str
-    lesson_group: int
-    course_list: list[CourseWithRoom]
+class ActivityStore:
+    """The timetable activities (lessons), held as parallel arrays
+    ("columns") indexed by activity index. Data shared by several
+    activities – the lesson-group information and the sets of groups,
+    teachers and rooms – is held in "interned" side tables, the columns
+    containing only the table indexes.
+    """
+    def __init__(self):
+        self.lid = array('i')
+        self.length = array('b')
+        self.fixed = array('b')         # 1 if placement fixed by TIME
+        self.day = array('b')           # current placement, -1 if none
+        self.period = array('b')
+        self.lesson_group = array('i')  # -> <lg_table>
+        self.groups = array('i')        # -> <group_table>
+        self.teachers = array('i')      # -> <teacher_table>
+        self.roomreq = array('i')       # -> <room_table>
+        self.rooms = array('i')         # -> <room_alloc_table>
+        ## Side tables
+        # (lesson-group, subject-id, course list)
+        self.lg_table: list[tuple[int, str, list[CourseWithRoom]]] = []
+        # ((class, frozenset of atomic groups), ... )
+        self.group_table: list[tuple[tuple[str, frozenset[str]]]] = []
+        self.teacher_table: list[frozenset[str]] = []
+        # (required single rooms, choice lists, flexible choice lists)
+        self.room_table: list[tuple] = []
+        # Allocated rooms, as in the database (LESSONS.ROOMS)
+        self.room_alloc_table: list[str] = []
+        # Merged (parallel) activities:
+        #     {activity index: ((lesson-id, <lg_table> index), ... )}
+        self.members: dict[int, tuple[tuple[int, int]]] = {}
+        self.__keys = {}
+
+    def __len__(self):
+        return len(self.lid)
+
+    def intern(self, table: list, value) -> int:
+        """Return the index of <value> in <table>, adding it if it is
+        not already present. <value> must be hashable.
+        """
+        key = (id(table), value)
+        try:
+            return self.__keys[key]
+        except KeyError:
+            i = len(table)
+            table.append(value)
+            self.__keys[key] = i
+            return i
+
+    def add(
+        self,
+        lid: int,
+        length: int,
+        time: str,
+        placement: str,
+        rooms: str,
+        lg_index: int,
+        groups: int,
+        teachers: int,
+        roomreq: int,
+    ) -> int:
+        """Add an activity, returning its index. <time>, <placement>
+        and <rooms> are the LESSONS fields TIME, PLACEMENT and ROOMS.
+        """
+        fixed = bool(time) and time[0] != '^'
+        try:
+            d, p = timeslot2index(time if fixed else placement)
+        except ValueError as e:
+            REPORT("ERROR", str(e))
+            d, p = -1, -1
+        self.lid.append(lid)
+        self.length.append(length)
+        self.fixed.append(fixed)
+        self.day.append(d)
+        self.period.append(p)
+        self.lesson_group.append(lg_index)
+        self.groups.append(groups)
+        self.teachers.append(teachers)
+        self.roomreq.append(roomreq)
+        self.rooms.append(self.intern(self.room_alloc_table, rooms))
+        return len(self.lid) - 1
+
+    def lids(self, a_index: int) -> list[int]:
+        """Return the lesson-ids of an activity (more than one if it is
+        a merged parallel activity).
+        """
+        try:
+            return [lid for lid, lgi in self.members[a_index]]
+        except KeyError:
+            return [self.lid[a_index]]
+
+    def class_sid(self, a_index: int, klass: str) -> str:
+        """Return the subject of the activity as seen by the given
+        class, which is only relevant for merged activities.
+        """
+        for lid, lgi in self.members.get(a_index, ()):
+            lg, sid, course_list = self.lg_table[lgi]
+            for c in course_list:
+                if c.klass == klass:
+                    return sid
+        return self.sid(a_index)
+
+    def sid(self, a_index: int) -> str:
+        return self.lg_table[self.lesson_group[a_index]][1]
+
+    def course_list(self, a_index: int) -> list[CourseWithRoom]:
+        return self.lg_table[self.lesson_group[a_index]][2]
+
+    def class_atoms(self, a_index: int) -> dict[str, frozenset[str]]:
+        return dict(self.group_table[self.groups[a_index]])
+
+    def teacher_set(self, a_index: int) -> frozenset[str]:
+        return self.teacher_table[self.teachers[a_index]]
+
+    def roomlists(self, a_index: int) -> tuple:
+        return self.room_table[self.roomreq[a_index]]
+
+
+# The fields of the <TT_DB> lesson entries
+LESSON_FIELDS = ("Lesson_group", "Lid", "LENGTH", "TIME", "PLACEMENT", "ROOMS")
 
 
 class Places(NamedTuple):
@@ -98,8 +213,19 @@ def room_split(room_choice: str) -> list[str]:
 
 
 class Timetable:
-    def __init__(self):
-        self.init()
+    def __init__(self, tt_db: Optional[TT_DB] = None, control=None):
+        """If the timetable is built in a background task, its
+        <TaskControl> can be passed as <control>, for progress reports
+        and cancellation.
+        """
+        self.control = control
+        # The placement engine and the scorer are built from the same
+        # data, read only once (normally from the snapshot file)
+        if tt_db is None:
+            self.progress(0, 0, T["READING_DATA"])
+            tt_db = load_tt_db()
+        self.init(tt_db)
+        self.progress(0, 0, T["PLACEMENTS"])
         ## Set up the placement data
         self.engine = PlacementEngine()
         self.engine.setup_structures(
@@ -112,11 +238,88 @@ class Timetable:
             teachers=self.teacher_activities,
         )
         self.engine.set_activities(self.activities)
+        ## Set up the soft-constraint evaluation, matching its
+        ## placements to those of the engine
+        self.progress(0, 0, T["SCORING"])
+        self.scorer = TimetableScore(tt_db, self.control)
+        # A merged activity has several lessons in the scorer
+        self.score_index = []
+        for a_index in range(len(self.activities)):
+            d, p, rooms = self.engine.placement(a_index)
+            ilist = []
+            for lid in self.activities.lids(a_index):
+                try:
+                    i = self.scorer.lesson_index(lid)
+                except KeyError:
+                    continue
+                self.scorer.move(i, d, p)
+                ilist.append(i)
+            self.score_index.append(ilist)
+        # Tentative moves, (activity index, previous placement)
+        self.pending_moves = []
+
+    def progress(self, value: int, maximum: int = 0, text: str = ""):
+        """Report progress to the controlling task, if there is one.
+        This also checks for cancellation.
+        """
+        if self.control is not None:
+            self.control.progress(value, maximum, text)
+
+    def try_move(self, a_index: int, day: int, period: int
+    ) -> Optional[int]:
+        """Move activity <a_index> tentatively to the given time. A
+        negative <day> removes the activity from the timetable.
+        The occupancy tables, room allocations and penalties are updated
+        incrementally. The move must be confirmed by <commit> or undone
+        by <rollback>, several moves may be made before this.
+        Return the change in the soft-constraint penalty, or <None> if
+        the move is not possible (fixed activity, slot not in the
+        activity's domain, or clash).
+        """
+        engine = self.engine
+        if engine.is_fixed(a_index):
+            return None
+        if day >= 0:
+            if not engine.domains.possible(a_index, day, period):
+                return None
+            clashes = engine.blockers(a_index, day, period)
+            if clashes is None or clashes:
+                return None
+            prev = engine.placement(a_index)
+            engine.place(a_index, day, period)
+        else:
+            prev = engine.remove(a_index)
+        self.pending_moves.append((a_index, prev))
+        return sum(
+            self.scorer.move(i, day, period)
+            for i in self.score_index[a_index]
+        )
+
+    def commit(self):
+        """Accept the tentative moves.
+        """
+        self.pending_moves.clear()
+
+    def rollback(self, savepoint: int = 0) -> int:
+        """Undo the tentative moves (in reverse order). If <savepoint>
+        is supplied – a previous length of <pending_moves> – only the
+        later moves are undone. Return the resulting change in penalty.
+        """
+        delta = 0
+        while len(self.pending_moves) > savepoint:
+            a_index, (d, p, rooms) = self.pending_moves.pop()
+            if d >= 0:
+                self.engine.place(a_index, d, p, rooms)
+            else:
+                self.engine.remove(a_index)
+            for i in self.score_index[a_index]:
+                delta += self.scorer.move(i, d, p)
+        return delta
 
-    def init(self):
+    def init(self, tt_db: TT_DB):
         self.class_group_atoms = class2group2atoms()
-        ### Collect <Activity> items, they are then referenced by index
-        self.activities = []
+        ### Collect the activities, they are then referenced by index
+        self.activities = ActivityStore()
         ### (Ordered dict) Collect activity indexes for each class
         self.class_activities: dict[str, list[int]] = {}
         ### (Ordered dict) Collect activity indexes for each teacher
@@ -133,7 +336,10 @@ class Timetable:
         }
         ### group-division map for each class
         self.group_division = {}
-        for klass, cdata in get_classes().items():
+        classes = get_classes()
+        nclasses = len(classes)
+        for ci, (klass, cdata) in enumerate(classes.items()):
+            self.progress(ci, nclasses, T["CLASSES"])
             self.class_activities[klass] = []
             divs = cdata.divisions.divisions
             g2div = {GROUP_ALL: (-1, GROUP_ALL)}
@@ -156,10 +362,26 @@ class Timetable:
 #TODO: If I use this, it should probably use indexes as far as possible
 #        self.class2sid2ag2aids: dict[str, dict[str, dict[str, list[int]]]] = {}
 
-        ### Collect data for each lesson-group
-        lg_map = collect_activity_groups()
-        ### Add activities
-        for lg, act in lg_map.items():
+        ### The lessons of each lesson-group, the fields as in
+        ### <tt_base.get_lessons>
+        lg_lessons = {}
+        for l_data in tt_db.lessons.values():
+            ldata = dict(zip(LESSON_FIELDS, l_data))
+            try:
+                lg_lessons[ldata["Lesson_group"]].append(ldata)
+            except KeyError:
+                lg_lessons[ldata["Lesson_group"]] = [ldata]
+        ### Collect the lessons: {lesson-id: (lesson record, lesson-group,
+        ### subject, course list, class atoms, teachers, room lists)}
+        lessons = {}
+        nlg = len(tt_db.lg_map)
+        for i, (lg, (_, _, rows)) in enumerate(tt_db.lg_map.items()):
+            self.progress(i, nlg, T["ACTIVITIES"])
+            course_list = [
+                CourseWithRoom(klass, group, sid, tid, room)
+                for klass, group, sid, tid, bsid, room in rows
+            ]
+            block_sid = rows[0][4]
             class_atoms = {}    # {class: {atomic groups}}
 
 # Collect groups, teachers and rooms on a class basis, so that the
@@ -172,7 +394,7 @@ class Timetable:
             ## Collect the data needed for timetable placements, etc.
             teacher_set = set()
             room_set = set()
-            for cwr in act.course_list:
+            for cwr in course_list:
                 klass = cwr.klass
                 if cwr.group and klass != "--":
                     # Only add a group entry if there is a
@@ -192,7 +414,7 @@ class Timetable:
             # Get the subject-id from the block-tag, if it has a
             # subject, otherwise from the course (of which there
             # should be only one!)
-            sid = act.block_sid if act.block_sid else cwr.subject
+            sid = block_sid if block_sid else cwr.subject
 
             ## Handle rooms
             # Room allocations containing '+' should not block anything.
@@ -223,28 +445,128 @@ class Timetable:
                 roomlists=[]
             # print("???r:", roomlists)
 
-            ## Generate the activity or activities
-            for ldata in act.lessons:
-                #print("???", ldata)
-#TODO: Perhaps split it up into different lists with a common index?
-                a = TimetableActivity(
-                    teacher_set,
-                    # pg_sets,
-                    class_atoms,
-                    roomlists,
+            ## Collect the lessons, the activities are generated later
+            for ldata in lg_lessons.get(lg, ()):
+                lessons[ldata["Lid"]] = (
                     ldata,
-                    sid,
                     lg,
-                    act.course_list,
+                    sid,
+                    tuple(course_list),
+                    class_atoms,
+                    teacher_set,
+                    roomlists or ([], [], []),
                 )
-                a_index = len(self.activities)
-#TODO--
-#                print(" +++", a_index, a)
-                self.activities.append(a)
-                for k in class_atoms:
-                    self.class_activities[k].append(a_index)
-                for t in teacher_set:
-                    self.teacher_activities[t].append(a_index)
+        self.add_activities(lessons, tt_db.tlessons)
+
+    def add_activities(
+        self,
+        lessons: dict[int, tuple],
+        tlessons: list[tuple],
+    ):
+        """Generate the activities from the collected lessons. Lessons
+        which must be parallel (PARALLEL_LESSONS with weight '+') are
+        merged into a single activity, with the combined groups,
+        teachers and rooms, so that they are always moved as a unit.
+        The merging itself is done by <tt_base.collate_lessons>, whose
+        entries (<tlessons>) determine the activities.
+        Parallels with lower weights are handled as soft constraints
+        by the scorer.
+        """
+        for tl in tlessons:
+            lids = tl[6]
+            if len(lids) == 1:
+                self.add_activity(lessons, lids)
+                continue
+            class_atoms = {}
+            teacher_set = set()
+            roomlists = ([], [], [])
+            rooms = []
+            for lid in lids:
+                ldata, lg, sid, course_list, c_atoms, t_set, rl = (
+                    lessons[lid]
+                )
+                for k, ags in c_atoms.items():
+                    try:
+                        class_atoms[k] |= ags
+                    except KeyError:
+                        class_atoms[k] = set(ags)
+                teacher_set |= t_set
+                # Compatibility has been checked by <merge_lessons>
+                roomlists = merge_room_requirements(roomlists, rl)
+                if ldata["ROOMS"]:
+                    rooms.append(ldata["ROOMS"])
+            self.add_activity(
+                lessons, lids,
+                class_atoms, teacher_set, roomlists,
+                tl[3], tl[4], ",".join(rooms)
+            )
+
+    def add_activity(
+        self,
+        lessons: dict[int, tuple],
+        lids: list[int],
+        class_atoms: dict[str, set[str]] = None,
+        teacher_set: set[str] = None,
+        roomlists: tuple = None,
+        time: str = None,
+        placement: str = None,
+        rooms: str = None,
+    ):
+        """Add an activity for the given lessons (normally just one).
+        For a merged activity the combined data must be supplied.
+        """
+        acts = self.activities
+        ldata, lg, sid, course_list, c_atoms, t_set, r_lists = lessons[
+            lids[0]
+        ]
+        if class_atoms is None:
+            class_atoms = c_atoms
+            teacher_set = t_set
+            roomlists = r_lists
+            time = ldata["TIME"]
+            placement = ldata["PLACEMENT"]
+            rooms = ldata["ROOMS"]
+        lg_indexes = [
+            acts.intern(acts.lg_table, lessons[lid][1:4]) for lid in lids
+        ]
+        if len(lids) > 1:
+            lg_index = acts.intern(
+                acts.lg_table,
+                (lg, sid, sum((lessons[lid][3] for lid in lids), ()))
+            )
+        else:
+            lg_index = lg_indexes[0]
+        groups = acts.intern(
+            acts.group_table,
+            tuple(
+                (k, frozenset(gset))
+                for k, gset in class_atoms.items()
+            )
+        )
+        teachers = acts.intern(
+            acts.teacher_table, frozenset(teacher_set)
+        )
+        roomreq = acts.intern(
+            acts.room_table,
+            (
+                tuple(roomlists[0]),
+                tuple(tuple(rl) for rl in roomlists[1]),
+                tuple(tuple(rl) for rl in roomlists[2]),
+            ) if roomlists else ((), (), ())
+        )
+        a_index = acts.add(
+            lids[0], ldata["LENGTH"], time, placement, rooms,
+            lg_index, groups, teachers, roomreq
+        )
+        if len(lids) > 1:
+            acts.members[a_index] = tuple(zip(lids, lg_indexes))
+        for k in class_atoms:
+            self.class_activities[k].append(a_index)
+        for t in teacher_set:
+            self.teacher_activities[t].append(a_index)
+        for lid in lids:
+            sid = lessons[lid][2]
+            if a_index not in self.subject_activities[sid]:
                 self.subject_activities[sid].append(a_index)
 
 
@@ -326,6 +648,14 @@ if __name__ == '__main__':
 
     tt = Timetable()
 
+    print("\nPENALTY:", tt.scorer.total())
+    print("\nACTIVITIES:", len(tt.activities))
+    for a_index in range(len(tt.activities)):
+        if not tt.engine.is_fixed(a_index):
+            print("Move", a_index, "->", tt.try_move(a_index, 0, 0))
+            print("  rollback:", tt.rollback())
+            break
+
     rset = {   "R1", "R2/R3", "R1/R5", "R1+", "R2/R5+", "R3" }
     print("Room set:", rset)
     print("  -->", simplify_room_lists_(rset))
@@ -1,7 +1,7 @@
 """
 timetable/tt_base.py
 
-Last updated:  2023-08-09
+Last updated:  2026-10-19
 
 Handle the basic information for timetable display and processing.
 
@@ -36,10 +36,14 @@ if __name__ == "__main__":
     start.setup(os.path.join(basedir, 'TESTDATA'))
 
 #T = TRANSLATIONS("timetable.timetable_base")
-#T = TRANSLATIONS("timetable.tt_base")
+T = TRANSLATIONS("timetable.tt_base")
 
 ### +++++
 
+import os
+import time
+import marshal
+import struct
 from typing import NamedTuple, Optional
 #from dataclasses import dataclass
 
@@ -50,7 +54,16 @@ from core.basic_data_3 import (
 )
 from core.classes import NO_CLASS, GROUP_ALL
 from core.teachers import NO_TEACHER
-from core.db_access import db_select, db_query
+from core.db_access import db_select, db_query, db_name
+
+SNAPSHOT_FILE = "TIMETABLE/tt_db.snapshot"
+SNAPSHOT_MAGIC = b"WZTTDB\x00\x02"
+SNAPSHOT_HEADER = struct.Struct("<8sI")     # magic, length of key
+# A snapshot is not written if the database file (or its write-ahead
+# log) was modified less than this number of seconds ago: a further
+# change within the resolution of the file-system time stamps would not
+# be noticed.
+SNAPSHOT_MIN_AGE = 2.0
 
 
 def get_teacher_bits(b):
@@ -135,6 +148,14 @@ class TT_DATA(NamedTuple):
     room_i: dict[str, int]
 
 
+class TT_DB(NamedTuple):
+    tt_data: TT_DATA
+    lg_map: dict[int, list]     # lesson-group -> [checkbits, rooms, rows]
+    lessons: dict[int, list]    # lesson-id -> row, see <get_lessons>
+    parallels: dict[str, list]  # tag -> [lesson-id list, weight]
+    tlessons: list[tuple]       # see <collate_lessons>
+
+
 def get_activity_groups(tt_data: TT_DATA):
     q = """select
 
@@ -231,9 +252,49 @@ def collate_lessons(
     lg_map: dict[int, list[int, set[str], list[tuple]]],
     rmap_i: dict[str, int],
 ):
-    tt_lessons = []   # (checkbits, list of room-choice lists, ???)
+    """Build the list of lessons for placement. Lessons which must be
+    parallel (weight '+', see <parallel_groups>) are merged into a
+    single entry.
+    Each entry is a tuple: (checkbits, simplified room lists, course
+    rows, TIME, PLACEMENT, allocated rooms, lesson-ids, LENGTH).
+    """
+    merged = {}     # lid -> merged tuple (or <None> for non-leaders)
+    for lids in parallel_groups(parallel_map)[0]:
+        tl = None
+        for lid in lids:
+            lg, _, l, t, p, rr = lid_map[lid]
+            lg_data = lg_map[lg]
+            tl1 = (
+                lg_data[0],
+                lg_data[1],
+                lg_data[2],
+                t,
+                p,
+                [rmap_i[r] for r in rr.split(",")] if rr else [],
+                [lid],
+                l,
+            )
+            tl = tl1 if tl is None else merge_lessons(tl, tl1)
+            if tl is None:
+                REPORT("ERROR", T["PARALLELS_NOT_MERGEABLE"].format(
+                    lids=", ".join(str(x) for x in lids)
+                ))
+                break
+        else:
+            merged[lids[0]] = tl
+            for lid in lids[1:]:
+                merged[lid] = None
+    tt_lessons = []
     for l_data in lid_map.values():
         lg, lid, l, t, p, rr = l_data
+        try:
+            tl = merged[lid]
+        except KeyError:
+            pass
+        else:
+            if tl is not None:
+                tt_lessons.append(tl)
+            continue
         lg_data = lg_map[lg]
         if rr:
             rplist = [rmap_i[r] for r in rr.split(",")]
@@ -245,11 +306,104 @@ def collate_lessons(
             lg_data[2],
             t,
             p,
-            rplist
+            rplist,
+            [lid],
+            l,
         ))
     return tt_lessons
 
 
+def merge_lessons(tl1: tuple, tl2: tuple) -> Optional[tuple]:
+    """Merge two entries of the <collate_lessons> list. Return <None>
+    if this is not possible: the lessons have different lengths, share
+    a teacher or group, their room requirements are incompatible or
+    they have different fixed times.
+    """
+    if tl1[7] != tl2[7] or tl1[0] & tl2[0]:
+        return None
+    rooms = merge_room_requirements(tl1[1], tl2[1])
+    if rooms is None:
+        return None
+    t1, t2 = fixed_time(tl1[3]), fixed_time(tl2[3])
+    if t1 and t2 and t1 != t2:
+        return None
+    return (
+        tl1[0] | tl2[0],
+        rooms,
+        tl1[2] + tl2[2],
+        t1 or t2 or tl1[3],
+        tl1[4] or tl2[4],
+        tl1[5] + [r for r in tl2[5] if r not in tl1[5]],
+        tl1[6] + tl2[6],
+        tl1[7],
+    )
+
+
+def fixed_time(time: str) -> str:
+    """Return the TIME field if it is a fixed time, otherwise "".
+    """
+    return time if time and time[0] != '^' else ""
+
+
+def merge_room_requirements(rooms1, rooms2):
+    """Combine two (simplified) room requirements: (required single
+    rooms, room choice lists, flexible room choice lists).
+    Return <None> if both require the same single room.
+    """
+    if rooms1 is None or rooms2 is None:
+        return None
+    srooms1, rc1, rx1 = rooms1
+    srooms2, rc2, rx2 = rooms2
+    for r in srooms2:
+        if r in srooms1:
+            return None
+    return (
+        list(srooms1) + list(srooms2),
+        list(rc1) + list(rc2),
+        list(rx1) + list(rx2),
+    )
+
+
+def parallel_groups(
+    parallel_map: dict[str, list]
+) -> tuple[list[list[int]], list[tuple[list[int], str]]]:
+    """Divide the parallel-lesson tags into those which must be
+    parallel (weight '+') and those with a lower weight. The former are
+    combined into groups of lesson-ids – a lesson can be in more than
+    one tag. Tags with weight '-' are ignored.
+    Return (hard groups, [(lesson-ids, weight), ... ]).
+    """
+    leader = {}
+
+    def find(lid):
+        while (l := leader.get(lid, lid)) != lid:
+            lid = l
+        return lid
+
+    soft = []
+    for tag, (lids, w) in parallel_map.items():
+        if len(lids) < 2 or w == '-':
+            continue
+        if w == '+':
+            l0 = find(lids[0])
+            for lid in lids[1:]:
+                l = find(lid)
+                if l != l0:
+                    leader[l] = l0
+        else:
+            soft.append((lids, w))
+    groups = {}
+    for lid in sorted(leader):
+        groups.setdefault(find(lid), []).append(lid)
+    hard = []
+    for l0, lids in groups.items():
+        if l0 not in lids:
+            lids.insert(0, l0)
+        lids.sort()
+        hard.append(lids)
+    return hard, soft
+
+
 def room_split(room_choice: str) -> list[str]:
     """Split a room (choice) string into components.
     If there is a '+', it must be the last character, not preceded
@@ -332,7 +486,7 @@ def simplify_room_lists(roomlists: list[list[int]]) -> Optional[
     )
 
 
-def read_tt_db():
+def read_tt_db() -> TT_DB:
     """Read all timetable-relevant information from the database.
     """
     timap, tvec, b = get_teacher_bits(1)
@@ -350,6 +504,73 @@ def read_tt_db():
     l_map = get_lessons()
     pmap = get_parallels()
     tlessons = collate_lessons(l_map, pmap, lg_map, rimap)
+    return TT_DB(tt_data, lg_map, l_map, pmap, tlessons)
+
+
+def snapshot_key() -> tuple:
+    """A snapshot is valid for a particular state of the database file,
+    recognized by its path and the modification time and size of the
+    file (and of the write-ahead log, if there is one).
+    """
+    dbpath = db_name()
+    key = [dbpath]
+    for path in (dbpath, dbpath + "-wal"):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        key += (st.st_mtime_ns, st.st_size)
+    return tuple(key)
+
+
+def load_tt_db() -> TT_DB:
+    """Return the data of <read_tt_db>, taking it from the snapshot file
+    if this is still valid for the database. Otherwise the data is read
+    from the database and a new snapshot is written.
+    The snapshot file consists of a short header, the key (see
+    <snapshot_key>) and the data, the latter two in "marshal" format.
+    Unmarshalling is much faster than the database queries, so that a
+    timetable can be rebuilt quickly, e.g. in a worker process.
+    """
+    key = snapshot_key()
+    path = DATAPATH(SNAPSHOT_FILE)
+    try:
+        with open(path, "rb") as fh:
+            magic, klen = SNAPSHOT_HEADER.unpack(
+                fh.read(SNAPSHOT_HEADER.size)
+            )
+            if magic == SNAPSHOT_MAGIC and marshal.loads(
+                fh.read(klen)
+            ) == key:
+                tt_data, lg_map, l_map, pmap, tlessons = marshal.loads(
+                    fh.read()
+                )
+                return TT_DB(TT_DATA(*tt_data), lg_map, l_map, pmap, tlessons)
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        pass
+    tt_db = read_tt_db()
+    # The modification times are key[1] and (in WAL mode) key[3]
+    if len(key) > 1 and time.time() - max(key[1::2]) / 1e9 > SNAPSHOT_MIN_AGE:
+        save_tt_db(path, key, tt_db)
+    return tt_db
+
+
+def save_tt_db(path: str, key: tuple, tt_db: TT_DB):
+    """Write a snapshot file (atomically, via a temporary file).
+    Failure is not an error, the snapshot is then simply not available.
+    """
+    tmp = path + ".tmp"
+    try:
+        data = marshal.dumps((tuple(tt_db.tt_data), *tt_db[1:]))
+        k = marshal.dumps(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "wb") as fh:
+            fh.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(k)))
+            fh.write(k)
+            fh.write(data)
+        os.replace(tmp, path)
+    except (OSError, ValueError):
+        pass
 
 
 #TODO: This is the version for "3a", using the PARALLEL_LESSONS table.
@@ -384,7 +605,7 @@ def get_parallels():
 
 #TODO: ... check > 1 lids
     for tag, ll in pmap.items():
-        if len(ll) < 2:
+        if len(ll[0]) < 2:
             print(f"WARNING: // missing lesson for {tag}: {ll}")
     return pmap
 
@@ -0,0 +1,240 @@
+"""
+timetable/tt_diff.py
+
+Last updated:  2026-10-19
+
+Compare two sets of lesson placements, listing the changes for each
+class, teacher and room. A placement set can be taken from
+ - the LESSONS table of the current database,
+ - a database snapshot (see <db_backup>),
+ - the results of a fet run (see <fet_read_results>).
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+if __name__ == "__main__":
+    import sys, os
+    this = sys.path[0]
+    appdir = os.path.dirname(this)
+    sys.path[0] = appdir
+    basedir = os.path.dirname(appdir)
+    from core.base import start
+    start.setup(os.path.join(basedir, 'TESTDATA'))
+
+T = TRANSLATIONS("timetable.tt_diff")
+
+### +++++
+
+from typing import NamedTuple
+
+from core.db_access import db_query
+from core.classes import NO_CLASS
+from core.teachers import NO_TEACHER
+from PyQt6.QtSql import QSqlDatabase, QSqlQuery
+
+SNAPSHOT_CONNECTION = "tt_diff_snapshot"
+
+# Placement: (time, rooms), the time being "day.period" or ""
+Placements = dict[int, tuple[str, str]]
+
+### -----
+
+
+class LessonChange(NamedTuple):
+    lid: int
+    sid: str
+    old_time: str
+    new_time: str
+    old_rooms: str
+    new_rooms: str
+
+
+class TimetableDiff(NamedTuple):
+    changes: list[LessonChange]
+    classes: dict[str, list[LessonChange]]
+    teachers: dict[str, list[LessonChange]]
+    rooms: dict[str, list[LessonChange]]
+
+
+def effective_time(time: str, placement: str) -> str:
+    """The TIME field overrides the placement if it is a fixed time.
+    """
+    return time if time and time[0] != '^' else placement
+
+
+def placements_from_db() -> Placements:
+    """Read the placements from the LESSONS table of the current
+    database.
+    """
+    return {
+        lid: (effective_time(t, p), r or "")
+        for lid, t, p, r in db_query(
+            "select Lid, TIME, PLACEMENT, ROOMS from LESSONS"
+            " where Lesson_group != '0'"
+        )
+    }
+
+
+def placements_from_snapshot(path: str) -> Placements:
+    """Read the placements from the LESSONS table of a database
+    snapshot file. A separate connection is used, so the current
+    database is not affected.
+    """
+    con = QSqlDatabase.addDatabase("QSQLITE", SNAPSHOT_CONNECTION)
+    try:
+        con.setDatabaseName(path)
+        if not con.open():
+            raise ValueError(T["SNAPSHOT_OPEN_FAILED"].format(path=path))
+        query = QSqlQuery(con)
+        query.exec(
+            "select Lid, TIME, PLACEMENT, ROOMS from LESSONS"
+            " where Lesson_group != '0'"
+        )
+        pmap = {}
+        while query.next():
+            pmap[query.value(0)] = (
+                effective_time(query.value(1), query.value(2)),
+                query.value(3) or ""
+            )
+        query = None
+        con.close()
+    finally:
+        con = None  # needed to release the database object
+        QSqlDatabase.removeDatabase(SNAPSHOT_CONNECTION)
+    return pmap
+
+
+def placements_from_fet(fet_file: str, placement_file: str) -> Placements:
+    """Read the placements from the results of a fet run (the
+    "activities" file), see <fet_read_results.read_placements>.
+    Lessons not placed by fet are taken from the current database.
+    """
+    from timetable.fet_read_results_3a import read_fet_placements
+    pmap = placements_from_db()
+    for lid, tr in read_fet_placements(fet_file, placement_file).items():
+        if lid in pmap:
+            pmap[lid] = tr
+    return pmap
+
+
+def lesson_resources() -> dict[int, tuple[str, set[str], set[str]]]:
+    """Return a mapping {lesson-id: (subject, classes, teachers)}.
+    For blocks the block subject is used.
+    """
+    q = """select
+
+        Lid,
+        CLASS,
+        TEACHER,
+        SUBJECT,
+        BLOCK_SID
+
+        from LESSONS
+        inner join COURSE_LESSONS using (Lesson_group)
+        inner join COURSES using (Course)
+        inner join LESSON_GROUPS using (Lesson_group)
+        inner join LESSON_DATA using (Lesson_data)
+
+        where Lesson_group != '0'
+    """
+    lmap = {}
+    for lid, klass, tid, sid, bsid in db_query(q):
+        try:
+            data = lmap[lid]
+        except KeyError:
+            data = (bsid or sid, set(), set())
+            lmap[lid] = data
+        if klass != NO_CLASS:
+            data[1].add(klass)
+        if tid != NO_TEACHER:
+            data[2].add(tid)
+    return lmap
+
+
+def timetable_diff(old: Placements, new: Placements) -> TimetableDiff:
+    """Compare two placement sets, by lesson-id.
+    """
+    lres = lesson_resources()
+    changes = []
+    classes = {}
+    teachers = {}
+    rooms = {}
+    for lid in sorted(old.keys() | new.keys()):
+        t0, r0 = old.get(lid, ("", ""))
+        t1, r1 = new.get(lid, ("", ""))
+        if t0 == t1 and r0 == r1:
+            continue
+        sid, cset, tset = lres.get(lid, ("", (), ()))
+        change = LessonChange(lid, sid, t0, t1, r0, r1)
+        changes.append(change)
+        for k in cset:
+            classes.setdefault(k, []).append(change)
+        for t in tset:
+            teachers.setdefault(t, []).append(change)
+        rset = set(r0.split(',')) if r0 else set()
+        if r1:
+            rset.update(r1.split(','))
+        for r in rset:
+            rooms.setdefault(r, []).append(change)
+    return TimetableDiff(changes, classes, teachers, rooms)
+
+
+def diff_report(diff: TimetableDiff) -> str:
+    """Render the changes as text, divided into classes, teachers and
+    rooms.
+    """
+    lines = [T["CHANGES"].format(n=len(diff.changes))]
+    for title, cmap in (
+        (T["CLASSES"], diff.classes),
+        (T["TEACHERS"], diff.teachers),
+        (T["ROOMS"], diff.rooms),
+    ):
+        if not cmap:
+            continue
+        lines.append(f"\n*** {title} ***")
+        for key in sorted(cmap):
+            lines.append(f"\n  {key}:")
+            for c in cmap[key]:
+                line = (
+                    f"    {c.sid:8} [{c.lid}]"
+                    f" {c.old_time or '–'} -> {c.new_time or '–'}"
+                )
+                if c.old_rooms != c.new_rooms:
+                    line += (
+                        f"  ({c.old_rooms or '–'} -> {c.new_rooms or '–'})"
+                    )
+                lines.append(line)
+    return "\n".join(lines)
+
+
+# --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
+
+if __name__ == '__main__':
+    from glob import glob
+    from core.db_access import open_database
+    open_database("wz_db.sqlite")
+
+    new = placements_from_db()
+    snapshots = sorted(glob(DATAPATH("wz_db.sqlite_*")))
+    if snapshots:
+        print("Comparing with", snapshots[-1])
+        old = placements_from_snapshot(snapshots[-1])
+    else:
+        old = {}
+    print(diff_report(timetable_diff(old, new)))
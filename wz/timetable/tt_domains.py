@@ -0,0 +1,225 @@
+"""
+timetable/tt_domains.py
+
+Last updated:  2026-10-19
+
+Precompute the possible starting slots ("domain") of each activity as a
+bitmask over the week (bit d * PERIODS_PER_DAY + p). The static domain
+takes into account:
+ - the lesson length, which may not extend beyond the end of a day,
+ - the AVAILABLE fields of the teachers and classes,
+ - the DOUBLE_LESSON_START periods (if the weight is '+'),
+ - fixed times (TIME).
+A dynamic domain is maintained by forward checking: placing an activity
+removes the overlapping slots from the domains of all activities
+sharing a teacher, an atomic group or a required room.
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+### +++++
+
+from array import array
+
+from core.db_access import db_read_fields
+from timetable.tt_scoring import available_slots
+
+### -----
+
+
+class SlotDomains:
+    """The slot domains of the activities of a <PlacementEngine>. This
+    must be built before the activities are placed, the engine then
+    calls <assign> and <unassign> when an activity is placed or removed.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        acts = engine.activities
+        self.ndays = len(engine.day_list)
+        self.nperiods = engine.PERIODS_PER_DAY
+        self.week_size = engine.week_size
+        self.length = acts.length
+
+        ## Availability of the resources
+        c_available = dict(
+            db_read_fields("TT_CLASSES", ("CLASS", "AVAILABLE"))
+        )
+        group_avail = [
+            self.available_mask(c_available.get(k))
+            for k, ag in engine.group_list
+        ]
+        t_available = dict(
+            db_read_fields("TT_TEACHERS", ("TID", "AVAILABLE"))
+        )
+        teacher_avail = [
+            self.available_mask(t_available.get(t))
+            for t in engine.teacher_list
+        ]
+
+        ## Permissible starting periods for double lessons
+        TT_CONFIG = MINION(DATAPATH("CONFIG/TIMETABLE"))
+        double_starts = None
+        plist = TT_CONFIG.get("DOUBLE_LESSON_START")
+        if plist and (
+            TT_CONFIG.get("DOUBLE_LESSON_START_WEIGHT") or '+'
+        ) == '+':
+            double_starts = 0
+            for p in plist:
+                pi = engine.period_list.index(p)
+                for d in range(self.ndays):
+                    double_starts |= 1 << (d * self.nperiods + pi)
+
+        ## Static domains
+        self.static = []
+        day_starts = {}
+        for a_index in range(len(acts)):
+            l = acts.length[a_index]
+            if acts.fixed[a_index]:
+                d, p = acts.day[a_index], acts.period[a_index]
+                self.static.append(
+                    1 << (d * self.nperiods + p) if d >= 0 else 0
+                )
+                continue
+            try:
+                mask = day_starts[l]
+            except KeyError:
+                mask = self.day_start_mask(l)
+                day_starts[l] = mask
+            if l == 2 and double_starts is not None:
+                mask &= double_starts
+            for r in engine.group_table[acts.groups[a_index]]:
+                mask &= self.start_mask(group_avail[r], l)
+            for r in engine.teacher_table[acts.teachers[a_index]]:
+                mask &= self.start_mask(teacher_avail[r], l)
+            self.static.append(mask)
+        self.dynamic = list(self.static)
+
+        ## Neighbours: activities sharing a resource
+        res_acts = {}
+        for a_index in range(len(acts)):
+            for r in engine.group_table[acts.groups[a_index]]:
+                res_acts.setdefault(('g', r), []).append(a_index)
+            for r in engine.teacher_table[acts.teachers[a_index]]:
+                res_acts.setdefault(('t', r), []).append(a_index)
+            for r in engine.room_table[acts.roomreq[a_index]][0]:
+                res_acts.setdefault(('r', r), []).append(a_index)
+        neighbours = [set() for a in range(len(acts))]
+        for alist in res_acts.values():
+            for a_index in alist:
+                neighbours[a_index].update(alist)
+        self.neighbours = []
+        for a_index, nset in enumerate(neighbours):
+            nset.discard(a_index)
+            self.neighbours.append(sorted(nset))
+        # Number of placed neighbours blocking each (activity, slot)
+        self.counts = array('H', bytes(2 * len(acts) * self.week_size))
+
+    def available_mask(self, available: str) -> int:
+        mask = 0
+        s = 0
+        for day in available_slots(available, self.ndays, self.nperiods):
+            for a in day:
+                if a:
+                    mask |= 1 << s
+                s += 1
+        return mask
+
+    def day_start_mask(self, length: int) -> int:
+        """Return the mask of all slots in which a lesson of the given
+        length can start without extending beyond the end of the day.
+        """
+        mask = 0
+        for d in range(self.ndays):
+            s0 = d * self.nperiods
+            for p in range(self.nperiods - length + 1):
+                mask |= 1 << (s0 + p)
+        return mask
+
+    def start_mask(self, available: int, length: int) -> int:
+        """Return the mask of slots at which all periods of a lesson of
+        the given length are available.
+        """
+        mask = available
+        for k in range(1, length):
+            mask &= available >> k
+        return mask
+
+    def assign(self, a_index: int, d: int, p: int) -> list[int]:
+        """Forward checking when activity <a_index> is placed at (d, p).
+        Return the list of unplaced neighbours whose domains are now
+        empty.
+        """
+        s = d * self.nperiods + p
+        la = self.length[a_index]
+        day = self.engine.activities.day
+        wiped = []
+        for b in self.neighbours[a_index]:
+            base = b * self.week_size
+            dom = self.dynamic[b]
+            for t in range(max(0, s - self.length[b] + 1), s + la):
+                i = base + t
+                if self.counts[i] == 0:
+                    dom &= ~(1 << t)
+                self.counts[i] += 1
+            self.dynamic[b] = dom
+            if dom == 0 and day[b] < 0:
+                wiped.append(b)
+        return wiped
+
+    def unassign(self, a_index: int, d: int, p: int):
+        """Undo the forward checking of <assign>.
+        """
+        s = d * self.nperiods + p
+        la = self.length[a_index]
+        for b in self.neighbours[a_index]:
+            base = b * self.week_size
+            dom = self.dynamic[b]
+            static = self.static[b]
+            for t in range(max(0, s - self.length[b] + 1), s + la):
+                i = base + t
+                self.counts[i] -= 1
+                if self.counts[i] == 0:
+                    dom |= static & (1 << t)
+            self.dynamic[b] = dom
+
+    def possible(self, a_index: int, d: int, p: int) -> bool:
+        """Test the static domain.
+        """
+        return bool(self.static[a_index] >> (d * self.nperiods + p) & 1)
+
+    def free(self, a_index: int, d: int, p: int) -> bool:
+        """Test the dynamic domain: the slot is possible and no placed
+        activity sharing a resource is in the way.
+        """
+        return bool(self.dynamic[a_index] >> (d * self.nperiods + p) & 1)
+
+    def slots(self, a_index: int, free_only: bool = False
+    ) -> list[tuple[int, int]]:
+        """Return the (day, period) pairs of the (static or dynamic)
+        domain.
+        """
+        mask = (self.dynamic if free_only else self.static)[a_index]
+        result = []
+        s = 0
+        while mask:
+            if mask & 1:
+                result.append(divmod(s, self.nperiods))
+            mask >>= 1
+            s += 1
+        return result
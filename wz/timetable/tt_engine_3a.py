@@ -1,5 +1,5 @@
 """
-timetable/placement_engine.py - last updated 2023-07-26
+timetable/placement_engine.py - last updated 2026-10-19
 
 Manage placement of "activities" within the week, including,
 where appropriate, room allocation.
@@ -33,7 +33,7 @@ if __name__ == "__main__":
     # TODO: Temporary redirection to use real data (there isn't any test data yet!)
     start.setup(os.path.join(basedir, 'TESTDATA'))
 
-#from typing import Optional
+from typing import Optional
 #from array import array
 
 from core.basic_data_3 import (
@@ -43,9 +43,11 @@ from core.basic_data_3 import (
     get_classes,
     get_teachers,
     get_subjects,
-    timeslot2index,
+    index2timeslot,
 )
-#T = TRANSLATIONS("timetable.placement_engine")
+T = TRANSLATIONS("timetable.tt_engine")
+
+from timetable.tt_domains import SlotDomains
 
 ### +++++
 
@@ -159,9 +161,12 @@ class PlacementEngine:
         #print("\n§rooms", self.room_list)
         #print("\n§rooms map", self.room_map)
 
-#TODO
     def set_activities(self, activities):
-        print("TODO: activities")
+        """Build the internal activity data from an <ActivityStore> and
+        place the activities which have a time.
+        The current placements are held in the store's <day> and
+        <period> columns, which are updated by this engine.
+        """
         # An activitiy has a time – which can be fixed – and a length.
         # It also has 0 or more rooms, which can be selected from
         # a list of possibilities or a "joker" ('+'). A joker room
@@ -169,121 +174,216 @@ class PlacementEngine:
         # activity as having an unresolved room requirement.
         # If a fixed time cannot be allocated because of a clash, this
         # should be reported as an error. To ensure this works correctly,
-        # all fixed allocations should be done first.
-        # Perhaps an unresolvable room should be reported as an error too.
-
-        ## Time: fixed, allocated, length
-        # Rooms are more complicated because of the variable lists.
-        # Should I handle that using python lists or devise a low-level
-        # approach (linked lists?)?
-        # One possibility would be to allocate a bunch of nodes which can be
-        # expanded if necessary (that would require copying the existing nodes).
-        # Shrinking would not then be trivial, but perhaps not a problem. If
-        # I started with a fairly large block (using 32-bit indexes?), I could
-        # start testing without expansion code ... I suppose free nodes would
-        # need to be linked initially.
-        # Linked lists are quite straightforward to implement, especially
-        # using indexes to link (all nodes in a single vector), variable length
-        # lists could be trickier.
-        # Actually array-module arrays can be extended ... I could even do
-        # linear lists with special termination.
-
-        #self.placements = array('i', (0,)*(n*self.week_size))
-        #self.placements = [0]*(n*self.week_size)
-        self.activities = []
-        for activity in activities:
-#TODO--
-#            print("  --", activity)
-
-            lesson_data = activity.lesson_info
-
-
-#TODO: The rooms are part of the allocation data and should be checked!
-            #print("???", lesson_data)
-            t_rooms = lesson_data["ROOMS"]
-# It could be that not all required rooms have been allocated?
-# I would need to compare this with the "roomlists" lists,
-# <activity.roomlists>.
-            alloc_rooms = t_rooms.split(',') if t_rooms else []
-            room_a = [self.room_map[r] for r in alloc_rooms]
-
-            rs, rc, rx = activity.roomlists
-            rs1 = [self.room_map[r] for r in rs]
-            rc1 = [
-                [self.room_map[r] for r in r_]
-                for r_ in rc
-            ]
-            rx1 = [
-                [self.room_map[r] for r in r_]
-                for r_ in rx
-            ]
-
-            n = len(rs1) + len(rc1) + len(rx1)
-
-            if len(rx1) > 0:
-                print("???rooms", n, alloc_rooms, room_a)
-                print("   -->", rs1, "**", rc1, "**", rx1)
-
+        # all fixed allocations are done first.
+
+        # The week-arrays hold the activity index + 1 (0 is "free"),
+        # so that blocking activities can be found directly.
+        self.activities = activities
+        ## Convert the interned side tables to resource indexes
+        self.group_table = []
+        for class_atoms in activities.group_table:
             groups = []
-            for k, gset in activity.class_atoms.items():
+            for k, gset in class_atoms:
                 km = self.group_map[k]
                 if gset:
                     for g in gset:
                         groups.append(km[g])
                 else:
                     groups.append(km[''])
-
-            # print("§groups***", groups)
-
-            teachers = [self.teacher_map[t] for t in activity.teacher_set]
-
-            # print("§teachers***", teachers)
-
-#TODO: Do I actually need the subject here???
-            subject = self.subject_map[activity.sid]
-
-            fixed_time = lesson_data["TIME"]
-
-#TODO: Keep non-fixed times separate from the database? When would they
-# be saved, then?
-            if fixed_time:
-                d, p = timeslot2index(fixed_time)
-#                print("   @", d, p)
-
+            self.group_table.append(groups)
+        self.teacher_table = [
+            [self.teacher_map[t] for t in tset]
+            for tset in activities.teacher_table
+        ]
+        # The room requirements: (required single rooms,
+        # choice lists, flexible choice lists)
+        self.room_table = [
+            (
+                [self.room_map[r] for r in rs],
+                [[self.room_map[r] for r in r_] for r_ in rc],
+                [[self.room_map[r] for r in r_] for r_ in rx],
+            )
+            for rs, rc, rx in activities.room_table
+        ]
+# It could be that not all required rooms have been allocated?
+# I would need to compare this with the requirements in <room_table>.
+        alloc_table = [
+            [self.room_map[r] for r in t_rooms.split(',')] if t_rooms else []
+            for t_rooms in activities.room_alloc_table
+        ]
+        # The allocated rooms of each activity
+        self.rooms = [alloc_table[i] for i in activities.rooms]
+        ## The slot domains must be built before the placements are made
+        self.domains = SlotDomains(self)
+
+        ## Place fixed activities first
+        day, period = activities.day, activities.period
+        pending = []
+        for a_index in range(len(activities)):
+            d, p = day[a_index], period[a_index]
+            day[a_index] = -1
+            if d >= 0:
+                pending.append((not activities.fixed[a_index], a_index, d, p))
+        pending.sort()
+        for unfixed, a_index, d, p in pending:
+            self.initial_placement(
+                a_index, d, p,
+                "PLACEMENT_CLASH" if unfixed else "FIXED_TIME_CLASH"
+            )
+
+    def initial_placement(self, a_index, d, p, message):
+        """Place an activity at the time (and in the rooms) specified in
+        the database. If that is not possible, it is left unplaced.
+        """
+        rooms = self.rooms[a_index]
+        clashes = self.blockers(a_index, d, p, rooms)
+        if clashes is None or clashes:
+            lid = self.activities.lid
+            REPORT(
+                "ERROR" if self.activities.fixed[a_index] else "WARNING",
+                T[message].format(
+                    lid=lid[a_index],
+                    time=index2timeslot((d, p)),
+                    clashes=", ".join(
+                        str(lid[c]) for c in sorted(clashes or ())
+                    ),
+                )
+            )
+            return
+        self.place(a_index, d, p, rooms)
+
+    def activity_resources(self, a_index, rooms=None):
+        """Return the resource lists of activity <a_index>, paired with
+        their week-arrays. If no <rooms> are supplied, the required
+        single rooms are used.
+        """
+        acts = self.activities
+        return (
+            (self.group_table[acts.groups[a_index]], self.group_week),
+            (self.teacher_table[acts.teachers[a_index]], self.teacher_week),
+            (
+                self.room_table[acts.roomreq[a_index]][0]
+                if rooms is None else rooms,
+                self.room_week
+            ),
+        )
+
+    def blockers(self, a_index, d, p, rooms=None) -> Optional[set[int]]:
+        """Return the set of activities (indexes) which would prevent
+        the placement of activity <a_index> at the given time. The
+        required single rooms are checked, or else the rooms in <rooms>
+        if that is supplied.
+        Return <None> if the activity doesn't fit in the day.
+        """
+        length = self.activities.length[a_index]
+        if p < 0 or p + length > self.PERIODS_PER_DAY:
+            return None
+        t0 = d * self.PERIODS_PER_DAY + p
+        x0 = a_index + 1
+        clashes = set()
+        for resources, week in self.activity_resources(a_index, rooms):
+            for r in resources:
+                if r < 0:
+                    continue
+                i0 = r * self.week_size + t0
+                for x in week[i0:i0 + length]:
+                    if x and x != x0:
+                        clashes.add(x - 1)
+        return clashes
+
+    def room_free(self, a_index, room, t0, length):
+        i0 = room * self.week_size + t0
+        x0 = a_index + 1
+        for x in self.room_week[i0:i0 + length]:
+            if x and x != x0:
+                return False
+        return True
+
+    def allocate_rooms(self, a_index, d, p) -> list[int]:
+        """Choose rooms for activity <a_index> at the given time.
+        The required single rooms come first (they must be checked
+        beforehand), then the first free room of each choice list.
+        "Flexible" requirements (with '+') are not allocated
+        automatically, but a previous allocation is retained if the
+        room is still free. Unresolved requirements are -1.
+        """
+        length = self.activities.length[a_index]
+        t0 = d * self.PERIODS_PER_DAY + p
+        rs, rc, rx = self.room_table[self.activities.roomreq[a_index]]
+        rooms = list(rs)
+        used = set(rooms)
+        for rlist in rc:
+            for r in rlist:
+                if r not in used and self.room_free(a_index, r, t0, length):
+                    break
             else:
-                d, p = timeslot2index(lesson_data["PLACEMENT"])
-#                print("   (@)", d, p)
-#                if d < 0:
-#                    continue
-
-#            t_i = d * self.PERIODS_PER_DAY + p
-
-            self.activities.append([
-                d, p, lesson_data["LENGTH"],
-                n, room_a, rs1, rc1, rx1,
-                groups, teachers  # , subject
-            ])
-            print(" +++", *self.activities[-1])
-
-            if d < 0:
-                continue
-#TODO: check atomic groups and teachers and rooms
-
-
-
-
-
-
-
-
-def place_activity(places, activity, index):
-    """Try to place the given activity. Check time slot and rooms.
-    """
-
-#TODO--
-#    print("  --", activity)
-
-
+                r = -1
+            rooms.append(r)
+            used.add(r)
+        prev = self.rooms[a_index]
+        for rlist in rx:
+            for r in prev:
+                if (
+                    r in rlist
+                    and r not in used
+                    and self.room_free(a_index, r, t0, length)
+                ):
+                    break
+            else:
+                r = -1
+            rooms.append(r)
+            used.add(r)
+        return rooms
+
+    def mark(self, a_index, value):
+        """Set the week-array cells of the activity's resources to
+        <value>.
+        """
+        acts = self.activities
+        d = acts.day[a_index]
+        if d < 0:
+            return
+        length = acts.length[a_index]
+        t0 = d * self.PERIODS_PER_DAY + acts.period[a_index]
+        for resources, week in self.activity_resources(
+            a_index, self.rooms[a_index]
+        ):
+            for r in resources:
+                if r >= 0:
+                    i0 = r * self.week_size + t0
+                    week[i0:i0 + length] = [value] * length
+
+    def place(self, a_index, d, p, rooms=None):
+        """Place the activity at the given time, which should have been
+        checked using <blockers>. If no <rooms> are supplied, they are
+        allocated automatically.
+        """
+        self.remove(a_index)
+        if rooms is None:
+            rooms = self.allocate_rooms(a_index, d, p)
+        self.activities.day[a_index] = d
+        self.activities.period[a_index] = p
+        self.rooms[a_index] = rooms
+        self.mark(a_index, a_index + 1)
+        self.domains.assign(a_index, d, p)
+
+    def remove(self, a_index) -> tuple[int, int, list[int]]:
+        """Remove the activity from the week-arrays, returning its
+        previous placement: (day, period, rooms).
+        """
+        prev = self.placement(a_index)
+        if prev[0] >= 0:
+            self.mark(a_index, 0)
+            self.activities.day[a_index] = -1
+            self.domains.unassign(a_index, prev[0], prev[1])
+        return prev
+
+    def is_fixed(self, a_index):
+        return bool(self.activities.fixed[a_index])
+
+    def placement(self, a_index) -> tuple[int, int, list[int]]:
+        acts = self.activities
+        return (acts.day[a_index], acts.period[a_index], self.rooms[a_index])
 
 
 # --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
@@ -0,0 +1,299 @@
+"""
+timetable/tt_feasibility.py
+
+Last updated:  2026-10-19
+
+A quick analysis of the timetable data to catch obvious impossibilities
+before starting a (long) solver run:
+ - the lesson load of each teacher, atomic group and (required) room is
+   compared with the number of available periods,
+ - lessons which are too long for any available stretch of a day are
+   reported,
+ - the activity conflict graph is built from overlapping resources.
+   Large (weighted) cliques give a lower bound, greedy colouring an
+   upper bound for the number of periods needed.
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+if __name__ == "__main__":
+    import sys, os
+    this = sys.path[0]
+    appdir = os.path.dirname(this)
+    sys.path[0] = appdir
+    basedir = os.path.dirname(appdir)
+    from core.base import start
+    start.setup(os.path.join(basedir, 'TESTDATA'))
+
+T = TRANSLATIONS("timetable.tt_feasibility")
+
+### +++++
+
+from typing import NamedTuple, Optional
+import time
+
+from core.basic_data_3 import get_days, get_periods, get_classes
+from core.db_access import db_read_fields
+from core.classes import GROUP_ALL
+from timetable.tt_base import TT_DB, load_tt_db
+from timetable.tt_scoring import available_slots, single_bits
+
+### -----
+
+
+class ResourceLoad(NamedTuple):
+    name: str
+    lessons: list[int]  # lesson indexes
+    load: int           # number of periods needed
+    available: int      # number of available periods
+    longest: int        # longest available stretch in a day
+
+
+class FeasibilityReport(NamedTuple):
+    overloaded: list[ResourceLoad]
+    too_long: list[tuple[int, str]]     # (lesson-id, resource name)
+    clique: list[int]                   # lesson-ids
+    clique_load: int
+    greedy_periods: int
+    week_periods: int
+    milliseconds: float
+
+
+class ConflictGraph:
+    """The lessons (from <read_tt_db>) are the nodes. Two lessons are
+    connected if they share a teacher, an atomic group or a required
+    room. The lessons of a single resource thus form a clique.
+    """
+    def __init__(self, tt_db: TT_DB):
+        self.ndays = len(get_days())
+        self.nperiods = len(get_periods())
+        self.lids = []
+        self.length = []
+        self.resources = []     # list of resource indexes per lesson
+        self.res_names = []
+        self.res_lessons = []   # list of lesson indexes per resource
+        self.res_available = []
+        bit2res = {}
+        tt_data = tt_db.tt_data
+
+        def new_resource(name, available=""):
+            self.res_names.append(name)
+            self.res_lessons.append([])
+            self.res_available.append(
+                available_slots(available, self.ndays, self.nperiods)
+            )
+            return len(self.res_names) - 1
+
+        t_available = dict(
+            db_read_fields("TT_TEACHERS", ("TID", "AVAILABLE"))
+        )
+        for tid, ti in tt_data.teacher_i.items():
+            if (b := tt_data.teacher_bits[ti]):
+                bit2res[b] = new_resource(tid, t_available.get(tid))
+        c_available = dict(
+            db_read_fields("TT_CLASSES", ("CLASS", "AVAILABLE"))
+        )
+        classes = get_classes()
+        for klass, ci in tt_data.class_i.items():
+            gbits = tt_data.class_group_bits[ci][GROUP_ALL]
+            atoms = classes[klass].divisions.atomic_groups or [""]
+            for ag, b in zip(atoms, single_bits(gbits)):
+                bit2res[b] = new_resource(
+                    f"{klass}.{ag}" if ag else klass,
+                    c_available.get(klass)
+                )
+        room_res = {}
+        rnames = {i: r for r, i in tt_data.room_i.items()}
+        for lid, l_data in tt_db.lessons.items():
+            lg, _, length, t, p, _ = l_data
+            checkbits, roomlists, rows = tt_db.lg_map[lg]
+            i = len(self.lids)
+            self.lids.append(lid)
+            self.length.append(length)
+            rlist = [bit2res[b] for b in single_bits(checkbits)]
+            if roomlists:
+                for r in roomlists[0]:
+                    try:
+                        ri = room_res[r]
+                    except KeyError:
+                        ri = new_resource(rnames.get(r, str(r)))
+                        room_res[r] = ri
+                    rlist.append(ri)
+            self.resources.append(rlist)
+            for r in rlist:
+                self.res_lessons[r].append(i)
+        ## Build the adjacency sets from the resource cliques
+        self.adjacent = [set() for l in self.lids]
+        for llist in self.res_lessons:
+            for i in llist:
+                self.adjacent[i].update(llist)
+        for i, adj in enumerate(self.adjacent):
+            adj.discard(i)
+
+    def resource_loads(self) -> list[ResourceLoad]:
+        loads = []
+        for r, llist in enumerate(self.res_lessons):
+            if not llist:
+                continue
+            available = 0
+            longest = 0
+            for day in self.res_available[r]:
+                run = 0
+                for a in day:
+                    if a:
+                        available += 1
+                        run += 1
+                        if run > longest:
+                            longest = run
+                    else:
+                        run = 0
+            loads.append(ResourceLoad(
+                self.res_names[r],
+                llist,
+                sum(self.length[i] for i in llist),
+                available,
+                longest,
+            ))
+        return loads
+
+    def max_clique(self) -> tuple[list[int], int]:
+        """Find a large clique, weighted by lesson length. Each resource
+        clique is extended greedily by lessons adjacent to all members.
+        Return (lesson indexes, total length).
+        """
+        best = ([], 0)
+        for llist in self.res_lessons:
+            if not llist:
+                continue
+            clique = list(llist)
+            common = set.intersection(*(self.adjacent[i] for i in clique))
+            while common:
+                # Prefer long lessons with many neighbours
+                i = max(
+                    common,
+                    key=lambda x: (self.length[x], len(self.adjacent[x]))
+                )
+                clique.append(i)
+                common &= self.adjacent[i]
+            w = sum(self.length[i] for i in clique)
+            if w > best[1]:
+                best = (clique, w)
+        return best
+
+    def greedy_colouring(self) -> list[int]:
+        """Allocate each lesson to the first possible start period in a
+        sequence of (virtual) days, lessons with most neighbours first.
+        Lessons may not cross day boundaries, nor overlap an adjacent
+        lesson. The number of periods used is an upper bound for the
+        number needed (ignoring other constraints).
+        Lessons longer than a day (reported by <check_feasibility>)
+        can't be placed, their start period remains -1.
+        Return the start periods, indexed by lesson.
+        """
+        nperiods = self.nperiods
+        start = [-1] * len(self.lids)
+        order = sorted(
+            range(len(self.lids)),
+            key=lambda i: (-len(self.adjacent[i]), -self.length[i])
+        )
+        for i in order:
+            length = self.length[i]
+            if length > nperiods:
+                continue
+            used = set()
+            for j in self.adjacent[i]:
+                if (s := start[j]) >= 0:
+                    used.update(range(s, s + self.length[j]))
+            s = 0
+            while True:
+                if s % nperiods + length > nperiods:
+                    # Go to next day
+                    s += nperiods - s % nperiods
+                    continue
+                for x in range(s, s + length):
+                    if x in used:
+                        s = x + 1
+                        break
+                else:
+                    break
+            start[i] = s
+        return start
+
+
+def check_feasibility(tt_db: Optional[TT_DB] = None) -> FeasibilityReport:
+    """Run the analysis, reporting the problems found.
+    """
+    t0 = time.perf_counter()
+    if tt_db is None:
+        tt_db = load_tt_db()
+    graph = ConflictGraph(tt_db)
+    week_periods = graph.ndays * graph.nperiods
+    overloaded = []
+    too_long = []
+    for rl in graph.resource_loads():
+        if rl.load > rl.available:
+            overloaded.append(rl)
+            REPORT("ERROR", T["OVERLOADED"].format(
+                name=rl.name, load=rl.load, available=rl.available
+            ))
+        for i in rl.lessons:
+            if graph.length[i] > rl.longest:
+                too_long.append((graph.lids[i], rl.name))
+                REPORT("ERROR", T["LESSON_TOO_LONG"].format(
+                    name=rl.name, lid=graph.lids[i], n=graph.length[i]
+                ))
+    clique, clique_load = graph.max_clique()
+    if clique_load > week_periods:
+        REPORT("ERROR", T["CLIQUE_TOO_LARGE"].format(
+            n=clique_load, nmax=week_periods
+        ))
+    starts = graph.greedy_colouring()
+    greedy_periods = max(
+        (s + graph.length[i] for i, s in enumerate(starts) if s >= 0),
+        default=0
+    )
+    ms = (time.perf_counter() - t0) * 1000
+    REPORT("INFO", T["SUMMARY"].format(
+        clique=clique_load,
+        greedy=greedy_periods,
+        nmax=week_periods,
+        ms=f"{ms:.0f}",
+    ))
+    return FeasibilityReport(
+        overloaded,
+        too_long,
+        [graph.lids[i] for i in clique],
+        clique_load,
+        greedy_periods,
+        week_periods,
+        ms,
+    )
+
+
+# --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
+
+if __name__ == '__main__':
+    from core.db_access import open_database
+    open_database("wz_db.sqlite")
+
+    report = check_feasibility()
+    for rl in report.overloaded:
+        print(f"  -- {rl.name}: {rl.load} > {rl.available}")
+    print("\nLargest clique:", report.clique_load, report.clique)
+    print("Greedy colouring:", report.greedy_periods, "/", report.week_periods)
@@ -0,0 +1,235 @@
+"""
+timetable/tt_repair.py
+
+Last updated:  2026-10-19
+
+Search for short chains of lesson moves which allow a lesson to be
+placed in a slot that is blocked by other lessons ("Kempe-chain"
+style). The blocking lessons are displaced – preferably into the slot
+vacated by the moved lesson – and may in turn displace others, up to a
+maximum depth. Lessons with a fixed time (TIME) are never moved.
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+if __name__ == "__main__":
+    import sys, os
+    this = sys.path[0]
+    appdir = os.path.dirname(this)
+    sys.path[0] = appdir
+    basedir = os.path.dirname(appdir)
+    from core.base import start
+    start.setup(os.path.join(basedir, 'TESTDATA'))
+
+### +++++
+
+from typing import NamedTuple, Optional
+import time
+
+from timetable.timetable_base_3a import Timetable
+
+# Don't try to displace more lessons than this from a single slot
+MAX_BLOCKERS = 3
+
+### -----
+
+
+class Placement(NamedTuple):
+    day: int
+    period: int
+    delta: int                          # change of penalty
+    moves: list[tuple[int, int, int]]   # (activity, day, period)
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class RepairSearch:
+    """Depth-limited search for move chains, using the tentative moves
+    of a <Timetable> (<try_move> / <rollback>). A successful chain is
+    left pending in the timetable.
+    """
+    def __init__(
+        self,
+        timetable: Timetable,
+        time_budget: float = 1.0,
+        max_depth: int = 2
+    ):
+        self.tt = timetable
+        self.engine = timetable.engine
+        self.max_depth = max_depth
+        self.deadline = time.perf_counter() + time_budget
+
+    def check_time(self):
+        if time.perf_counter() > self.deadline:
+            raise _OutOfTime
+
+    def place_chain(self, a_index, d, p, depth, tabu) -> bool:
+        """Place activity <a_index> at (d, p), displacing the blocking
+        activities, which are then placed elsewhere. Activities in
+        <tabu> (already moved in this chain) are not displaced.
+        """
+        self.check_time()
+        engine = self.engine
+        if not engine.domains.possible(a_index, d, p):
+            return False
+        clashes = engine.blockers(a_index, d, p)
+        if clashes is None or len(clashes) > MAX_BLOCKERS:
+            return False
+        if clashes and depth <= 0:
+            return False
+        for b in clashes:
+            if b in tabu or engine.is_fixed(b):
+                return False
+        savepoint = len(self.tt.pending_moves)
+        d0, p0, _ = engine.placement(a_index)
+        for b in clashes:
+            self.tt.try_move(b, -1, 0)
+        if self.tt.try_move(a_index, d, p) is None:
+            self.tt.rollback(savepoint)
+            return False
+        tabu = tabu | {a_index}
+        for b in sorted(clashes):
+            if not self.relocate(b, depth - 1, tabu, (d0, p0)):
+                self.tt.rollback(savepoint)
+                return False
+        return True
+
+    def relocate(self, a_index, depth, tabu, prefer) -> bool:
+        """Find a new slot for the (removed) activity <a_index>. A free
+        slot with the lowest penalty is chosen, the slot <prefer> being
+        tried first (a "swap"). Otherwise, if <depth> allows, slots
+        with blocking activities are tried.
+        """
+        tt = self.tt
+        if prefer[0] >= 0 and tt.try_move(a_index, *prefer) is not None:
+            return True
+        best = None
+        blocked = []
+        domains = self.engine.domains
+        for d, p in domains.slots(a_index):
+            if not domains.free(a_index, d, p):
+                if depth > 0:
+                    clashes = self.engine.blockers(a_index, d, p)
+                    if clashes:
+                        blocked.append((len(clashes), d, p))
+                continue
+            savepoint = len(tt.pending_moves)
+            delta = tt.try_move(a_index, d, p)
+            tt.rollback(savepoint)
+            if delta is not None and (best is None or delta < best[0]):
+                best = (delta, d, p)
+        if best is not None:
+            tt.try_move(a_index, best[1], best[2])
+            return True
+        if depth > 0:
+            blocked.sort()
+            for n, d, p in blocked:
+                if self.place_chain(a_index, d, p, depth, tabu):
+                    return True
+        return False
+
+    def chain(self, savepoint) -> list[tuple[int, int, int]]:
+        """Return the final placements of the activities moved since
+        <savepoint>.
+        """
+        moved = {}
+        for a_index, prev in self.tt.pending_moves[savepoint:]:
+            moved[a_index] = self.engine.placement(a_index)[:2]
+        return [(a, d, p) for a, (d, p) in moved.items()]
+
+
+def find_placements(
+    timetable: Timetable,
+    a_index: int,
+    time_budget: float = 1.0,
+    max_depth: int = 2,
+) -> list[Placement]:
+    """Look for possible placements of activity <a_index>, including
+    those requiring other activities to be moved. The timetable is not
+    changed. The search stops when <time_budget> (seconds) is exhausted.
+    Return a list of <Placement> items, best (lowest penalty) first.
+    """
+    search = RepairSearch(timetable, time_budget, max_depth)
+    engine = timetable.engine
+    if engine.is_fixed(a_index):
+        return []
+    current = engine.placement(a_index)[:2]
+    savepoint = len(timetable.pending_moves)
+    score0 = timetable.scorer.total()
+    results = []
+    try:
+        for d, p in engine.domains.slots(a_index):
+            if (d, p) == current:
+                continue
+            try:
+                if search.place_chain(a_index, d, p, max_depth, set()):
+                    results.append(Placement(
+                        d, p,
+                        timetable.scorer.total() - score0,
+                        search.chain(savepoint)
+                    ))
+            finally:
+                timetable.rollback(savepoint)
+    except _OutOfTime:
+        pass
+    results.sort(key=lambda x: (x.delta, len(x.moves)))
+    return results
+
+
+def repair(
+    timetable: Timetable,
+    a_index: int,
+    day: int,
+    period: int,
+    time_budget: float = 1.0,
+    max_depth: int = 3,
+) -> Optional[int]:
+    """Try to place activity <a_index> at the given time, moving
+    blocking activities if necessary. This can be used to resolve a
+    clash or to place an activity which is not yet placed.
+    If successful, the moves are left pending in the timetable (to be
+    accepted by <commit> or undone by <rollback>) and the change in
+    penalty is returned. Otherwise the timetable is unchanged and the
+    result is <None>.
+    """
+    search = RepairSearch(timetable, time_budget, max_depth)
+    savepoint = len(timetable.pending_moves)
+    score0 = timetable.scorer.total()
+    try:
+        if search.place_chain(a_index, day, period, max_depth, set()):
+            return timetable.scorer.total() - score0
+    except _OutOfTime:
+        timetable.rollback(savepoint)
+    return None
+
+
+# --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
+
+if __name__ == '__main__':
+    from core.db_access import open_database
+    open_database("wz_db.sqlite")
+
+    tt = Timetable()
+    for a_index in range(len(tt.activities)):
+        if tt.engine.placement(a_index)[0] < 0:
+            print("\nUnplaced: lesson", tt.activities.lid[a_index])
+            for pl in find_placements(tt, a_index)[:10]:
+                print("  --", pl)
@@ -0,0 +1,784 @@
+"""
+timetable/tt_scoring.py
+
+Last updated:  2026-10-19
+
+Evaluate the "soft" constraints of a timetable placement as a weighted
+penalty. The effect of moving a single lesson can be evaluated
+incrementally, so that this can serve as the cost function of a
+local-search solver.
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+# The weights (-, 1 .. 9, +) are converted to integer penalty factors.
+# These correspond roughly to -10*ln(1 - p), where p is the fet
+# percentage for the weight (see <fet_data.WEIGHTMAP>). The 100% weight
+# is treated as a "hard" constraint.
+PENALTY_WEIGHTS = {
+    '-': 0,
+    '1': 7, '2': 11, '3': 16, '4': 21, '5': 27,
+    '6': 30, '7': 35, '8': 39, '9': 46, '+': 1000
+}
+HARD_WEIGHT = PENALTY_WEIGHTS['+']
+SPECIAL_CONSTRAINTS = {"PAIRGAP", "NOTAFTER"}
+
+########################################################################
+
+if __name__ == "__main__":
+    import sys, os
+    this = sys.path[0]
+    appdir = os.path.dirname(this)
+    sys.path[0] = appdir
+    basedir = os.path.dirname(appdir)
+    from core.base import start
+    start.setup(os.path.join(basedir, 'TESTDATA'))
+
+T = TRANSLATIONS("timetable.tt_scoring")
+
+### +++++
+
+from typing import NamedTuple, Optional
+
+from core.basic_data_3 import (
+    get_days,
+    get_periods,
+    get_classes,
+    timeslot2index,
+)
+from core.classes import GROUP_ALL
+from core.db_access import db_read_fields, read_pairs
+from timetable.tt_base import TT_DB, load_tt_db, parallel_groups
+
+### -----
+
+
+def single_bits(mask: int):
+    """Iterate over the individual bits of <mask>, lowest first."""
+    while mask:
+        b = mask & -mask
+        yield b
+        mask ^= b
+
+
+def available_slots(
+    available: str, ndays: int, nperiods: int
+) -> list[list[bool]]:
+    """Decode an AVAILABLE field (as in TT_CLASSES and TT_TEACHERS).
+    The days are separated by '_', each day has a character for each
+    period. As in <fet_data.timeoff_fet>, only '-' blocks a period,
+    missing values take the last value of the day (default '+').
+    Return a list of days, each a list of periods, <True> if available.
+    """
+    day_periods = available.split("_") if available else []
+    result = []
+    for d in range(ndays):
+        try:
+            ddata = day_periods[d]
+        except IndexError:
+            ddata = ""
+        pval = True
+        plist = []
+        for p in range(nperiods):
+            try:
+                pval = ddata[p] != '-'
+            except IndexError:
+                pass
+            plist.append(pval)
+        result.append(plist)
+    return result
+
+
+def split_weight(val: str) -> tuple[str, int]:
+    """Split a constraint value "xxx%w" into the value part and the
+    penalty factor for the weight w.
+    Raise <ValueError> if the value is invalid.
+    """
+    v, w = val.rsplit('%', 1)
+    return v, PENALTY_WEIGHTS[w]
+
+
+class ResourceConstraints:
+    """The constraints affecting the daily lesson pattern of a single
+    "resource" – a teacher or an atomic group of a class.
+    Number constraints are (number, penalty factor) pairs, or <None>.
+    """
+    __slots__ = (
+        "name",
+        "available",
+        "min_daily",
+        "empty_ok",
+        "max_daily",
+        "max_gaps_daily",
+        "max_gaps_weekly",
+        "max_block",
+        "lunch_periods",
+        "lunch_weight",
+    )
+
+    def __init__(self, name, ndays, nperiods, empty_ok):
+        self.name = name
+        self.available = available_slots("", ndays, nperiods)
+        self.empty_ok = empty_ok
+        self.min_daily = None
+        self.max_daily = None
+        self.max_gaps_daily = None
+        self.max_gaps_weekly = None
+        self.max_block = None
+        self.lunch_periods = None
+        self.lunch_weight = 0
+
+    def day_cost(
+        self, day: int, occ: list[int], tally: Optional[dict] = None
+    ) -> tuple[int, int]:
+        """Calculate the penalty for the lessons of one day.
+        <occ> is the list of lesson counts for the periods of the day.
+        If a mapping is passed as <tally>, the penalties are added to
+        it, keyed by constraint.
+        Return (penalty, gaps).
+        """
+        cost = 0
+        n = 0
+        first = -1
+        last = -1
+        avail = self.available[day]
+        for p, c in enumerate(occ):
+            if c:
+                n += 1
+                if first < 0:
+                    first = p
+                last = p
+                x = (c - 1) * HARD_WEIGHT
+                if x:
+                    cost += x
+                    if tally is not None:
+                        tally["CLASH"] = tally.get("CLASH", 0) + x
+                if not avail[p]:
+                    cost += HARD_WEIGHT * c
+                    if tally is not None:
+                        tally["AVAILABLE"] = (
+                            tally.get("AVAILABLE", 0) + HARD_WEIGHT * c
+                        )
+        if n == 0:
+            if self.min_daily and not self.empty_ok:
+                x = self.min_daily[0] * self.min_daily[1]
+                if tally is not None:
+                    tally["MINDAILY"] = tally.get("MINDAILY", 0) + x
+                return x, 0
+            return 0, 0
+        gaps = last - first + 1 - n
+        ## Lunch break: one of the periods must be free, if all the
+        ## periods are available on this day. A free lunch period
+        ## doesn't count as a gap.
+        if self.lunch_periods:
+            lunch = -1
+            for p in self.lunch_periods:
+                if not avail[p]:
+                    break
+                if lunch < 0 and not occ[p]:
+                    lunch = p
+            else:
+                if lunch < 0:
+                    x = self.lunch_weight
+                    cost += x
+                    if tally is not None:
+                        tally["LUNCHBREAK"] = tally.get("LUNCHBREAK", 0) + x
+                elif first < lunch < last:
+                    gaps -= 1
+        if self.min_daily and n < self.min_daily[0]:
+            x = (self.min_daily[0] - n) * self.min_daily[1]
+            cost += x
+            if tally is not None:
+                tally["MINDAILY"] = tally.get("MINDAILY", 0) + x
+        if self.max_daily and n > self.max_daily[0]:
+            x = (n - self.max_daily[0]) * self.max_daily[1]
+            cost += x
+            if tally is not None:
+                tally["MAXDAILY"] = tally.get("MAXDAILY", 0) + x
+        if self.max_gaps_daily and gaps > self.max_gaps_daily[0]:
+            x = (gaps - self.max_gaps_daily[0]) * self.max_gaps_daily[1]
+            cost += x
+            if tally is not None:
+                tally["MAXGAPSDAILY"] = tally.get("MAXGAPSDAILY", 0) + x
+        if self.max_block:
+            m, w = self.max_block
+            run = 0
+            x = 0
+            for c in occ[first:last + 1]:
+                if c:
+                    run += 1
+                else:
+                    if run > m:
+                        x += (run - m) * w
+                    run = 0
+            if run > m:
+                x += (run - m) * w
+            if x:
+                cost += x
+                if tally is not None:
+                    tally["MAXBLOCK"] = tally.get("MAXBLOCK", 0) + x
+        return cost, gaps
+
+    def week_cost(self, gaps: int, tally: Optional[dict] = None) -> int:
+        """Return the penalty for the total number of gaps in the week.
+        """
+        if self.max_gaps_weekly and gaps > self.max_gaps_weekly[0]:
+            x = (gaps - self.max_gaps_weekly[0]) * self.max_gaps_weekly[1]
+            if tally is not None:
+                tally["MAXGAPSWEEKLY"] = tally.get("MAXGAPSWEEKLY", 0) + x
+            return x
+        return 0
+
+
+class Link(NamedTuple):
+    """A constraint between two lessons (indexes). For "NOTAFTER",
+    <first> should end before <second> starts, if they are on the
+    same day.
+    """
+    kind: str
+    first: int
+    second: int
+    weight: int
+
+
+class TimetableScore:
+    """Hold the lesson placements together with the information needed
+    to calculate the penalties. Only the affected resources and lesson
+    pairs are recalculated when a lesson is moved.
+    """
+    def __init__(self, tt_db: Optional[TT_DB] = None, control=None):
+        """<control> is an optional <TaskControl>, used to check for
+        cancellation when the set-up is run in a background task.
+        """
+        self.control = control
+        if tt_db is None:
+            tt_db = load_tt_db()
+        self.TT_CONFIG = MINION(DATAPATH("CONFIG/TIMETABLE"))
+        self.NDAYS = len(get_days())
+        self.NPERIODS = len(get_periods())
+        self.setup_resources(tt_db)
+        self.setup_lessons(tt_db)
+        self.add_teacher_constraints(tt_db)
+        self.add_class_constraints(tt_db)
+        self.add_day_separation()
+        self.add_parallel_links(tt_db)
+        self.add_double_lesson_starts()
+        self.init_costs()
+
+    def check(self):
+        """Raise <TaskCancelled> if the controlling task has been
+        cancelled.
+        """
+        if self.control is not None:
+            self.control.check()
+
+    def setup_resources(self, tt_db: TT_DB):
+        """Each teacher and each atomic group gets a resource index.
+        The mapping from the check-bits to these indexes is also built.
+        """
+        tt_data = tt_db.tt_data
+        self.resources: list[ResourceConstraints] = []
+        self.bit2res: dict[int, int] = {}
+        self.tid2res: dict[str, int] = {}
+        self.class2res: dict[str, list[int]] = {}
+        self.class_mask = 0
+        for tid, ti in tt_data.teacher_i.items():
+            b = tt_data.teacher_bits[ti]
+            if b:
+                r = len(self.resources)
+                self.bit2res[b] = r
+                self.tid2res[tid] = r
+                self.resources.append(ResourceConstraints(
+                    tid, self.NDAYS, self.NPERIODS, True
+                ))
+        classes = get_classes()
+        for klass, ci in tt_data.class_i.items():
+            gbits = tt_data.class_group_bits[ci][GROUP_ALL]
+            self.class_mask |= gbits
+            atoms = classes[klass].divisions.atomic_groups or [""]
+            rlist = []
+            # The atomic groups were allocated bits in ascending order
+            for ag, b in zip(atoms, single_bits(gbits)):
+                r = len(self.resources)
+                self.bit2res[b] = r
+                rlist.append(r)
+                self.resources.append(ResourceConstraints(
+                    f"{klass}.{ag}" if ag else klass,
+                    self.NDAYS,
+                    self.NPERIODS,
+                    False,
+                ))
+            self.class2res[klass] = rlist
+
+    def setup_lessons(self, tt_db: TT_DB):
+        """Collect the lessons as parallel lists, indexed by lesson
+        index.
+        """
+        self.lids: list[int] = []
+        self.lid2index: dict[int, int] = {}
+        self.length: list[int] = []
+        self.day: list[int] = []
+        self.period: list[int] = []
+        self.fixed: list[bool] = []
+        self.lesson_res: list[list[int]] = []
+        self.lesson_atoms: list[int] = []   # check-bits of the groups
+        self.lesson_sid: list[str] = []
+        for lid, l_data in tt_db.lessons.items():
+            lg, _, length, t, p, _ = l_data
+            checkbits, _, rows = tt_db.lg_map[lg]
+            # The "display" subject is the block subject, if there is one
+            klass, group, sid, tid, bsid, room = rows[0]
+            fixed = bool(t) and t[0] != '^'
+            try:
+                d, p = timeslot2index(t if fixed else p)
+            except ValueError as e:
+                REPORT("ERROR", T["BAD_PLACEMENT"].format(lid=lid, e=e))
+                d, p = -1, -1
+            self.lid2index[lid] = len(self.lids)
+            self.lids.append(lid)
+            self.length.append(length)
+            self.day.append(d)
+            self.period.append(p)
+            self.fixed.append(fixed)
+            self.lesson_res.append(
+                [self.bit2res[b] for b in single_bits(checkbits)]
+            )
+            self.lesson_atoms.append(checkbits & self.class_mask)
+            self.lesson_sid.append(bsid or sid)
+        self.links: list[list[Link]] = [[] for l in self.lids]
+        self.unary: list[Optional[tuple[set[int], int]]] = [
+            None for l in self.lids
+        ]
+
+    def read_constraint_map(self, handlers, name, cstr, report):
+        """Read the constraints of a teacher or class from the
+        CONSTRAINTS field. Return a mapping {constraint: value}, the
+        "special" constraints are returned as a list of values.
+        """
+        constraints = {}
+        for c, v in read_pairs(cstr):
+            try:
+                d, t = handlers[c]
+            except KeyError:
+                report(c)
+                continue
+            if v == '*':
+                v = d
+            if c in SPECIAL_CONSTRAINTS:
+                try:
+                    constraints[c].append(v)
+                except KeyError:
+                    constraints[c] = [v]
+            elif c in constraints:
+                REPORT("ERROR", T["MULTIPLE_CONSTRAINT"].format(
+                    name=name, c=t
+                ))
+            else:
+                constraints[c] = v
+        return constraints
+
+    def set_resource_constraints(
+        self,
+        rc: ResourceConstraints,
+        name: str,
+        available: str,
+        constraints: dict[str, str],
+    ):
+        rc.available = available_slots(available, self.NDAYS, self.NPERIODS)
+        for c, attr in (
+            ("MINDAILY", "min_daily"),
+            ("MAXDAILY", "max_daily"),
+            ("MAXGAPSDAILY", "max_gaps_daily"),
+            ("MAXGAPSWEEKLY", "max_gaps_weekly"),
+            ("MAXBLOCK", "max_block"),
+        ):
+            try:
+                val = constraints[c]
+            except KeyError:
+                continue
+            try:
+                n, w = split_weight(val)
+                if w:
+                    setattr(rc, attr, (int(n), w))
+            except (ValueError, KeyError):
+                REPORT("ERROR", T["INVALID_CONSTRAINT"].format(
+                    name=name, c=c, val=val
+                ))
+        try:
+            val = constraints["LUNCHBREAK"]
+        except KeyError:
+            return
+        periods = get_periods()
+        try:
+            lbp, w = split_weight(val)
+            if w:
+                rc.lunch_periods = [periods.index(p) for p in lbp.split(',')]
+                rc.lunch_weight = w
+        except (ValueError, KeyError):
+            REPORT("ERROR", T["INVALID_CONSTRAINT"].format(
+                name=name, c="LUNCHBREAK", val=val
+            ))
+
+    def add_teacher_constraints(self, tt_db: TT_DB):
+        """Read the teacher constraints from the database table
+        TT_TEACHERS, see <fet_data.add_teacher_constraints>.
+        """
+        handlers = {
+            c: (d, t)
+            for c, h, d, t in self.TT_CONFIG["TEACHER_CONSTRAINT_HANDLERS"]
+        }
+        for tid, available, cstr in db_read_fields(
+            "TT_TEACHERS",
+            ("TID", "AVAILABLE", "CONSTRAINTS")
+        ):
+            self.check()
+            try:
+                rc = self.resources[self.tid2res[tid]]
+            except KeyError:
+                continue
+            constraints = self.read_constraint_map(
+                handlers, tid, cstr,
+                lambda c: REPORT(
+                    "ERROR",
+                    T["UNKNOWN_CONSTRAINT"].format(name=tid, c=c)
+                )
+            )
+            self.set_resource_constraints(rc, tid, available, constraints)
+
+    def add_class_constraints(self, tt_db: TT_DB):
+        """Read the class constraints from the database table
+        TT_CLASSES, see <fet_data.add_class_constraints>. The
+        constraints apply to each atomic group of the class.
+        """
+        handlers = {
+            c: (d, t)
+            for c, h, d, t in self.TT_CONFIG["CLASS_CONSTRAINT_HANDLERS"]
+        }
+        for klass, available, cstr in db_read_fields(
+            "TT_CLASSES",
+            ("CLASS", "AVAILABLE", "CONSTRAINTS")
+        ):
+            self.check()
+            try:
+                rlist = self.class2res[klass]
+            except KeyError:
+                continue
+            constraints = self.read_constraint_map(
+                handlers, klass, cstr,
+                lambda c: REPORT(
+                    "ERROR",
+                    T["UNKNOWN_CONSTRAINT"].format(name=klass, c=c)
+                )
+            )
+            for r in rlist:
+                self.set_resource_constraints(
+                    self.resources[r], klass, available, constraints
+                )
+            ci = tt_db.tt_data.class_i[klass]
+            cmask = tt_db.tt_data.class_group_bits[ci][GROUP_ALL]
+            for c in SPECIAL_CONSTRAINTS:
+                for val in constraints.get(c) or []:
+                    try:
+                        pair, w = split_weight(val)
+                        s1, s2 = pair.split('-', 1)
+                    except (ValueError, KeyError):
+                        REPORT("ERROR", T["INVALID_CONSTRAINT"].format(
+                            name=klass, c=c, val=val
+                        ))
+                        continue
+                    if w:
+                        self.add_pair_links(c, cmask, s1, s2, w)
+
+    def add_link(self, kind: str, first: int, second: int, weight: int):
+        """Add a constraint between two lessons. Pairs of fixed lessons
+        are skipped, as they can't be changed (this matches the fet
+        export).
+        """
+        if self.fixed[first] and self.fixed[second]:
+            return
+        link = Link(kind, first, second, weight)
+        self.links[first].append(link)
+        self.links[second].append(link)
+
+    def add_pair_links(self, kind, cmask, sid1, sid2, weight):
+        """Add the links for a subject-pair constraint of a class. Only
+        lessons sharing an atomic group of the class are linked.
+        """
+        pairs = {}
+        for atom in single_bits(cmask):
+            l1 = []
+            l2 = []
+            for i, sid in enumerate(self.lesson_sid):
+                if self.lesson_atoms[i] & atom:
+                    if sid == sid1:
+                        l1.append(i)
+                    elif sid == sid2:
+                        l2.append(i)
+            for i1 in l1:
+                for i2 in l2:
+                    # For NOTAFTER the lesson in <sid2> comes first
+                    key = (i2, i1) if kind == "NOTAFTER" else (i1, i2)
+                    if pairs.get(key, 0) < weight:
+                        pairs[key] = weight
+        for (i1, i2), w in pairs.items():
+            self.add_link(kind, i1, i2, w)
+
+    def add_day_separation(self):
+        """Lessons in a subject which share an atomic group should be on
+        different days, see <fet_data.constraint_day_separation>.
+        """
+        sa2lessons = {}
+        for i, sid in enumerate(self.lesson_sid):
+            for atom in single_bits(self.lesson_atoms[i]):
+                try:
+                    sa2lessons[(sid, atom)].append(i)
+                except KeyError:
+                    sa2lessons[(sid, atom)] = [i]
+        pairs = set()
+        for ilist in sa2lessons.values():
+            for j, i1 in enumerate(ilist):
+                for i2 in ilist[j + 1:]:
+                    pairs.add((i1, i2))
+        for i1, i2 in sorted(pairs):
+            self.add_link("DAYSEP", i1, i2, HARD_WEIGHT)
+
+    def add_parallel_links(self, tt_db: TT_DB):
+        """Lessons with the same parallel-tag should start at the same
+        time. Those with weight '+' are normally handled as a single
+        activity by the placement engine.
+        """
+        hard, soft = parallel_groups(tt_db.parallels)
+        for lids, w in [(lids, '+') for lids in hard] + soft:
+            ilist = [
+                self.lid2index[lid] for lid in lids if lid in self.lid2index
+            ]
+            for i in ilist[1:]:
+                self.add_link("PARALLEL", ilist[0], i, PENALTY_WEIGHTS[w])
+
+    def add_double_lesson_starts(self):
+        """Double lessons may only start in certain periods, see
+        <fet_data.add_further_constraints>.
+        """
+        plist = self.TT_CONFIG.get("DOUBLE_LESSON_START")
+        if not plist:
+            return
+        w = PENALTY_WEIGHTS[
+            self.TT_CONFIG.get("DOUBLE_LESSON_START_WEIGHT") or '+'
+        ]
+        if not w:
+            return
+        periods = get_periods()
+        pset = {periods.index(p) for p in plist}
+        for i, l in enumerate(self.length):
+            if l == 2:
+                self.unary[i] = (pset, w)
+
+    def link_cost(self, link: Link) -> int:
+        i1, i2 = link.first, link.second
+        d = self.day[i1]
+        if link.kind == "PARALLEL":
+            if d < 0 or self.day[i2] < 0 or (
+                d == self.day[i2] and self.period[i1] == self.period[i2]
+            ):
+                return 0
+            return link.weight
+        if d < 0 or d != self.day[i2]:
+            return 0
+        if link.kind == "DAYSEP":
+            return link.weight
+        p1 = self.period[i1]
+        p2 = self.period[i2]
+        if link.kind == "NOTAFTER":
+            if p1 + self.length[i1] <= p2:
+                return 0
+        elif p1 + self.length[i1] < p2 or p2 + self.length[i2] < p1:
+            # PAIRGAP: at least one period between the lessons
+            return 0
+        return link.weight
+
+    def lesson_cost(self, i: int) -> int:
+        """Return the penalties associated with the lesson itself and
+        with its links to other lessons.
+        """
+        cost = 0
+        for link in self.links[i]:
+            cost += self.link_cost(link)
+        if (u := self.unary[i]) and self.day[i] >= 0:
+            if self.period[i] not in u[0]:
+                cost += u[1]
+        return cost + self.overrun(i) * HARD_WEIGHT
+
+    def overrun(self, i: int) -> int:
+        """Return the number of periods of lesson <i> which would lie
+        beyond the end of the day. These are not entered in the
+        occupancy tables (see <mark>), so each is penalized as a
+        violated hard constraint.
+        """
+        if self.day[i] < 0:
+            return 0
+        return max(0, self.period[i] + self.length[i] - self.NPERIODS)
+
+    def mark(self, i: int, n: int):
+        """Add <n> to the occupancy counts of the resources of lesson <i>.
+        Periods beyond the end of the day are ignored, see <overrun>.
+        """
+        d = self.day[i]
+        if d < 0:
+            return
+        p0 = self.period[i]
+        s0 = d * self.NPERIODS
+        slots = range(
+            s0 + p0, s0 + min(p0 + self.length[i], self.NPERIODS)
+        )
+        for r in self.lesson_res[i]:
+            occ = self.occupancy[r]
+            for s in slots:
+                occ[s] += n
+
+    def refresh(self, r: int, days) -> int:
+        """Recalculate the cached penalties of resource <r> for the
+        given days. Return the change of penalty.
+        """
+        rc = self.resources[r]
+        dcosts = self.day_costs[r]
+        gaps = self.day_gaps[r]
+        occ = self.occupancy[r]
+        delta = -self.week_costs[r]
+        for d in days:
+            s0 = d * self.NPERIODS
+            c, g = rc.day_cost(d, occ[s0:s0 + self.NPERIODS])
+            delta += c - dcosts[d]
+            dcosts[d] = c
+            gaps[d] = g
+        self.week_costs[r] = rc.week_cost(sum(gaps))
+        return delta + self.week_costs[r]
+
+    def init_costs(self):
+        """Build the occupancy tables from the current placements and
+        calculate the total penalty.
+        """
+        nres = len(self.resources)
+        self.occupancy = [
+            [0] * (self.NDAYS * self.NPERIODS) for r in range(nres)
+        ]
+        self.day_costs = [[0] * self.NDAYS for r in range(nres)]
+        self.day_gaps = [[0] * self.NDAYS for r in range(nres)]
+        self.week_costs = [0] * nres
+        for i in range(len(self.lids)):
+            self.mark(i, 1)
+        self.score = 0
+        days = range(self.NDAYS)
+        for r in range(nres):
+            self.score += self.refresh(r, days)
+        seen = set()
+        for i in range(len(self.lids)):
+            for link in self.links[i]:
+                if id(link) not in seen:
+                    seen.add(id(link))
+                    self.score += self.link_cost(link)
+            if (u := self.unary[i]) and self.day[i] >= 0:
+                if self.period[i] not in u[0]:
+                    self.score += u[1]
+            self.score += self.overrun(i) * HARD_WEIGHT
+
+    def lesson_index(self, lid: int) -> int:
+        return self.lid2index[lid]
+
+    def total(self) -> int:
+        return self.score
+
+    def move(self, i: int, day: int, period: int) -> int:
+        """Move lesson <i> (index) to the given slot. A negative <day>
+        means "unplaced". Return the change of total penalty.
+        """
+        d0 = self.day[i]
+        if d0 == day and self.period[i] == period:
+            return 0
+        delta = -self.lesson_cost(i)
+        self.mark(i, -1)
+        self.day[i] = day
+        self.period[i] = period
+        self.mark(i, 1)
+        days = {d for d in (d0, day) if d >= 0}
+        for r in self.lesson_res[i]:
+            delta += self.refresh(r, days)
+        delta += self.lesson_cost(i)
+        self.score += delta
+        return delta
+
+    def delta(self, i: int, day: int, period: int) -> int:
+        """Return the change of total penalty which would result from
+        moving lesson <i> to the given slot. The placement is not changed.
+        """
+        d0, p0 = self.day[i], self.period[i]
+        delta = self.move(i, day, period)
+        self.move(i, d0, p0)
+        return delta
+
+    def evaluate(self) -> dict[str, int]:
+        """Recalculate the penalties from scratch, returning a mapping
+        {constraint: penalty}. The cached values are not affected.
+        """
+        tally = {}
+        for r, rc in enumerate(self.resources):
+            occ = self.occupancy[r]
+            gaps = 0
+            for d in range(self.NDAYS):
+                s0 = d * self.NPERIODS
+                gaps += rc.day_cost(d, occ[s0:s0 + self.NPERIODS], tally)[1]
+            rc.week_cost(gaps, tally)
+        seen = set()
+        for i in range(len(self.lids)):
+            for link in self.links[i]:
+                if id(link) not in seen:
+                    seen.add(id(link))
+                    if (x := self.link_cost(link)):
+                        tally[link.kind] = tally.get(link.kind, 0) + x
+            if (u := self.unary[i]) and self.day[i] >= 0:
+                if self.period[i] not in u[0]:
+                    tally["DOUBLE_LESSON_START"] = (
+                        tally.get("DOUBLE_LESSON_START", 0) + u[1]
+                    )
+            if (x := self.overrun(i)):
+                tally["OVERRUN"] = tally.get("OVERRUN", 0) + x * HARD_WEIGHT
+        return tally
+
+
+# --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
+
+if __name__ == '__main__':
+    from core.db_access import open_database
+    open_database("wz_db.sqlite")
+
+    score = TimetableScore()
+    print("\nTOTAL PENALTY:", score.total())
+    for c, x in sorted(score.evaluate().items()):
+        print(f"  -- {c:20}: {x}")
+
+    # Test the incremental evaluation by moving some lessons around
+    import random
+    for n in range(100):
+        i = random.randrange(len(score.lids))
+        if score.fixed[i]:
+            continue
+        d = random.randrange(score.NDAYS)
+        p = random.randrange(score.NPERIODS)
+        score.move(i, d, p)
+    assert score.total() == sum(score.evaluate().values())
+    print("\nAfter random moves:", score.total())
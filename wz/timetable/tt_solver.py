@@ -0,0 +1,306 @@
+"""
+timetable/tt_solver.py
+
+Last updated:  2026-10-19
+
+A simple tabu-search improvement of the timetable placements, using the
+tentative moves of a <Timetable>. The state of a run – placements, the
+random-number generator, best score and tabu memory – is saved at
+intervals as a checkpoint file, from which the run can be resumed (in a
+later session).
+
+Checkpoint files are in the folder DATAPATH("TIMETABLE/checkpoints").
+They consist of a short header followed by zlib-compressed "marshal"
+data. Activities are identified by their (first) lesson-id, so a
+checkpoint can still be loaded after an unrelated change to the data,
+unknown lessons being ignored.
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+if __name__ == "__main__":
+    import sys, os
+    this = sys.path[0]
+    appdir = os.path.dirname(this)
+    sys.path[0] = appdir
+    basedir = os.path.dirname(appdir)
+    from core.base import start
+    start.setup(os.path.join(basedir, 'TESTDATA'))
+
+T = TRANSLATIONS("timetable.tt_solver")
+
+### +++++
+
+import os
+import random
+import time
+import marshal
+import zlib
+
+from timetable.timetable_base_3a import Timetable
+from timetable.tt_scoring import HARD_WEIGHT
+
+CHECKPOINT_MAGIC = b"WZTTCP\x00\x01"
+CHECKPOINT_ENDING = ".wzcp"
+CHECKPOINT_INTERVAL = 60.0  # seconds
+MAX_CHECKPOINTS = 10        # older files are removed
+TABU_TENURE = 20            # iterations
+SAMPLE_SLOTS = 12           # slots tried per iteration
+
+### -----
+
+
+def checkpoint_folder() -> str:
+    return DATAPATH("TIMETABLE/checkpoints")
+
+
+def list_checkpoints() -> list[str]:
+    """Return the paths of the available checkpoint files, newest last.
+    """
+    folder = checkpoint_folder()
+    try:
+        files = [
+            f for f in os.listdir(folder) if f.endswith(CHECKPOINT_ENDING)
+        ]
+    except FileNotFoundError:
+        return []
+    return [os.path.join(folder, f) for f in sorted(files)]
+
+
+def write_checkpoint(path: str, data: dict):
+    """Write the data atomically (via a temporary file).
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(CHECKPOINT_MAGIC)
+        fh.write(zlib.compress(marshal.dumps(data)))
+    os.replace(tmp, path)
+
+
+def read_checkpoint(path: str) -> dict:
+    with open(path, "rb") as fh:
+        data = fh.read()
+    n = len(CHECKPOINT_MAGIC)
+    if data[:n] != CHECKPOINT_MAGIC:
+        raise ValueError(T["BAD_CHECKPOINT"].format(path=path))
+    try:
+        return marshal.loads(zlib.decompress(data[n:]))
+    except (zlib.error, ValueError, EOFError, TypeError):
+        raise ValueError(T["BAD_CHECKPOINT"].format(path=path))
+
+
+class TabuSearch:
+    """Repeatedly move a randomly chosen activity to the best of a
+    sample of free slots in its domain. Recently vacated placements are
+    "tabu" for a number of iterations, unless they would improve on the
+    best score. Unplaced activities are penalized heavily, so they are
+    placed if at all possible.
+    """
+    def __init__(self, timetable: Timetable, seed=None):
+        self.tt = timetable
+        self.engine = timetable.engine
+        acts = timetable.activities
+        self.lid2index = {lid: a for a, lid in enumerate(acts.lid)}
+        self.movable = [
+            a for a in range(len(acts)) if not self.engine.is_fixed(a)
+        ]
+        self.rng = random.Random(seed)
+        self.iteration = 0
+        self.tabu = {}      # (lesson-id, day, period) -> expiry iteration
+        self.score = self.objective()
+        self.best_score = self.score
+        self.best = self.placements()
+
+    def objective(self) -> int:
+        day = self.tt.activities.day
+        unplaced = sum(1 for a in self.movable if day[a] < 0)
+        return self.tt.scorer.total() + unplaced * HARD_WEIGHT
+
+    def placements(self) -> list[int]:
+        """Return the current placements as a flat list:
+            [lesson-id, day, period, ... ]
+        """
+        acts = self.tt.activities
+        plist = []
+        for a in self.movable:
+            plist += (acts.lid[a], acts.day[a], acts.period[a])
+        return plist
+
+    def set_placements(self, plist: list[int]):
+        """Move the activities to the given placements (see
+        <placements>). Activities not in the list are not moved.
+        """
+        tt = self.tt
+        moves = []
+        for i in range(0, len(plist), 3):
+            try:
+                a = self.lid2index[plist[i]]
+            except KeyError:
+                continue
+            if not self.engine.is_fixed(a):
+                moves.append((a, plist[i + 1], plist[i + 2]))
+        # First remove them all, to avoid spurious clashes
+        for a, d, p in moves:
+            tt.try_move(a, -1, 0)
+        for a, d, p in moves:
+            if d >= 0 and tt.try_move(a, d, p) is None:
+                REPORT("WARNING", T["PLACEMENT_LOST"].format(
+                    lid=self.tt.activities.lid[a]
+                ))
+        tt.commit()
+        self.score = self.objective()
+
+    def step(self):
+        """Perform a single iteration. If there are no movable
+        activities, there is nothing to do.
+        """
+        if not self.movable:
+            return
+        tt = self.tt
+        acts = tt.activities
+        self.iteration += 1
+        a = self.rng.choice(self.movable)
+        d0, p0 = acts.day[a], acts.period[a]
+        slots = [
+            s for s in self.engine.domains.slots(a, free_only=True)
+            if s != (d0, p0)
+        ]
+        if len(slots) > SAMPLE_SLOTS:
+            slots = self.rng.sample(slots, SAMPLE_SLOTS)
+        lid = acts.lid[a]
+        unplaced = HARD_WEIGHT if d0 < 0 else 0
+        best = None
+        for d, p in slots:
+            delta = tt.try_move(a, d, p)
+            tt.rollback()
+            if delta is None:
+                continue
+            delta -= unplaced
+            if self.tabu.get((lid, d, p), 0) > self.iteration:
+                # Aspiration: accept a tabu move which gives a new best
+                if self.score + delta >= self.best_score:
+                    continue
+            if best is None or delta < best[0]:
+                best = (delta, d, p)
+        if best is None:
+            return
+        delta, d, p = best
+        tt.try_move(a, d, p)
+        tt.commit()
+        if d0 >= 0:
+            self.tabu[(lid, d0, p0)] = self.iteration + TABU_TENURE
+        self.score += delta
+        if self.score < self.best_score:
+            self.best_score = self.score
+            self.best = self.placements()
+        if self.iteration % 1000 == 0:
+            # Forget expired tabu entries
+            self.tabu = {
+                k: x for k, x in self.tabu.items() if x > self.iteration
+            }
+
+    def run(
+        self,
+        time_limit: float,
+        checkpoint_interval: float = CHECKPOINT_INTERVAL
+    ) -> int:
+        """Run the search for <time_limit> seconds, writing checkpoints
+        at the given interval and at the end. The best placements found
+        are restored at the end. Return the best score.
+        If there are no movable activities, return at once.
+        """
+        if not self.movable:
+            return self.best_score
+        t0 = time.perf_counter()
+        t_end = t0 + time_limit
+        t_cp = t0 + checkpoint_interval
+        while True:
+            self.step()
+            t = time.perf_counter()
+            if t >= t_end:
+                break
+            if t >= t_cp:
+                self.checkpoint()
+                t_cp = t + checkpoint_interval
+        self.checkpoint()
+        self.set_placements(self.best)
+        return self.best_score
+
+    def state(self) -> dict:
+        return {
+            "iteration": self.iteration,
+            "rng": self.rng.getstate(),
+            "score": self.score,
+            "best_score": self.best_score,
+            "placements": self.placements(),
+            "best": self.best,
+            "tabu": [
+                (*k, x) for k, x in self.tabu.items() if x > self.iteration
+            ],
+        }
+
+    def checkpoint(self) -> str:
+        """Save the current state, removing the oldest checkpoints if
+        there are too many. Return the file path.
+        """
+        folder = checkpoint_folder()
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(
+            folder,
+            f"{time.strftime('%Y%m%d-%H%M%S')}_{self.iteration:09d}"
+            f"{CHECKPOINT_ENDING}"
+        )
+        write_checkpoint(path, self.state())
+        for old in list_checkpoints()[:-MAX_CHECKPOINTS]:
+            os.remove(old)
+        return path
+
+    def resume(self, path: str):
+        """Restore the state saved in the given checkpoint file.
+        """
+        data = read_checkpoint(path)
+        self.set_placements(data["placements"])
+        self.iteration = data["iteration"]
+        self.rng.setstate(data["rng"])
+        self.tabu = {(l, d, p): x for l, d, p, x in data["tabu"]}
+        self.best = data["best"]
+        self.best_score = data["best_score"]
+        if self.score != data["score"]:
+            # The data has changed since the checkpoint was written
+            REPORT("WARNING", T["SCORE_CHANGED"].format(
+                old=data["score"], new=self.score
+            ))
+            if self.score < self.best_score:
+                self.best_score = self.score
+                self.best = self.placements()
+
+
+# --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
+
+if __name__ == '__main__':
+    from core.db_access import open_database
+    open_database("wz_db.sqlite")
+
+    tt = Timetable()
+    search = TabuSearch(tt, seed=1)
+    if (cps := list_checkpoints()):
+        print("Resuming from", cps[-1])
+        search.resume(cps[-1])
+    print("Start:", search.score)
+    print("Best:", search.run(30.0, 10.0))
@@ -1,13 +1,16 @@
 """
 ui/dialogs/dialog_make_course_tables.py
 
-Last updated:  2023-07-26
+Last updated:  2026-10-19
 
 Supporting "dialog", for the course editor – allow the export of teacher
 and class data, etc., in table form.
 
 To test this, activate it in the course editor (ui/modules/course_editor).
 
+The activities are read, and the tables generated, in a background
+thread (see <PROCESS_BACKGROUND>), so that the GUI remains responsive.
+
 
 =+LICENCE=============================
 Copyright 2023 Michael Towers
@@ -65,8 +68,20 @@ class ExportTable(QDialog):
         """"Open the dialog.
         """
         self.output_box.clear()
-        self.activities = read_from_db()
-        self.exec()
+        self.activities = PROCESS_BACKGROUND(
+            lambda control: read_from_db(), T["LOADING"]
+        )
+        if self.activities is not None:
+            self.exec()
+
+    def make_table(self, maker):
+        """Generate a table from the activities using the function
+        <maker>, in a background thread. Return <None> if this was
+        cancelled or failed.
+        """
+        return PROCESS_BACKGROUND(
+            lambda control: maker(self.activities), T["GENERATING"]
+        )
 
     def output(self, text):
         self.output_box.appendPlainText(text)
@@ -76,7 +91,9 @@ class ExportTable(QDialog):
         """Export a pdf file with a table for each teacher detailing
         the workload and giving some pay-related information.
         """
-        pdfbytes = make_teacher_table_pay(self.activities)
+        pdfbytes = self.make_table(make_teacher_table_pay)
+        if pdfbytes is None:
+            return
         filepath = SAVE_FILE("pdf-Datei (*.pdf)", T["teacher_workload_pay"])
         if filepath and os.path.isabs(filepath):
             if not filepath.endswith(".pdf"):
@@ -90,7 +107,9 @@ class ExportTable(QDialog):
         """Export a pdf file with a table for each teacher detailing
         the lessons, etc.
         """
-        pdfbytes = make_teacher_table_room(self.activities)
+        pdfbytes = self.make_table(make_teacher_table_room)
+        if pdfbytes is None:
+            return
         filepath = SAVE_FILE("pdf-Datei (*.pdf)", T["teacher_activities"])
         if filepath and os.path.isabs(filepath):
             if not filepath.endswith(".pdf"):
@@ -104,7 +123,9 @@ class ExportTable(QDialog):
         """Export a pdf file with a table for each class detailing
         the lessons, etc.
         """
-        pdfbytes = make_class_table_pdf(self.activities)
+        pdfbytes = self.make_table(make_class_table_pdf)
+        if pdfbytes is None:
+            return
         filepath = SAVE_FILE("pdf-Datei (*.pdf)", T["class_lessons"])
         if filepath and os.path.isabs(filepath):
             if not filepath.endswith(".pdf"):
@@ -119,7 +140,9 @@ class ExportTable(QDialog):
         detailing the workload and giving some pay-related information.
         The data is rather more "raw" than in the corresponding pdf files.
         """
-        tdb = make_teacher_table_xlsx(self.activities)
+        tdb = self.make_table(make_teacher_table_xlsx)
+        if tdb is None:
+            return
         filepath = SAVE_FILE(
             "Excel-Datei (*.xlsx)", T["teacher_workload_pay"]
         )
@@ -135,7 +158,9 @@ class ExportTable(QDialog):
         detailing the lessons, etc.
         The data is rather more "raw" than in the corresponding pdf file.
         """
-        cdb = make_class_table_xlsx(self.activities)
+        cdb = self.make_table(make_class_table_xlsx)
+        if cdb is None:
+            return
         filepath = SAVE_FILE(
             "Excel-Datei (*.xlsx)", T["class_lessons"]
         )
@@ -1,10 +1,14 @@
 """
 ui/modules/course_editor.py
 
-Last updated:  2023-07-26
+Last updated:  2026-10-19
 
 Edit course and blocks+lessons data.
 
+The course table is a view on a <CourseTableModel>: cell texts are only
+produced when the view needs them and a reload which leaves the list of
+courses unchanged only updates the rows which have actually changed.
+
 
 =+LICENCE=============================
 Copyright 2023 Michael Towers
@@ -47,13 +51,13 @@ from core.db_access import (
     open_database,
     #db_select,
     db_read_fields,
-    db_read_unique,
     db_update_field,
     db_update_fields,
     db_new_row,
     db_delete_rows,
     db_values,
-    NoRecord,
+    KeyValueList,
+    Record,
 )
 from core.teachers import Teachers
 from core.basic_data_3 import (
@@ -74,6 +78,8 @@ from ui.ui_base import (
     ### QtWidgets:
     QLineEdit,
     QTableWidgetItem,
+    QTableView,
+    QAbstractItemView,
     QWidget,
     QHeaderView,
     QAbstractButton,
@@ -83,6 +89,8 @@ from ui.ui_base import (
     Qt,
     QEvent,
     Slot,
+    QAbstractTableModel,
+    QModelIndex,
     ### uic
     uic,
 )
@@ -115,9 +123,137 @@ COURSE_TABLE_FIELDS = ( # the fields shown in the course table
     ("GRADES", -1, 0),
     ("INFO", 0, -1),
 )
+ALIGNMENT = {
+    -1: Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+    0: Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter,
+    1: Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
+}
 
 ### -----
 
+def read_filter_lists(control) -> dict[str, KeyValueList]:
+    """Read the (key, name) lists for the course-table selectors.
+    This is run as a background task, see <PROCESS_BACKGROUND>.
+    """
+    control.progress(0, 3)
+    teachers = Teachers()
+    control.progress(1, 3)
+    classes = get_classes().get_class_list(skip_null=False)
+    control.progress(2, 3)
+    subjects = get_subjects()
+    control.progress(3, 3)
+    return {
+        "CLASS": KeyValueList(classes),
+        "SUBJECT": subjects,
+        "TEACHER": KeyValueList(
+            (tid, teachers.name(tid))
+            for tid, tiddata in teachers.items()
+        ),
+    }
+
+
+class CourseTableModel(QAbstractTableModel):
+    """Read-only model for the course table. Each row is the list of
+    activity records for a course (as returned by <filter_activities>),
+    the first of which supplies the course fields.
+    The display values of the columns of type 1 are looked up in the
+    <KeyValueList> for the field in <maps>.
+    """
+    def __init__(self, headers: list[str]):
+        super().__init__()
+        self.headers = headers
+        self.maps = {}
+        self.courses = []
+        self.course_list = []
+
+    def set_maps(self, maps: dict[str, KeyValueList]):
+        self.beginResetModel()
+        self.maps = maps
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.course_list)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COURSE_TABLE_FIELDS)
+
+    def headerData(self, section, orientation, role):
+        if (
+            orientation == Qt.Orientation.Horizontal
+            and role == Qt.ItemDataRole.DisplayRole
+        ):
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role):
+        cid, ctype, align = COURSE_TABLE_FIELDS[index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            cell_value = self.course_list[index.row()][0][cid]
+            if ctype == 1:
+                try:
+                    return self.maps[cid].map(cell_value)
+                except KeyError:
+                    return ""   # reported in <set_courses>
+            return cell_value
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return ALIGNMENT[align]
+        return None
+
+    def row_values(self, row: int) -> tuple:
+        cdata = self.course_list[row][0]
+        return tuple(cdata[cid] for cid, ctype, align in COURSE_TABLE_FIELDS)
+
+    def check_values(self, cdatalist: list):
+        """Report display-mapped course fields with unknown values.
+        """
+        cdata = cdatalist[0]
+        for cid, ctype, align in COURSE_TABLE_FIELDS:
+            if ctype == 1:
+                try:
+                    self.maps[cid].index(cdata[cid])
+                except KeyError:
+                    REPORT(
+                        "ERROR",
+                        T["UNKNOWN_VALUE_IN_FIELD"].format(
+                            cid=cid, cell_value=cdata[cid]
+                        )
+                    )
+
+    def set_course(self, row: int, cdatalist: list):
+        """Replace the data of a single course, signalling only its row
+        to the view.
+        """
+        self.check_values(cdatalist)
+        self.course_list[row] = cdatalist
+        self.dataChanged.emit(
+            self.index(row, 0),
+            self.index(row, len(COURSE_TABLE_FIELDS) - 1)
+        )
+
+    def set_courses(self, course_activities: dict[int, list]):
+        """Set the model data from the mapping returned by
+        <filter_activities>. If the courses are the same as before (same
+        ids in the same order) only the changed rows are signalled to
+        the view, otherwise the model is reset.
+        """
+        courses = list(course_activities)
+        course_list = list(course_activities.values())
+        for cdatalist in course_list:
+            self.check_values(cdatalist)
+        if courses != self.courses:
+            self.beginResetModel()
+            self.courses = courses
+            self.course_list = course_list
+            self.endResetModel()
+            return
+        old = [self.row_values(r) for r in range(len(courses))]
+        self.course_list = course_list
+        last = len(COURSE_TABLE_FIELDS) - 1
+        for r, values in enumerate(old):
+            if self.row_values(r) != values:
+                self.dataChanged.emit(self.index(r, 0), self.index(r, last))
+
+
 class CourseEditorPage(Page):
     def __init__(self):
         super().__init__()
@@ -127,9 +263,38 @@ class CourseEditorPage(Page):
             "BLOCK": QIcon.fromTheme("lesson_block"),
             "PAY": QIcon.fromTheme("cash"),
         }
-        self.course_table.horizontalHeader().setSectionResizeMode(
-            QHeaderView.ResizeMode.ResizeToContents
+        # Replace the <QTableWidget> from the ui-file by a view on a
+        # <CourseTableModel>, keeping its settings.
+        table = self.course_table
+        self.course_model = CourseTableModel([
+            table.horizontalHeaderItem(i).text()
+            for i in range(table.columnCount())
+        ])
+        view = QTableView()
+        view.setObjectName("course_table")
+        view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        view.setAlternatingRowColors(True)
+        view.setSelectionMode(
+            QAbstractItemView.SelectionMode.SingleSelection
+        )
+        view.setSelectionBehavior(
+            QAbstractItemView.SelectionBehavior.SelectRows
         )
+        view.setModel(self.course_model)
+        hheader = view.horizontalHeader()
+        hheader.setDefaultSectionSize(
+            table.horizontalHeader().defaultSectionSize()
+        )
+        hheader.setStretchLastSection(True)
+        hheader.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        table.parentWidget().layout().replaceWidget(table, view)
+        table.deleteLater()
+        self.course_table = view
+        view.selectionModel().currentRowChanged.connect(
+            self.course_selection_changed
+        )
+        view.doubleClicked.connect(self.course_double_clicked)
+        self.course_list = []
         # Set up activation for the editors for the read-only lesson/block
         # fields:
         for w in (
@@ -166,7 +331,11 @@ class CourseEditorPage(Page):
         #open_database("wz3.sqlite")
         open_database("wz_db.sqlite")
         clear_cache()
-        self.init_data()
+        # Read the basic data in a background thread
+        filter_list = PROCESS_BACKGROUND(read_filter_lists, T["LOADING"])
+        if filter_list is None:
+            return  # cancelled
+        self.init_data(filter_list)
         if self.filter_field == "CLASS": pb = self.pb_CLASS
         elif self.filter_field == "TEACHER": pb = self.pb_TEACHER
         else: pb = self.pb_SUBJECT
@@ -175,16 +344,9 @@ class CourseEditorPage(Page):
 
 # ++++++++++++++ The widget implementation fine details ++++++++++++++
 
-    def  init_data(self):
-        teachers = Teachers()
-        self.filter_list = {
-            "CLASS": get_classes().get_class_list(skip_null=False),
-            "SUBJECT": get_subjects(),
-            "TEACHER": [
-                (tid, teachers.name(tid))
-                for tid, tiddata in teachers.items()
-            ]
-        }
+    def  init_data(self, filter_list):
+        self.filter_list = filter_list
+        self.course_model.set_maps(self.filter_list)
         self.course_field_editor = None
         self.course_field_changer = None
 
@@ -232,51 +394,15 @@ class CourseEditorPage(Page):
         if select_index >= 0:
             self.filter_value = self.select_list[select_index][0]
         if table_row < 0:
-            table_row = self.course_table.currentRow()
+            table_row = self.course_row()
         self.course_activities = filter_activities(
             self.filter_field, self.filter_value
         )
         ## Populate the course table
         _sh = self.suppress_handlers
         self.suppress_handlers = True
-        self.course_table.setRowCount(len(self.course_activities))
-        self.course_list = []
-        for r, course in enumerate(self.course_activities):
-            self.course_list.append(
-                cdatalist := self.course_activities[course]
-            )
-            #print("\n&&&")
-            #for cd in cdatalist:
-            #    print("  ++", cd)
-            c = 0
-            for cid, ctype, align in COURSE_TABLE_FIELDS:
-                cell_value = cdatalist[0][cid]
-                item = self.course_table.item(r, c)
-                if not item:
-                    item = QTableWidgetItem()
-                    if align == -1:
-                        a = Qt.AlignmentFlag.AlignLeft
-                    elif align == 1:
-                        a = Qt.AlignmentFlag.AlignRight
-                    else:
-                        a = Qt.AlignmentFlag.AlignHCenter
-                    item.setTextAlignment(a | Qt.AlignmentFlag.AlignVCenter)
-                    self.course_table.setItem(r, c, item)
-                if ctype == 1:
-                    for k, v in self.filter_list[cid]:
-                        if k == cell_value:
-                            item.setText(v)
-                            break
-                    else:
-                        REPORT(
-                            "ERROR",
-                            T["UNKNOWN_VALUE_IN_FIELD"].format(
-                                cid=cid, cell_value=cell_value
-                            )
-                        )
-                else:
-                    item.setText(cell_value)
-                c += 1
+        self.course_model.set_courses(self.course_activities)
+        self.course_list = self.course_model.course_list
         self.course_data = None
         self.pb_delete_course.setEnabled(False)
         self.pb_edit_course.setEnabled(False)
@@ -284,17 +410,29 @@ class CourseEditorPage(Page):
         if (rn := len(self.course_activities)) > 0:
             if table_row >= rn:
                 table_row = rn - 1
-            self.course_table.setCurrentCell(table_row, 0)
+            self.set_course_row(table_row)
         else:
-            self.course_table.setCurrentCell(-1, 0)
+            self.set_course_row(-1)
         self.suppress_handlers = _sh
-        self.on_course_table_itemSelectionChanged()
+        self.course_selection_changed()
         self.lesson_restore_id = -1
         self.total_calc()
 
-    def on_course_table_itemSelectionChanged(self):
+    def course_row(self) -> int:
+        """Return the current row of the course table, -1 if none."""
+        return self.course_table.currentIndex().row()
+
+    def set_course_row(self, row: int):
+        if row < 0:
+            self.course_table.setCurrentIndex(QModelIndex())
+        else:
+            self.course_table.setCurrentIndex(
+                self.course_model.index(row, 0)
+            )
+
+    def course_selection_changed(self, current=None, previous=None):
         if self.suppress_handlers: return
-        row = self.course_table.currentRow()
+        row = self.course_row()
         lesson_id = self.lesson_restore_id
         if row >= 0:
             self.pb_delete_course.setEnabled(True)
@@ -317,12 +455,11 @@ class CourseEditorPage(Page):
         Otherwise select the first element (if there is one).
         """
 
-        def is_shared_pay(key:int) -> str:
-            """Determine whether a LESSON_DATA entry is used by multiple
-            courses.
+        def is_shared_pay(a: Record) -> str:
+            """Determine whether the LESSON_DATA entry of an activity is
+            used by multiple courses.
             """
-            clist = db_values("COURSE_LESSONS", "Lesson_data", Lesson_data=key)
-            return f"[{key}] " if len(clist) > 1 else ""
+            return f"[{a['Lesson_data']}] " if a["N_SHARED"] > 1 else ""
 
         self.suppress_handlers = True
         self.lesson_table.setRowCount(0)
@@ -355,14 +492,12 @@ class CourseEditorPage(Page):
             w = QTableWidgetItem("–")
             w.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
             self.lesson_table.setItem(row, 1, w)
-            w = QTableWidgetItem(
-                is_shared_pay(pay_only["Lesson_data"])
-            )
+            w = QTableWidgetItem(is_shared_pay(pay_only))
             self.lesson_table.setItem(row, 2, w)
             self.course_lessons.append((-1, pay_only))
             row += 1
         for simple_lesson in simple_lesson_l:
-            shared = is_shared_pay(simple_lesson["Lesson_data"])
+            shared = is_shared_pay(simple_lesson)
             # Add a lesson line
             self.lesson_table.insertRow(row)
             w = QTableWidgetItem(self.icons["LESSON"], "")
@@ -380,7 +515,7 @@ class CourseEditorPage(Page):
                 row_to_select = row
             row += 1
         for bl, blocksub in block_lesson_l:
-            shared = is_shared_pay(bl["Lesson_data"])
+            shared = is_shared_pay(bl)
             # Add a lesson line
             self.lesson_table.insertRow(row)
             w = QTableWidgetItem(self.icons["BLOCK"], "")
@@ -406,7 +541,7 @@ class CourseEditorPage(Page):
     @Slot()
     def on_pb_delete_course_clicked(self):
         """Delete the current course."""
-        row = self.course_table.currentRow()
+        row = self.course_row()
         assert row >= 0, "No course, delete button should be disabled"
         if not SHOW_CONFIRM(T["REALLY_DELETE"]):
             return
@@ -444,13 +579,12 @@ class CourseEditorPage(Page):
         # Reload the course table
         self.load_course_table(self.combo_class.currentIndex(), row)
 
-    @Slot(int,int)
-    def on_course_table_cellDoubleClicked(self, r, c):
-        self.edit_course(r)
+    def course_double_clicked(self, index: QModelIndex):
+        self.edit_course(index.row())
 
     @Slot()
     def on_pb_edit_course_clicked(self):
-        self.edit_course(self.course_table.currentRow())
+        self.edit_course(self.course_row())
 
     @Slot()
     def on_pb_change_all_clicked(self):
@@ -479,7 +613,7 @@ class CourseEditorPage(Page):
                 db_update_field("COURSES", field, newval, course=course)
             self.load_course_table(
                 self.combo_class.currentIndex(),
-                self.course_table.currentRow()
+                self.course_row()
             )
 
     def edit_course(self, row):
@@ -494,10 +628,29 @@ class CourseEditorPage(Page):
             [(f, v) for f, v in changes.items()],
             course=self.course_id,
         ):
-            self.load_course_table(self.combo_class.currentIndex(), row)
+            fv = changes.get(self.filter_field, self.filter_value)
+            if fv != self.filter_value:
+                # The course is no longer in the table
+                self.load_course_table(self.combo_class.currentIndex(), row)
+            else:
+                self.reload_course(row)
         else:
             raise Bug(f"Course update ({self.course_id}) failed: {changes}")
 
+    def reload_course(self, row):
+        """Reread the data of the course in the given row of the course
+        table after its fields have been changed. The other courses are
+        not affected, so only this row is updated.
+        """
+        course = self.course_list[row][0]["Course"]
+        cdatalist = filter_activities(
+            self.filter_field, self.filter_value, course
+        )[course]
+        self.course_activities[course] = cdatalist
+        self.course_model.set_course(row, cdatalist)
+        self.course_selection_changed()
+        self.total_calc()
+
     @Slot()
     def on_pb_new_course_clicked(self):
         """Add a new course.
@@ -530,7 +683,7 @@ class CourseEditorPage(Page):
             db_new_row("COURSES", **cdict)
             self.load_course_table(
                 self.combo_class.currentIndex(),
-                self.course_table.currentRow()
+                self.course_row()
             )
 
     def edit_course_fields(self, course_dict):
@@ -592,18 +745,14 @@ class CourseEditorPage(Page):
             self.wish_room.setEnabled(True)
             self.wish_time.setText(data["TIME"])
             self.wish_time.setEnabled(True)
-            try:
-                t, w = db_read_unique(
-                    "PARALLEL_LESSONS",
-                    ["TAG", "WEIGHTING"],
-                    lesson_id=data["Lid"]
+            if (t := data["PARALLEL_TAG"]):
+                self.current_parallel_tag = ParallelTag.build(
+                    t, data["PARALLEL_WEIGHTING"]
                 )
-            except NoRecord:
+                self.parallel.setText(str(self.current_parallel_tag))
+            else:
                 self.current_parallel_tag = ParallelTag.build("", 0)
                 self.parallel.clear()
-            else:
-                self.current_parallel_tag = ParallelTag.build(t, w)
-                self.parallel.setText(str(self.current_parallel_tag))
             self.parallel.setEnabled(True)
             self.notes.setText(data["NOTES"])
             self.notes.setEnabled(True)
@@ -1,7 +1,7 @@
 """
 ui/modules/timetable_editor.py
 
-Last updated:  2023-07-27
+Last updated:  2026-10-19
 
 Show a timetable grid and allow placement of lesson tiles.
 
@@ -56,6 +56,7 @@ from core.activities import (
 )
 from core.classes import GROUP_ALL
 from timetable.timetable_base_3a import Timetable, room_split
+from timetable.tt_repair import find_placements
 from ui.ui_base import (
     ### QtWidgets:
     QListWidgetItem,
@@ -70,6 +71,11 @@ from ui.ui_base import (
     uic,
 )
 
+# Cell marking for possible placements
+FREE_SLOT_COLOUR = "C0FFC0"
+CHAIN_SLOT_COLOUR = "FFE8A0"
+SEEK_TIME_BUDGET = 1.0  # seconds
+
 ### -----
 
 def init():
@@ -80,19 +86,39 @@ class TimetableEditor(Page):
     def __init__(self):
         super().__init__()
         uic.loadUi(APPDATAPATH("ui/timetable_class_view.ui"), self)
+        self.timetable = None
+        self.grid = None
+        self.all_classes = []
 
     def enter(self):
         open_database("wz_db.sqlite")
         clear_cache()
+        # Drop the data of a previous visit, also the class list (the
+        # handler ignores the row change while there is no timetable)
+        self.timetable = None
+        self.grid = None
+        self.all_classes = []
+        self.class_list.clear()
+        self.lessons.clearContents()
+        self.lessons.setRowCount(0)
+        self.table_header.clear()
+        self.table_view.setScene(None)
         self.TT_CONFIG = MINION(DATAPATH("CONFIG/TIMETABLE"))
-        self.timetable = (tt := TimetableManager())
+        # Reading the data and building the structures can take a while,
+        # do it in a background thread
+        tt = PROCESS_BACKGROUND(
+            lambda control: TimetableManager(control=control),
+            T["LOADING"]
+        )
+        if tt is None:
+            return  # cancelled or failed
+        self.timetable = tt
         breaks = self.TT_CONFIG["BREAKS_BEFORE_PERIODS"]
-        self.grid = WeekGrid(breaks)
+        self.grid = WeekGrid(breaks, tt)
         self.table_view.setScene(self.grid)
         tt.set_gui(self)
 
         ## Set up class list
-        self.all_classes = []
         for k, name in get_classes().get_class_list():
             if tt.class_activities[k]:
                 self.all_classes.append(k)
@@ -108,8 +134,11 @@ class TimetableEditor(Page):
 
     @Slot(int)
     def on_class_list_currentRowChanged(self, row):
+        if self.timetable is None or row < 0:
+            return
         klass = self.all_classes[row]
         self.grid.remove_tiles()
+        self.grid.clear_marks()
 #        self.timetable.show_class(klass)
         self.timetable.enter_class(klass)
 #TODO--
@@ -142,35 +171,24 @@ class TimetableManager(Timetable):
         tile_list = self.gui.lessons
         tile_list.clearContents()
         # Sort activities on subject
+        acts = self.activities
         class_activities = sorted(
             self.class_activities[klass],
-            key=lambda x: self.activities[x].sid
+            key=lambda a: acts.class_sid(a, klass)
         )
         tile_list.setRowCount(len(class_activities))
 #?
         tiledata = []
         tiles = []
         tile_list_hidden = []
+        # Map tile index to activity index
+        self.tile_activities = []
 #TODO--
 #        print("\nCLASS", klass)
         for row, a_index in enumerate(class_activities):
-            activity = self.activities[a_index]
-#TODO--
-#            print("  --", activity)
-            lesson_data = activity.lesson_info
-            fixed_time = lesson_data["TIME"]
-
-#TODO: Keep non-fixed times separate from the database? When would they
-# be saved, then?
-            if fixed_time:
-                d, p = timeslot2index(fixed_time)
-#                print("   @", d, p)
-
-            else:
-                slot_time = lesson_data["PLACEMENT"]
-                if slot_time:
-                    d, p = timeslot2index(slot_time)
-#                    print("   (@)", d, p)
+            # The current placement, as set by the placement engine
+            d, p = acts.day[a_index], acts.period[a_index]
+            length = acts.length[a_index]
 
 #TODO: display data
 
@@ -181,8 +199,8 @@ class TimetableManager(Timetable):
             groups = set()
             tids = set()
             rooms = set()
-            sid = activity.sid
-            for c in activity.course_list:
+            sid = acts.class_sid(a_index, klass)
+            for c in acts.course_list(a_index):
                 if c.klass == klass:
                     groups.add(c.group)
                     tids.add(c.teacher)
@@ -192,12 +210,10 @@ class TimetableManager(Timetable):
                     x = True
 #TODO: tool-tip (or whatever) to show parallel courses?
 #TODO: The rooms are part of the allocation data and should be checked!
-            t_rooms = lesson_data["ROOMS"]
+            t_rooms = acts.room_alloc_table[acts.rooms[a_index]]
 # It could be that not all required rooms have been allocated?
-# I would need to compare this with the "roomlists" lists,
-# <activity.roomlists>.
-            alloc_rooms = t_rooms.split(',') if t_rooms else []
-            print("???", len(activity.roomlists), rooms, alloc_rooms)
+# I would need to compare this with the room requirements,
+# <acts.roomlists(a_index)>.
 
             t_tids = ','.join(sorted(tids)) or '–'
             t_groups, tile_divisions = self.tile_division(klass, groups)
@@ -208,7 +224,7 @@ class TimetableManager(Timetable):
 #            print("  ...", sid, t_tids, t_groups, t_rooms, tile_divisions)
 
             tile_list.setItem(row, 0, QTableWidgetItem(sid))
-            twi = QTableWidgetItem(str(lesson_data["LENGTH"]))
+            twi = QTableWidgetItem(str(length))
             twi.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
             tile_list.setItem(row, 1, twi)
             twi = QTableWidgetItem(t_groups)
@@ -231,7 +247,7 @@ class TimetableManager(Timetable):
                 tile = make_tile(
                     grid=grid,
                     tag=tile_index,
-                    duration=lesson_data["LENGTH"],
+                    duration=length,
                     n_parts=l,
                     n_all=n,
                     offset=i,
@@ -243,6 +259,7 @@ class TimetableManager(Timetable):
                     br=t_rooms,
                 )
                 tiles.append(tile)
+                self.tile_activities.append(a_index)
                 if d >= 0:
                     grid.place_tile(tile_index, (d, p))
                     tile_list_hidden.append(True)
@@ -251,6 +268,24 @@ class TimetableManager(Timetable):
 
         tile_list.resizeColumnsToContents()
 
+    def seek_placements(self, tile_index):
+        """Look for possible placements of the activity shown in the
+        given tile, marking the cells which could be used.
+        """
+        a_index = self.tile_activities[tile_index]
+        options = find_placements(
+            self, a_index, time_budget=SEEK_TIME_BUDGET
+        )
+        grid = self.gui.grid
+        grid.clear_marks()
+        for option in options:
+            grid.mark_cell(
+                (option.day, option.period),
+                FREE_SLOT_COLOUR if len(option.moves) == 1
+                else CHAIN_SLOT_COLOUR
+            )
+        return options
+
     def tile_division(self, klass, groups):
         # Gather division components
         g2div = self.group_division[klass]
@@ -392,7 +427,9 @@ def simplify_room_lists_(roomlists, klass, tag):
 
 
 class WeekGrid(GridPeriodsDays):
-    def __init__(self, breaks):
+    def __init__(self, breaks, timetable):
+        self.timetable = timetable
+        self.marked_cells = []
         super().__init__(
             get_days().key_list(),
             get_periods().key_list(),
@@ -406,8 +443,16 @@ class WeekGrid(GridPeriodsDays):
         Action.triggered.connect(self.seek_slots)
 
     def seek_slots(self):
-        print("seek_slots:", self.context_tag)
-        #tile = self.tiles[self.context_tag]
+        self.timetable.seek_placements(self.context_tag)
+
+    def mark_cell(self, cell, colour):
+        self.get_cell(cell[1], cell[0]).set_background(colour)
+        self.marked_cells.append(cell)
+
+    def clear_marks(self):
+        for col, row in self.marked_cells:
+            self.get_cell(row, col).set_background(None)
+        self.marked_cells.clear()
 
 
 # --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
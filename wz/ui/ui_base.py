@@ -1,10 +1,14 @@
 """
 ui/ui_base.py
 
-Last updated:  2023-05-19
+Last updated:  2026-10-19
 
 Support stuff for the GUI: application initialization, dialogs, etc.
 
+Slow data loading can be done in a background thread, using
+PROCESS_BACKGROUND (see <__Reporter.run_background>), so that the
+window remains responsive.
+
 
 =+LICENCE=============================
 Copyright 2023 Michael Towers
@@ -24,7 +28,7 @@ Copyright 2023 Michael Towers
 =-LICENCE========================================
 """
 
-import sys, os, locale, builtins, traceback, glob, time
+import sys, os, locale, builtins, traceback, glob, time, threading
 
 if __name__ == "__main__":
     import sys, os
@@ -796,6 +800,76 @@ class ForeignKeyItemDelegate(QStyledItemDelegate):
         return self.key2value[key]
 
 
+############### Background tasks ###############
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskControl(QObject):
+    """Passed to a background task as its first argument. The task can
+    report its progress by calling <progress>. It should call <check>
+    (or <progress>) regularly, so that it can be cancelled.
+    """
+    progress_changed = Signal(int, int, str)
+
+    def __init__(self):
+        super().__init__()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        if self.cancelled:
+            raise TaskCancelled
+
+    def progress(self, value: int, maximum: int = 0, text: str = ""):
+        """If <maximum> is 0, the progress indicator just shows that
+        the task is busy.
+        """
+        self.check()
+        self.progress_changed.emit(value, maximum, text)
+
+
+class BackgroundTask(QRunnable):
+    """Run <task(control, **kargs)> in a thread of the global
+    thread pool. On completion the <finished> signal of <self.signals>
+    is emitted, <done>, <result>, <error> and <cancelled> being set as
+    appropriate. The database connection of the thread is closed at the
+    end, see <core.db_access.db_connection>.
+    """
+    class Signals(QObject):
+        finished = Signal()
+
+    def __init__(self, task, control: TaskControl, kargs: dict):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = self.Signals()
+        self.task = task
+        self.control = control
+        self.kargs = kargs
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.done = False
+
+    def run(self):
+        from core.db_access import db_release_thread
+        try:
+            self.result = self.task(self.control, **self.kargs)
+        except TaskCancelled:
+            self.cancelled = True
+        except Exception:
+            self.error = traceback.format_exc()
+        finally:
+            db_release_thread()
+        self.done = True
+        self.signals.finished.emit()
+
+    def start(self):
+        QThreadPool.globalInstance().start(self)
+
+
 class __Reporter(QDialog):
     colours = {
         "INFO":     "#00a000",
@@ -803,6 +877,11 @@ class __Reporter(QDialog):
         "ERROR":    "#d00000",
         "OUT":      "#ee00ee",
     }
+    # For reports from background threads
+    posted = Signal(str, str)
+    # Background tasks finishing within this time (ms) don't show the
+    # dialog unless there are reports
+    background_delay = 500
 
     def __init__(self, parent=None):
         super().__init__(parent=parent)
@@ -811,13 +890,22 @@ class __Reporter(QDialog):
         self.reportview = QTextEdit()
         self.reportview.setReadOnly(True)
         vbox.addWidget(self.reportview)
+        self.progress = QProgressBar()
+        self.progress.hide()
+        vbox.addWidget(self.progress)
         # vbox.addWidget(HLine())
         buttonBox = QDialogButtonBox()
         vbox.addWidget(buttonBox)
+        self.bt_cancel = buttonBox.addButton(
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        self.bt_cancel.hide()
         self.bt_done = buttonBox.addButton(QDialogButtonBox.StandardButton.Ok)
         self.bt_done.clicked.connect(self.ok)
         self.resize(600, 400)
         self.__active = False
+        self.messagecount = 0
+        self.posted.connect(self.newtext)
 
     def ok(self):
         self.__close_pending = True
@@ -853,6 +941,12 @@ class __Reporter(QDialog):
         time.sleep(0.01)
         QCoreApplication.processEvents()
         result = task(**kargs)
+        self.finish()
+        return result
+
+    def finish(self):
+        """Show the summary and wait for the dialog to be closed.
+        """
         txt = f'+++ ... {T["DONE"]}'
         self.reportview.append(f'<span style="color:#d406e3;">{txt}</span>')
         if self.errorcount:
@@ -870,9 +964,79 @@ class __Reporter(QDialog):
             QCoreApplication.processEvents()
             time.sleep(0.01)
         self.hide()
-        return result
+
+    def run_background(self, task, title=None, **kargs):
+        """Run <task(control, **kargs)> in a background thread (see
+        <BackgroundTask>), <control> being a <TaskControl> instance.
+        The GUI remains responsive, but user input is blocked by the
+        (modal) dialog, which only appears if the task is slow or makes
+        reports. The dialog shows the progress and allows the task to be
+        cancelled.
+        Return the result of the task, <None> if it was cancelled or
+        failed.
+        """
+        if self.__active:
+            # Already processing, don't start a nested run
+            return task(TaskControl(), **kargs)
+        control = TaskControl()
+        runner = BackgroundTask(task, control, kargs)
+        loop = QEventLoop()
+        runner.signals.finished.connect(loop.quit)
+        control.progress_changed.connect(self.set_progress)
+        self.bt_cancel.clicked.connect(control.cancel)
+        self.setWindowTitle(title or T["Reporter"])
+        self.setModal(True)
+        self.reportview.clear()
+        self.errorcount = 0
+        self.warningcount = 0
+        self.messagecount = 0
+        self.__close_pending = False
+        self.__active = True
+        self.bt_done.setEnabled(False)
+        self.bt_cancel.setEnabled(True)
+        self.bt_cancel.show()
+        self.progress.setRange(0, 0)
+        self.progress.show()
+        QApplication.setOverrideCursor(QCursor(Qt.CursorShape.WaitCursor))
+        timer = QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(loop.quit)
+        timer.start(self.background_delay)
+        runner.start()
+        # Until the dialog is shown, user input must be held back
+        loop.exec(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+        if not runner.done:
+            self.show()
+            loop.exec()
+        timer.stop()
+        self.bt_cancel.clicked.disconnect(control.cancel)
+        self.bt_cancel.hide()
+        self.progress.hide()
+        if runner.error:
+            self.newtext("ERROR", runner.error)
+        QApplication.restoreOverrideCursor()
+        if self.messagecount:
+            QApplication.setOverrideCursor(QCursor(Qt.CursorShape.WaitCursor))
+            self.show()
+            self.finish()
+        else:
+            self.__active = False
+            self.hide()
+        return None if runner.cancelled or runner.error else runner.result
+
+    def set_progress(self, value, maximum, text):
+        if maximum > 0:
+            self.progress.setRange(0, maximum)
+            self.progress.setValue(value)
+        else:
+            self.progress.setRange(0, 0)
+        self.progress.setFormat(f"{text}  %p%" if text else "%p%")
 
     def newtext(self, mtype, text):
+        if threading.current_thread() is not threading.main_thread():
+            # Called from a background task: pass to the GUI thread
+            self.posted.emit(mtype or "", text or "")
+            return
         try:
             ttype = T[mtype]
         except:
@@ -880,6 +1044,7 @@ class __Reporter(QDialog):
         text = text or ""
         if self.__active:
             if mtype or text:
+                self.messagecount += 1
                 if mtype:
                     if mtype == "ERROR":
                         self.errorcount += 1
@@ -904,6 +1069,7 @@ class __Reporter(QDialog):
 __reporter = __Reporter()
 builtins.REPORT = __reporter.newtext
 builtins.PROCESS = __reporter.start
+builtins.PROCESS_BACKGROUND = __reporter.run_background
 
 
 ############### Handle uncaught exceptions ###############
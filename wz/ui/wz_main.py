@@ -1,7 +1,7 @@
 """
 ui/wz_main.py
 
-Last updated:  2023-03-25
+Last updated:  2026-10-19
 
 The main window of the WZ GUI.
 
@@ -47,9 +47,15 @@ from ui.ui_base import (
     Slot,
 )
 
-from ui.modules.class_editor import ClassEditorPage
-from ui.modules.course_editor import CourseEditorPage
-from ui.modules.teacher_editor import TeacherEditorPage
+from importlib import import_module
+
+# The page modules are only imported when the page is first shown,
+# button name -> (module, page class)
+PAGES = {
+    "ui_class_editor": ("ui.modules.class_editor", "ClassEditorPage"),
+    "ui_teacher_editor": ("ui.modules.teacher_editor", "TeacherEditorPage"),
+    "ui_course_editor": ("ui.modules.course_editor", "CourseEditorPage"),
+}
 
 ### -----
 
@@ -65,26 +71,32 @@ class MainWidget(QWidget):
     def __init__(self):
         super().__init__()
         uic.loadUi(APPDATAPATH("ui/wz_main.ui"), self)
-        pages = (
-            ("ui_class_editor", ClassEditorPage()),
-            ("ui_teacher_editor", TeacherEditorPage()),
-            ("ui_course_editor", CourseEditorPage()),
-        )
         self.pages = {}
-        for key, page in pages:
-            self.pages[key] = page
-            self.stackedWidget.addWidget(page)
+
+    def get_page(self, key):
+        """Return the page for the given button name, creating it on
+        first use.
+        """
+        try:
+            return self.pages[key]
+        except KeyError:
+            pass
+        try:
+            module, pclass = PAGES[key]
+        except KeyError:
+            raise Bug(f"No page for button {key}")
+        page = getattr(import_module(module), pclass)()
+        self.pages[key] = page
+        self.stackedWidget.addWidget(page)
+        return page
 
     @Slot(QAbstractButton)
     def on_buttonGroup_buttonClicked(self, pb):
         oname = pb.objectName()
-        try:
-            page = self.pages[oname]
-        except KeyError:
-            if oname == "ui_info":
-                self.stackedWidget.setCurrentIndex(0)
-                return
-            raise Bug(f"No page for button {oname}")
+        if oname == "ui_info":
+            self.stackedWidget.setCurrentIndex(0)
+            return
+        page = self.get_page(oname)
         self.stackedWidget.setCurrentWidget(page)
         page.enter()
 
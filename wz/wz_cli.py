@@ -0,0 +1,207 @@
+"""
+wz_cli.py
+
+Last updated:  2026-10-19
+
+Command-line interface to the timetable export/import pipeline. Only
+the QtSql part of PyQt6 is loaded (no widgets), so it can be run on a
+machine without a display, e.g. from a script or a cron job:
+
+    python wz_cli.py export-fet -o tt.fet
+    python wz_cli.py import-fet path/to/tt_activities.xml
+    python wz_cli.py export-asc -o tt_asc.xml
+    python wz_cli.py reports -o path/to/folder
+    python wz_cli.py validate
+
+The exit code is 0 on success, 1 if an error was reported (or
+<validate> finds problems), 2 if the fet result file is not usable.
+
+
+=+LICENCE=============================
+Copyright 2026 Michael Towers
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+=-LICENCE========================================
+"""
+
+import sys, os
+import argparse
+import builtins
+
+# This file is in the application folder, which is thus <sys.path[0]>
+appdir = sys.path[0]
+basedir = os.path.dirname(appdir)
+
+### +++++
+
+DATABASE = "wz_db.sqlite"
+
+# Default file names for the reports
+REPORTS_PDF = (
+    ("make_class_table_pdf", "Klassen-Stunden.pdf"),
+    ("make_teacher_table_room", "Lehrer-Stunden.pdf"),
+    ("make_teacher_table_pay", "Deputate.pdf"),
+)
+REPORTS_XLSX = (
+    ("make_class_table_xlsx", "Klassen-Stunden.xlsx"),
+    ("make_teacher_table_xlsx", "Deputate.xlsx"),
+)
+
+# Message types which cause a non-zero exit code
+ERROR_TYPES = {"ERROR", "FAIL"}
+
+### -----
+
+
+class Reporter:
+    """A <REPORT> function which passes the messages on to the
+    previous one, counting the errors.
+    """
+    def __init__(self, report):
+        self.report = report
+        self.errors = 0
+
+    def __call__(self, mtype, text):
+        if mtype in ERROR_TYPES:
+            self.errors += 1
+        self.report(mtype, text)
+
+
+def export_fet(args) -> int:
+    from timetable.fet_data_3a import make_fet_file
+    from timetable.fet_fragments import FragmentCache
+    fet_file = args.output or DATAPATH("TIMETABLE/out/tt_out_3a.fet")
+    os.makedirs(os.path.dirname(os.path.abspath(fet_file)), exist_ok=True)
+    fragments = FragmentCache(DATAPATH("TIMETABLE/out/fet_fragments"))
+    make_fet_file(fet_file, fragments)
+    fragments.save()
+    REPORT("INFO", T["WRITTEN"].format(path=fet_file))
+    return 0
+
+
+def import_fet(args) -> int:
+    from timetable.fet_read_results_3a import (
+        ACTIVITIES_ENDING,
+        read_placements,
+    )
+    from core.db_access import db_backup
+    placements = args.activities
+    if not placements.endswith(ACTIVITIES_ENDING):
+        REPORT("ERROR", T["BAD_ACTIVITIES_FILE"].format(
+            path=placements, ending=ACTIVITIES_ENDING
+        ))
+        return 2
+    pbase = os.path.basename(placements)[:-len(ACTIVITIES_ENDING)]
+    fet_file = args.fet or os.path.join(
+        os.path.dirname(placements), pbase + ".fet"
+    )
+    read_placements(fet_file, placements)
+    db_backup(pbase)
+    return 0
+
+
+def export_asc(args) -> int:
+    from timetable.fet_read_results_3a import make_asc_file
+    asc_file = args.output or DATAPATH("TIMETABLE/out/tt_out_asc.xml")
+    os.makedirs(os.path.dirname(os.path.abspath(asc_file)), exist_ok=True)
+    make_asc_file(asc_file)
+    return 0
+
+
+def reports(args) -> int:
+    import core.list_activities_3a as la
+    from core.activities_3a import read_from_db
+    odir = args.output or DATAPATH("TIMETABLE/out")
+    os.makedirs(odir, exist_ok=True)
+    activities = read_from_db()
+    for fname, filename in REPORTS_PDF:
+        path = os.path.join(odir, filename)
+        pdfbytes = getattr(la, fname)(activities)
+        with open(path, "wb") as fh:
+            fh.write(pdfbytes)
+        REPORT("INFO", T["WRITTEN"].format(path=path))
+    for fname, filename in REPORTS_XLSX:
+        path = os.path.join(odir, filename)
+        la.write_xlsx(getattr(la, fname)(activities), path)
+        REPORT("INFO", T["WRITTEN"].format(path=path))
+    return 0
+
+
+def validate(args) -> int:
+    from timetable.tt_feasibility import check_feasibility
+    report = check_feasibility()
+    if (
+        report.overloaded
+        or report.too_long
+        or report.clique_load > report.week_periods
+    ):
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="wz_cli",
+        description="WZ: timetable export/import without GUI",
+    )
+    parser.add_argument(
+        "--data",
+        default=os.path.join(basedir, "TESTDATA"),
+        help="school-data folder",
+    )
+    parser.add_argument(
+        "--db",
+        default=DATABASE,
+        help="database file (within the data folder)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export-fet", help="generate fet input file")
+    p.add_argument("-o", "--output", help="fet file")
+    p.set_defaults(func=export_fet)
+    p = sub.add_parser("import-fet", help="read placements from fet")
+    p.add_argument("activities", help="fet result file (*_activities.xml)")
+    p.add_argument("--fet", help="fet file (default: from result file name)")
+    p.set_defaults(func=import_fet)
+    p = sub.add_parser("export-asc", help="generate aSc timetable file")
+    p.add_argument("-o", "--output", help="aSc (xml) file")
+    p.set_defaults(func=export_asc)
+    p = sub.add_parser("reports", help="write course lists (pdf, xlsx)")
+    p.add_argument("-o", "--output", help="output folder")
+    p.set_defaults(func=reports)
+    p = sub.add_parser("validate", help="check timetable feasibility")
+    p.set_defaults(func=validate)
+    args = parser.parse_args(argv)
+
+    from core.base import start
+    start.setup(os.path.abspath(args.data))
+    global T
+    T = TRANSLATIONS("wz_cli")
+    reporter = Reporter(REPORT)
+    builtins.REPORT = reporter
+
+    # QtSql needs an application object, but not a GUI
+    from PyQt6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication([sys.argv[0]])
+    from core.db_access import open_database
+    open_database(args.db)
+    status = args.func(args)
+    if status == 0 and reporter.errors:
+        return 1
+    return status
+
+
+# --#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#--#
+
+if __name__ == "__main__":
+    sys.exit(main())